@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+ASGI versus WSGI benchmark of the hot read endpoints.
+
+Seeds a throwaway SQLite file, then starts gunicorn with the same fixed
+number of worker processes twice: with its threaded WSGI workers (the sync
+viewsets, threads from gunicorn.conf.py), then with uvicorn's ASGI workers
+(the async read views of orders/async_views.py). Each is driven over HTTP
+with a read mix of the
+restaurant list, menus, order list, order details and statistics at rising
+client concurrency. For each server and concurrency level it reports
+throughput, latency percentiles and errors.
+
+Usage:
+    python -m benchmarks.asgi_vs_wsgi [--workers 2] [--concurrency 1,8,32,64] [--duration 10]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.load_test import HttpTransport, load_test
+
+from django.conf import settings
+from django.core.management import call_command
+
+from orders.models import Restaurant, Order
+from orders.synthetic import SyntheticConfig, insert_into_database
+
+# Share of each read endpoint in the mix
+READ_MIX = {'restaurants': 15, 'menu': 35, 'orders': 20, 'order': 20, 'statistics': 10}
+
+
+class ReadTraffic:
+    """Read-only traffic mix for load_test, over known restaurants and orders"""
+
+    def __init__(self, transport, restaurant_ids, order_ids):
+        self.transport = transport
+        self.restaurant_ids = restaurant_ids
+        self.order_ids = order_ids
+
+    def next_request(self, rng):
+        endpoint = rng.choices(list(READ_MIX), list(READ_MIX.values()))[0]
+        if endpoint == 'restaurants':
+            path = '/api/restaurants/?is_active=true'
+        elif endpoint == 'menu':
+            path = f'/api/restaurants/{rng.choice(self.restaurant_ids)}/menu/'
+        elif endpoint == 'orders':
+            path = f'/api/orders/?page={rng.randint(1, 5)}'
+        elif endpoint == 'order':
+            path = f'/api/orders/{rng.choice(self.order_ids)}/'
+        else:
+            path = f'/api/orders/statistics/?restaurant_id={rng.choice(self.restaurant_ids)}'
+        return endpoint, 'GET', path, None, None
+
+    def record_response(self, endpoint, path, status, content, headers):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, workers, port, database):
+    env = {
+        'SECRET_KEY': 'benchmark-only-secret-key',
+        **os.environ, 'SQLITE_PATH': database, 'DEBUG': '0', 'WEB_CONCURRENCY': str(workers),
+    }
+    command = [
+        'gunicorn', '--config', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+        '--access-logfile', '/dev/null', '--error-logfile', '/dev/null',
+    ]
+    if kind == 'wsgi':
+        command.append('waiterapi.wsgi:application')
+    else:
+        # Persistent connections don't outlive the threads sync_to_async hands queries to
+        env['CONN_MAX_AGE'] = '0'
+        command += ['--worker-class', 'uvicorn.workers.UvicornWorker', 'waiterapi.asgi:application']
+    server = subprocess.Popen(command, env=env, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {server.returncode}')
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('gunicorn did not start listening within 30 seconds')
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2, help='Server worker processes (default: 2)')
+    parser.add_argument('--concurrency', default='1,8,32,64', help='Client thread counts (default: 1,8,32,64)')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per concurrency level (default: 10)')
+    parser.add_argument('--warmup', type=int, default=50, help='Unrecorded requests sent first')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--restaurants', type=int, default=20, help='Seeded restaurants')
+    parser.add_argument('--menu-items', type=int, default=400, help='Seeded menu items')
+    parser.add_argument('--orders', type=int, default=20000, help='Seeded orders')
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        # The servers run in other processes: work on a throwaway database file
+        database = os.path.join(directory, 'benchmark.sqlite3')
+        settings.DATABASES['default']['NAME'] = database
+        call_command('migrate', verbosity=0)
+        print(f'Seeding {args.restaurants} restaurants and {args.orders} orders...')
+        insert_into_database(SyntheticConfig(
+            restaurants=args.restaurants, menu_items=args.menu_items, orders=args.orders, seed=args.seed,
+        ))
+        restaurant_ids = list(Restaurant.objects.filter(is_active=True).values_list('id', flat=True))
+        order_ids = list(Order.objects.order_by('?').values_list('id', flat=True)[:2000])
+
+        for kind in ('wsgi', 'asgi'):
+            port = free_port()
+            server = start_server(kind, args.workers, port, database)
+            try:
+                traffic = ReadTraffic(HttpTransport(f'http://127.0.0.1:{port}'), restaurant_ids, order_ids)
+                for level in levels:
+                    summary = load_test(traffic, None, args.duration, level, args.warmup, args.seed)
+                    results.setdefault(kind, {})[level] = summary['all']
+                    print(f'{kind} x{level}: {summary["all"]["throughput_rps"]} req/s')
+            finally:
+                stop_server(server)
+
+    print(f"\n{args.workers} workers per server")
+    print(f"{'server':<6} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>6}")
+    for kind, by_level in results.items():
+        for level, result in by_level.items():
+            print(
+                f"{kind:<6} {level:>7} {result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} "
+                f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>6}"
+            )
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'arguments': vars(args), 'results': results}, f, indent=2)
+        print(f'\nResults written to {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+Concurrency stress test of the order write path.
+
+Creates orders and moves them through their statuses (OrderViewSet.create
+and update_status) from many threads at once, through the Django test
+client. Every thread has its own connection to the same throwaway SQLite
+file, so they contend for its write lock just like separate server
+workers do.
+
+The run is repeated for each SQLite profile: 'tuned' uses the connection
+options of the settings (WAL journal, pragmas and immediate transactions,
+see SQLITE_PRAGMAS), 'default' the rollback journal and deferred
+transactions SQLite and Django use out of the box. For each it reports
+throughput, latency and errors per endpoint, and how many requests failed
+with "database is locked".
+
+Usage:
+    python -m benchmarks.concurrency [--threads 16] [--requests 4000] [--profile both]
+    python -m benchmarks.concurrency --profile tuned --duration 30 --json run.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+from benchmarks.load_test import Traffic, load_test, parse_mix, print_results
+
+from django.conf import settings
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connection
+from django.test import Client
+
+from orders.synthetic import SyntheticConfig, insert_into_database
+
+DEFAULT_MIX = 'create=50,status=50'
+PROFILES = {
+    'default': {'init_command': 'PRAGMA journal_mode=DELETE'},
+    'tuned': settings.DATABASES['default'].get('OPTIONS', {}),
+}
+
+
+class ThreadedClientTransport:
+    """Requests served in-process by the test client, one client (and database connection) per thread"""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(raise_request_exception=False)
+        response = client.generic(
+            method, path,
+            json.dumps(body) if body is not None else '',
+            content_type='application/json',
+            headers=headers,
+        )
+        return response.status_code, response.content, response.headers, None
+
+
+class LockErrorCounter:
+    """Counts requests that failed because the database was locked"""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, sender, **kwargs):
+        # Sent while the view's exception is being handled
+        exception = sys.exc_info()[1]
+        if isinstance(exception, OperationalError) and 'locked' in str(exception):
+            with self.lock:
+                self.count += 1
+
+
+def stress(options, args):
+    """Seed a fresh database file opened with these connection options and hammer it"""
+    connection.settings_dict['OPTIONS'] = options
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'stress.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            insert_into_database(SyntheticConfig(
+                restaurants=args.restaurants, menu_items=args.menu_items, orders=args.orders, seed=args.seed,
+            ))
+            journal_mode = connection.cursor().execute('PRAGMA journal_mode').fetchone()[0]
+            traffic = Traffic.discover(ThreadedClientTransport(), args.mix)
+            lock_errors = LockErrorCounter()
+            got_request_exception.connect(lock_errors)
+            try:
+                results = load_test(traffic, args.requests, args.duration, args.threads, args.warmup, args.seed)
+            finally:
+                got_request_exception.disconnect(lock_errors)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    return {'journal_mode': journal_mode, 'lock_errors': lock_errors.count, 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', choices=['default', 'tuned', 'both'], default='both')
+    parser.add_argument('--threads', type=int, default=16, help='Client threads (default: 16)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Scenario weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--requests', type=int, default=4000, help='Requests to send (default: 4000)')
+    parser.add_argument('--duration', type=float, help='Run for this many seconds instead of --requests')
+    parser.add_argument('--warmup', type=int, default=20, help='Unrecorded requests sent first')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--restaurants', type=int, default=10, help='Seeded restaurants')
+    parser.add_argument('--menu-items', type=int, default=200, help='Seeded menu items')
+    parser.add_argument('--orders', type=int, default=2000, help='Seeded orders')
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    # Failed requests are counted, not logged with their traceback
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+    runs = {}
+    for profile in (['default', 'tuned'] if args.profile == 'both' else [args.profile]):
+        print(f'\n== {profile}: {args.threads} threads')
+        run = runs[profile] = stress(PROFILES[profile], args)
+        overall = run['results']['all']
+        succeeded = overall['throughput_rps'] * (1 - overall['errors'] / overall['requests'])
+        print(f"journal mode {run['journal_mode']}: {succeeded:.1f} successful requests/s, "
+              f"{run['lock_errors']} failed with 'database is locked'")
+        print_results(run['results'], runs['default']['results'] if profile == 'tuned' and 'default' in runs else None)
+
+    if args.json:
+        arguments = {**vars(args), 'mix': args.mix}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'arguments': arguments, 'runs': runs}, f, indent=2)
+        print(f'\nResults written to {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
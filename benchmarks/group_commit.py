@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Group commit benchmark of the order write path.
+
+Runs the concurrency stress test (see benchmarks.concurrency) of order
+creations and status updates twice on the tuned SQLite profile: with every
+request committing its own writes, then with ORDER_WRITE_COORDINATOR on,
+where a single writer thread commits the writes arriving together in one
+transaction (see orders.writer). For each it reports commits per second and
+requests per commit along with the usual throughput and latency.
+
+Commits are counted as the write transactions begun by the client threads
+and the writer thread (each BEGIN IMMEDIATE, plus every write made outside
+a transaction); seeding and warm-up requests run on the main thread and are
+left out. --synchronous FULL makes every commit wait for an fsync, as with
+the rollback journal, which is where grouping pays off most.
+
+Usage:
+    python -m benchmarks.group_commit [--threads 16] [--requests 4000] [--synchronous FULL]
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+
+from benchmarks.concurrency import DEFAULT_MIX, stress
+from benchmarks.load_test import parse_mix, print_results
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+
+
+class CommitCounter:
+    """Database execute wrapper counting the write transactions of non-main threads"""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if threading.current_thread() is not threading.main_thread() and (
+            sql.startswith('BEGIN')
+            or (not context['connection'].in_atomic_block and sql.startswith(('INSERT', 'UPDATE', 'DELETE')))
+        ):
+            with self.lock:
+                self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def connection_options(synchronous):
+    """The settings' connection options, with immediate transactions so each one starts with BEGIN"""
+    pragmas = {**settings.SQLITE_PRAGMAS, 'synchronous': synchronous or settings.SQLITE_PRAGMAS['synchronous']}
+    return {
+        'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items()),
+        'transaction_mode': 'IMMEDIATE',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16, help='Client threads (default: 16)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Scenario weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--requests', type=int, default=4000, help='Requests to send (default: 4000)')
+    parser.add_argument('--duration', type=float, help='Run for this many seconds instead of --requests')
+    parser.add_argument('--warmup', type=int, default=20, help='Unrecorded requests sent first')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--restaurants', type=int, default=10, help='Seeded restaurants')
+    parser.add_argument('--menu-items', type=int, default=200, help='Seeded menu items')
+    parser.add_argument('--orders', type=int, default=2000, help='Seeded orders')
+    parser.add_argument('--synchronous', choices=['OFF', 'NORMAL', 'FULL', 'EXTRA'],
+                        help='SQLite synchronous level (default: the settings)')
+    parser.add_argument('--window-ms', type=float, default=settings.GROUP_COMMIT_WINDOW_MS,
+                        help=f'Group commit window (default: {settings.GROUP_COMMIT_WINDOW_MS})')
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    options = connection_options(args.synchronous)
+
+    runs = {}
+    for mode, enabled in (('per-request', False), ('group', True)):
+        print(f'\n== {mode} commits: {args.threads} threads')
+        commits = CommitCounter()
+        connection_created.connect(commits.install)
+        try:
+            with override_settings(ORDER_WRITE_COORDINATOR=enabled, GROUP_COMMIT_WINDOW_MS=args.window_ms):
+                run = stress(options, args)
+        finally:
+            connection_created.disconnect(commits.install)
+        overall = run['results']['all']
+        elapsed = overall['requests'] / overall['throughput_rps']
+        run['commits'] = commits.count
+        run['commits_per_second'] = round(commits.count / elapsed, 2)
+        run['requests_per_commit'] = round(overall['requests'] / commits.count, 2) if commits.count else None
+        runs[mode] = run
+        print(f"{commits.count} commits: {run['commits_per_second']:.1f} commits/s, "
+              f"{run['requests_per_commit']} requests per commit, "
+              f"{run['lock_errors']} requests failed with 'database is locked'")
+        print_results(run['results'], runs['per-request']['results'] if enabled else None)
+
+    if args.json:
+        arguments = {**vars(args), 'mix': args.mix}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'arguments': arguments, 'runs': runs}, f, indent=2)
+        print(f'\nResults written to {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+"""
+Load test replaying a realistic traffic mix against the API.
+
+By default the API runs in-process through the Django test client, on a
+throwaway test database seeded with orders.synthetic, and every request also
+records its SQL query count. With --url it drives a running server over
+HTTP from --concurrency threads instead (query counts are then unknown).
+
+The mix combines customers reading menus, placing orders, staff moving
+orders through their statuses and kitchen displays polling their pending
+orders with If-None-Match. For every endpoint it reports requests, errors,
+throughput, p50/p95/p99 latency and queries per request. --json saves the
+results; --compare prints the change against a previously saved run.
+
+Usage:
+    python -m benchmarks.load_test [--requests 2000] [--mix menu=40,create=15,status=15,kitchen=30]
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 8 --duration 30 --json run.json
+    python -m benchmarks.load_test --compare run.json
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'waiterapi.settings')
+django.setup()
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from orders.synthetic import SyntheticConfig, insert_into_database
+
+DEFAULT_MIX = 'menu=40,create=15,status=15,kitchen=30'
+# Status an order moves to next when staff updates it
+NEXT_STATUS = {'pending': 'in_progress', 'in_progress': 'done'}
+
+
+class TestClientTransport:
+    """Requests served in-process by the Django test client, counting SQL queries"""
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, body=None, headers=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.generic(
+                method, path,
+                json.dumps(body) if body is not None else '',
+                content_type='application/json',
+                headers=headers,
+            )
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, content, response.headers, len(queries)
+
+
+class HttpTransport:
+    """Requests sent to a running server, one keep-alive connection per thread"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+        payload = json.dumps(body).encode() if body is not None else None
+        for attempt in range(2):
+            if getattr(self.local, 'connection', None) is None:
+                self.local.connection = self.connection_class(self.netloc, timeout=30)
+            try:
+                self.local.connection.request(method, self.prefix + path, payload, headers)
+                response = self.local.connection.getresponse()
+                return response.status, response.read(), response.headers, None
+            except (http.client.HTTPException, OSError):
+                # The server may close idle keep-alive connections: retry once on a new one
+                self.local.connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise
+
+
+class Traffic:
+    """The traffic mix and the state it shares between requests"""
+
+    def __init__(self, transport, mix, restaurants):
+        self.transport = transport
+        self.scenarios = list(mix)
+        self.weights = list(mix.values())
+        self.menus = restaurants  # restaurant id -> available menu item ids
+        self.restaurant_ids = list(restaurants)
+        self.open_orders = deque()  # (order id, status) created during the run
+        self.etags = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def discover(cls, transport, mix, max_restaurants=50):
+        """Find active restaurants and their menus through the API itself"""
+        status, content, _, _ = transport.request('GET', '/api/restaurants/?is_active=true')
+        if status != 200:
+            raise RuntimeError(f'Listing restaurants failed with HTTP {status}')
+        restaurants = {}
+        for restaurant in json.loads(content)['results'][:max_restaurants]:
+            status, content, _, _ = transport.request('GET', f"/api/restaurants/{restaurant['id']}/menu/")
+            if status == 200:
+                menu = [item['id'] for item in json.loads(content)['results']]
+                if menu:
+                    restaurants[restaurant['id']] = menu
+        if not restaurants:
+            raise RuntimeError('No active restaurant with available menu items to order from')
+        return cls(transport, mix, restaurants)
+
+    def next_request(self, rng):
+        """Pick the next request of the mix: (endpoint, method, path, body, headers)"""
+        scenario = rng.choices(self.scenarios, self.weights)[0]
+        if scenario == 'status':
+            with self.lock:
+                order = self.open_orders.popleft() if self.open_orders else None
+            if order is None:
+                scenario = 'create'
+            else:
+                return 'status', 'PATCH', f'/api/orders/{order[0]}/update_status/', {'status': NEXT_STATUS[order[1]]}, None
+        restaurant_id = rng.choice(self.restaurant_ids)
+        if scenario == 'menu':
+            return 'menu', 'GET', f'/api/restaurants/{restaurant_id}/menu/', None, None
+        if scenario == 'kitchen':
+            etag = self.etags.get(restaurant_id)
+            headers = {'If-None-Match': etag} if etag else None
+            return 'kitchen', 'GET', f'/api/restaurants/{restaurant_id}/orders/?status=pending', None, headers
+        menu = self.menus[restaurant_id]
+        body = {
+            'restaurant': restaurant_id,
+            'customer_name': f'Load test {rng.randint(1, 9999)}',
+            'table_number': str(rng.randint(1, 60)),
+            'order_items': [
+                {'menu_item': menu_item, 'quantity': rng.randint(1, 3)}
+                for menu_item in rng.sample(menu, min(rng.randint(1, 4), len(menu)))
+            ],
+        }
+        return 'create', 'POST', '/api/orders/', body, None
+
+    def record_response(self, endpoint, path, status, content, headers):
+        """Keep the state later requests depend on"""
+        if endpoint in ('create', 'status') and status in (200, 201):
+            order = json.loads(content)
+            if order['status'] in NEXT_STATUS:
+                with self.lock:
+                    self.open_orders.append((order['id'], order['status']))
+        elif endpoint == 'kitchen' and status == 200 and headers.get('ETag'):
+            self.etags[int(path.split('/')[3])] = headers['ETag']
+
+
+class Recorder:
+    """Latencies, errors and query counts per endpoint"""
+
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def add(self, endpoint, seconds, ok, queries):
+        with self.lock:
+            sample = self.samples.setdefault(endpoint, {'latencies': [], 'errors': 0, 'queries': []})
+            sample['latencies'].append(seconds * 1000)
+            sample['errors'] += not ok
+            if queries is not None:
+                sample['queries'].append(queries)
+
+    def summary(self, elapsed):
+        endpoints = dict(sorted(self.samples.items()))
+        endpoints['all'] = {
+            'latencies': [latency for sample in endpoints.values() for latency in sample['latencies']],
+            'errors': sum(sample['errors'] for sample in endpoints.values()),
+            'queries': [queries for sample in endpoints.values() for queries in sample['queries']],
+        }
+        return {name: summarize(sample, elapsed) for name, sample in endpoints.items()}
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)]
+
+
+def summarize(sample, elapsed):
+    latencies = sorted(sample['latencies'])
+    queries = sample['queries']
+    return {
+        'requests': len(latencies),
+        'errors': sample['errors'],
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def run(traffic, recorder, rng, budget, deadline):
+    """Send requests until the shared budget is spent or the deadline passes"""
+    while budget.take() and (deadline is None or time.perf_counter() < deadline):
+        endpoint, method, path, body, headers = traffic.next_request(rng)
+        started = time.perf_counter()
+        try:
+            status, content, response_headers, queries = traffic.transport.request(method, path, body, headers)
+        except (http.client.HTTPException, OSError):
+            recorder.add(endpoint, time.perf_counter() - started, False, None)
+            continue
+        recorder.add(endpoint, time.perf_counter() - started, status < 400, queries)
+        traffic.record_response(endpoint, path, status, content, response_headers)
+
+
+class Budget:
+    """Thread-safe countdown of the requests left to send (None: unlimited)"""
+
+    def __init__(self, count):
+        self.count = count
+        self.lock = threading.Lock()
+
+    def take(self):
+        if self.count is None:
+            return True
+        with self.lock:
+            if self.count <= 0:
+                return False
+            self.count -= 1
+            return True
+
+
+def load_test(traffic, requests, duration, concurrency, warmup, seed):
+    """Warm up, then replay the mix from `concurrency` threads and return the summary"""
+    if warmup:
+        run(traffic, Recorder(), random.Random(f'{seed}:warmup'), Budget(warmup), None)
+    recorder = Recorder()
+    budget = Budget(None if duration else requests)
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+    if concurrency == 1:
+        run(traffic, recorder, random.Random(seed), budget, deadline)
+    else:
+        threads = [
+            threading.Thread(target=run, args=(traffic, recorder, random.Random(f'{seed}:{index}'), budget, deadline))
+            for index in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return recorder.summary(time.perf_counter() - started)
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('menu', 'create', 'status', 'kitchen'):
+            raise argparse.ArgumentTypeError(f'Unknown scenario {name!r}')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'Invalid weight for {name!r}: {weight!r}')
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError('The mix needs at least one positive weight')
+    return mix
+
+
+def format_value(value, spec):
+    return '-' if value is None else format(value, spec)
+
+
+def print_results(results, baseline=None):
+    print(f"\n{'endpoint':<10} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'queries':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:<10} {result['requests']:>8} {result['errors']:>6} "
+            f"{format_value(result['throughput_rps'], '>9.1f')} {result['p50_ms']:>9.2f} "
+            f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {format_value(result['queries_per_request'], '>8.2f')}"
+        )
+    if baseline:
+        print('\nCompared with the baseline (p95 latency, throughput, queries per request):')
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before:
+                print(
+                    f"{name:<10} p95 {change(before['p95_ms'], result['p95_ms']):>8}  "
+                    f"req/s {change(before['throughput_rps'], result['throughput_rps']):>8}  "
+                    f"queries {change(before['queries_per_request'], result['queries_per_request']):>8}"
+                )
+
+
+def change(before, after):
+    if before is None or after is None:
+        return '-'
+    if not before:
+        return '0.0%' if not after else 'new'
+    return f'{(after - before) / before * 100:+.1f}%'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Base URL of a running server; default is the in-process test client')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Scenario weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests to send (default: 2000)')
+    parser.add_argument('--duration', type=float, help='Run for this many seconds instead of --requests')
+    parser.add_argument('--concurrency', type=int, default=1, help='Client threads (with --url)')
+    parser.add_argument('--warmup', type=int, default=50, help='Unrecorded requests sent first')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--restaurants', type=int, default=20, help='Seeded restaurants (test client)')
+    parser.add_argument('--menu-items', type=int, default=400, help='Seeded menu items (test client)')
+    parser.add_argument('--orders', type=int, default=20000, help='Seeded orders (test client)')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare with')
+    args = parser.parse_args()
+    if args.concurrency > 1 and not args.url:
+        parser.error('--concurrency needs --url: the test client runs in a single thread')
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    if args.url:
+        transport = HttpTransport(args.url)
+        traffic = Traffic.discover(transport, args.mix)
+        results = load_test(traffic, args.requests, args.duration, args.concurrency, args.warmup, args.seed)
+    else:
+        # Work on a throwaway test database so real data is never touched
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            print(f'Seeding {args.restaurants} restaurants and {args.orders} orders...')
+            insert_into_database(SyntheticConfig(
+                restaurants=args.restaurants, menu_items=args.menu_items, orders=args.orders, seed=args.seed,
+            ))
+            traffic = Traffic.discover(TestClientTransport(), args.mix)
+            results = load_test(traffic, args.requests, args.duration, 1, args.warmup, args.seed)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print_results(results, baseline)
+    if args.json:
+        arguments = {**vars(args), 'mix': args.mix}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'arguments': arguments, 'results': results}, f, indent=2)
+        print(f'\nResults written to {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
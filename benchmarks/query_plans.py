@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Index benchmark for the order and menu access paths.
+
+Seeds a large synthetic dataset into a throwaway test database, then for
+each endpoint's main query prints the SQLite EXPLAIN QUERY PLAN and the
+best-of-N timing, first without and then with the composite indexes
+declared on Order/MenuItem.
+
+Usage:
+    python -m benchmarks.query_plans [--restaurants 50] [--orders 200000] [--json results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'waiterapi.settings')
+django.setup()
+
+from django.db import connection
+from django.db.models import Count, Q, Sum
+
+from orders.models import Restaurant, MenuItem, Order
+from orders.synthetic import SyntheticConfig, insert_into_database
+
+# Indexes whose effect is measured (see Order.Meta / MenuItem.Meta)
+BENCHMARKED_INDEXES = {
+    Order: ['order_created_idx', 'order_rest_created_idx', 'order_rest_status_created_idx'],
+    MenuItem: ['menuitem_rest_cat_avail_idx'],
+}
+
+
+def seed(restaurant_count, items_per_restaurant, order_count):
+    """Bulk insert a synthetic dataset (see orders.synthetic)"""
+    insert_into_database(SyntheticConfig(
+        restaurants=restaurant_count,
+        menu_items=restaurant_count * items_per_restaurant,
+        orders=order_count,
+        days=180,
+        seed=42,
+    ))
+    connection.cursor().execute('ANALYZE')
+
+
+def endpoint_queries(restaurant_id):
+    """The main query behind each endpoint"""
+    orders = Order.objects.all()
+    menu = MenuItem.objects.filter(restaurant_id=restaurant_id, is_available=True)
+    return {
+        'orders.list': orders.order_by('-created_at')[:20],
+        'orders.by_restaurant': orders.filter(restaurant_id=restaurant_id).order_by('-created_at')[:20],
+        'restaurants.orders?status=pending': orders.filter(
+            restaurant_id=restaurant_id, status='pending'
+        ).order_by('-created_at')[:20],
+        'orders.statistics?restaurant_id': orders.filter(restaurant_id=restaurant_id).order_by()
+            .values('restaurant_id').annotate(
+                total=Count('id'),
+                pending=Count('id', filter=Q(status='pending')),
+                revenue=Sum('total_amount', filter=Q(status='done')),
+            ),
+        'restaurants.menu': menu.order_by('category', 'name'),
+        'menu_items.list?restaurant&category': menu.filter(category='Main'),
+    }
+
+
+def best_time(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(queryset.all())
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(restaurant_id, repeat):
+    return {
+        name: {'plan': queryset.explain(), 'best_ms': round(best_time(queryset, repeat) * 1000, 3)}
+        for name, queryset in endpoint_queries(restaurant_id).items()
+    }
+
+
+def set_indexes(enabled):
+    with connection.schema_editor() as schema_editor:
+        for model, names in BENCHMARKED_INDEXES.items():
+            for index in model._meta.indexes:
+                if index.name in names:
+                    if enabled:
+                        schema_editor.add_index(model, index)
+                    else:
+                        schema_editor.remove_index(model, index)
+    connection.cursor().execute('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--restaurants', type=int, default=50)
+    parser.add_argument('--items-per-restaurant', type=int, default=40)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    # Work on a throwaway test database so real data is never touched
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        print(f'Seeding {args.restaurants} restaurants and {args.orders} orders...')
+        seed(args.restaurants, args.items_per_restaurant, args.orders)
+        restaurant_id = Restaurant.objects.order_by('id').values_list('id', flat=True)[args.restaurants // 2]
+
+        set_indexes(False)
+        before = measure(restaurant_id, args.repeat)
+        set_indexes(True)
+        after = measure(restaurant_id, args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    for name in before:
+        print(f'\n== {name}')
+        print(f"  before: {before[name]['best_ms']:>10.3f} ms  {before[name]['plan']}")
+        print(f"  after:  {after[name]['best_ms']:>10.3f} ms  {after[name]['plan']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'arguments': vars(args), 'before': before, 'after': after}, f, indent=2)
+        print(f'\nResults written to {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
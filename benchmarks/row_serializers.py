@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of the list/retrieve read path: serializers versus rows.
+
+Seeds a synthetic dataset into a throwaway test database, then for the
+order, menu item and restaurant lists renders pages of --page-size rows to
+JSON, first as the viewsets used to (model instances through the
+ModelSerializer, with the eager loading of get_queryset), then from
+`.values()` rows through the viewsets' RowSerializer (see orders/rows.py).
+Each timing covers fetching the page, its nested rows and rendering the
+JSON; the best of --repeat runs is reported as rows per second, after
+checking both paths render the same bytes.
+
+Usage:
+    python -m benchmarks.row_serializers [--orders 20000] [--page-size 100] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'waiterapi.settings')
+django.setup()
+
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from orders.synthetic import SyntheticConfig, insert_into_database
+from orders.views import MenuItemViewSet, OrderViewSet, RestaurantViewSet
+
+VIEWSETS = {'orders': OrderViewSet, 'menu-items': MenuItemViewSet, 'restaurants': RestaurantViewSet}
+
+
+def render_serialized(view, queryset):
+    # A fresh copy each time: the queryset's result cache would skip the queries
+    return JSONRenderer().render(view.get_serializer_class()(list(queryset.all()), many=True).data)
+
+
+def render_rows(view, queryset):
+    row_serializer = view.row_serializer
+    return JSONRenderer().render(row_serializer.render(row_serializer.rows(queryset)))
+
+
+def best_time(render, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def measure(name, viewset_class, page_size, repeat):
+    view = viewset_class(action='list')
+    page = view.get_queryset()[:page_size]
+    rows = page.count()
+    serialized = render_serialized(view, page)
+    if render_rows(view, page) != serialized:
+        raise AssertionError(f'{name}: the rows render differently from the serializer')
+    result = {'page_rows': rows, 'bytes': len(serialized)}
+    for path, render in (('serializer', render_serialized), ('rows', render_rows)):
+        seconds = best_time(lambda: render(view, page), repeat)
+        result[path] = {'best_ms': round(seconds * 1000, 3), 'rows_per_second': round(rows / seconds)}
+    result['speedup'] = round(result['rows']['rows_per_second'] / result['serializer']['rows_per_second'], 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--restaurants', type=int, default=20)
+    parser.add_argument('--menu-items', type=int, default=400)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--page-size', type=int, default=100, help='Rows rendered per run (default: 100)')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    # Work on a throwaway test database so real data is never touched
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        print(f'Seeding {args.restaurants} restaurants and {args.orders} orders...')
+        insert_into_database(SyntheticConfig(
+            restaurants=args.restaurants, menu_items=args.menu_items, orders=args.orders, seed=42,
+        ))
+        results = {
+            name: measure(name, viewset_class, args.page_size, args.repeat)
+            for name, viewset_class in VIEWSETS.items()
+        }
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(f"\n{'list':<12} {'rows':>5} {'serializer rows/s':>18} {'rows rows/s':>12} {'speedup':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:<12} {result['page_rows']:>5} {result['serializer']['rows_per_second']:>18} "
+            f"{result['rows']['rows_per_second']:>12} {result['speedup']:>7}x"
+        )
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'arguments': vars(args), 'results': results}, f, indent=2)
+        print(f'\nResults written to {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
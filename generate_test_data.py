@@ -10,6 +10,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'waiterapi.settings')
 django.setup()
 
 from orders.models import Restaurant, MenuItem, Order, OrderItem
+from orders.reports import rebuild_rollups
 from django.contrib.auth.models import User
 
 def generate_test_data():
@@ -308,6 +309,9 @@ def generate_test_data():
         quantity=4
     )
     
+    # Order items are created one by one: compute the reporting rollups once at the end
+    rebuild_rollups()
+
     print(f"✅ Created {Restaurant.objects.count()} restaurants")
     print(f"✅ Created {MenuItem.objects.count()} menu items")
     print(f"✅ Created {Order.objects.count()} orders")
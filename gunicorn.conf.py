@@ -0,0 +1,30 @@
+"""
+Gunicorn settings for production (used by start.sh).
+
+Every value can be overridden from the environment: WEB_CONCURRENCY sets the
+number of worker processes, GUNICORN_THREADS the threads of each.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+# Requests mostly wait on SQLite and JSON rendering: a couple of processes per
+# core, each with a few threads to overlap the I/O
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Exported for the workers' settings: some features need state shared between processes
+os.environ['WEB_CONCURRENCY'] = str(workers)
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth, staggered so they don't all restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
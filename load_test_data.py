@@ -2,8 +2,6 @@
 import os
 import sys
 import django
-import json
-from decimal import Decimal
 from datetime import datetime
 
 # Setup Django
@@ -11,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'waiterapi.settings')
 django.setup()
 
 from orders.models import Restaurant, MenuItem, Order, OrderItem
+from orders.loading import BulkLoader, DumpFormatError
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -52,124 +51,21 @@ def load_data_from_json(filename='test_data_dump.json'):
     
     print(f"📁 Loading data from {filename}...")
     
+    # Stream the dump and insert it in bulk (see orders/loading.py)
+    loader = BulkLoader(progress=print)
     try:
         with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except json.JSONDecodeError as e:
+            loader.load(f)
+    except DumpFormatError as e:
         print(f"❌ Error reading JSON file: {e}")
         return False
     except Exception as e:
-        print(f"❌ Error opening file: {e}")
+        print(f"❌ Error loading file: {e}")
         return False
     
-    # Create restaurants first
-    print("🏪 Creating restaurants...")
-    restaurant_id_map = {}  # Maps old IDs to new IDs
-    
-    for rest_data in data.get('restaurants', []):
-        old_id = rest_data['id']
-        restaurant = Restaurant.objects.create(
-            name=rest_data['name'],
-            description=rest_data['description'],
-            is_active=rest_data['is_active']
-        )
-        restaurant_id_map[old_id] = restaurant.id
-        print(f"  ✅ Created: {restaurant.name}")
-    
-    # Create menu items
-    print("🍕 Creating menu items...")
-    menu_item_id_map = {}  # Maps old IDs to new IDs
-    
-    for item_data in data.get('menu_items', []):
-        old_id = item_data['id']
-        old_restaurant_id = item_data['restaurant_id']
-        new_restaurant_id = restaurant_id_map.get(old_restaurant_id)
-        
-        if new_restaurant_id is None:
-            print(f"⚠️  Warning: Restaurant ID {old_restaurant_id} not found for menu item")
-            continue
-        
-        try:
-            restaurant = Restaurant.objects.get(id=new_restaurant_id)
-            menu_item = MenuItem.objects.create(
-                restaurant=restaurant,
-                name=item_data['name'],
-                description=item_data['description'],
-                price=Decimal(item_data['price']),
-                is_available=item_data['is_available'],
-                category=item_data['category']
-            )
-            menu_item_id_map[old_id] = menu_item.id
-            print(f"  ✅ Created: {menu_item.name} at {restaurant.name}")
-        except Exception as e:
-            print(f"❌ Error creating menu item {item_data['name']}: {e}")
-            continue
-    
-    # Create orders
-    print("📋 Creating orders...")
-    order_id_map = {}  # Maps old IDs to new IDs
-    
-    for order_data in data.get('orders', []):
-        old_id = order_data['id']
-        old_restaurant_id = order_data['restaurant_id']
-        new_restaurant_id = restaurant_id_map.get(old_restaurant_id)
-        
-        if new_restaurant_id is None:
-            print(f"⚠️  Warning: Restaurant ID {old_restaurant_id} not found for order")
-            continue
-        
-        try:
-            restaurant = Restaurant.objects.get(id=new_restaurant_id)
-            order = Order.objects.create(
-                restaurant=restaurant,
-                customer_name=order_data['customer_name'],
-                status=order_data['status'],
-                total_amount=Decimal(order_data['total_amount']),
-                notes=order_data['notes']
-            )
-            order_id_map[old_id] = order.id
-            print(f"  ✅ Created order for: {order.customer_name} at {restaurant.name}")
-        except Exception as e:
-            print(f"❌ Error creating order for {order_data['customer_name']}: {e}")
-            continue
-    
-    # Create order items
-    print("🛒 Creating order items...")
-    
-    for item_data in data.get('order_items', []):
-        old_order_id = item_data['order_id']
-        old_menu_item_id = item_data['menu_item_id']
-        new_order_id = order_id_map.get(old_order_id)
-        new_menu_item_id = menu_item_id_map.get(old_menu_item_id)
-        
-        if new_order_id is None:
-            print(f"⚠️  Warning: Order ID {old_order_id} not found for order item")
-            continue
-        
-        if new_menu_item_id is None:
-            print(f"⚠️  Warning: Menu item ID {old_menu_item_id} not found for order item")
-            continue
-        
-        try:
-            order = Order.objects.get(id=new_order_id)
-            menu_item = MenuItem.objects.get(id=new_menu_item_id)
-            
-            order_item = OrderItem.objects.create(
-                order=order,
-                menu_item=menu_item,
-                quantity=item_data['quantity'],
-                special_instructions=item_data['special_instructions']
-            )
-            print(f"  ✅ Added {menu_item.name} x{order_item.quantity} to order for {order.customer_name}")
-        except Exception as e:
-            print(f"❌ Error creating order item: {e}")
-            continue
-    
-    # Update order totals
-    print("💰 Updating order totals...")
-    for order in Order.objects.all():
-        order.calculate_total()
-        order.save()
+    for section, skipped in loader.skipped.items():
+        if skipped:
+            print(f"⚠️  Warning: skipped {skipped} {section} whose parent was not found")
     
     return True
 
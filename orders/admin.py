@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Restaurant, MenuItem, Order, OrderItem
+from .reports import refresh_rollups
 
 
 @admin.register(Restaurant)
@@ -35,10 +36,20 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInline]
 
     def save_related(self, request, form, formsets, change):
-        """Override to recalculate total when order items change"""
+        """Override to recalculate total and reporting rollups when the order changes"""
         super().save_related(request, form, formsets, change)
         form.instance.calculate_total()
         form.instance.save()
+        refresh_rollups([form.instance])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_rollups([obj])
+
+    def delete_queryset(self, request, queryset):
+        orders = list(queryset)
+        super().delete_queryset(request, queryset)
+        refresh_rollups(orders)
 
 
 @admin.register(OrderItem)
@@ -47,3 +58,20 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_filter = ['order__restaurant', 'menu_item__category']
     search_fields = ['order__customer_name', 'menu_item__name']
     readonly_fields = ['unit_price', 'subtotal']
+
+    def save_model(self, request, obj, form, change):
+        """Override to refresh the reporting rollups of the item's order"""
+        super().save_model(request, obj, form, change)
+        refresh_rollups([obj.order])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_rollups([obj.order])
+
+    def delete_queryset(self, request, queryset):
+        # One by one so OrderItem.delete updates the order totals
+        orders = {}
+        for item in queryset.select_related('order'):
+            item.delete()
+            orders[item.order_id] = item.order
+        refresh_rollups(orders.values())
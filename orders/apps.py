@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
+
+    def ready(self):
+        from .metrics import install_query_recorder
+        from .querydetector import install_query_watcher
+
+        # Every connection, in every thread, reports its queries to the
+        # request being measured or watched (a no-op unless REQUEST_METRICS
+        # or QUERY_DETECTOR is on)
+        connection_created.connect(install_query_recorder)
+        connection_created.connect(install_query_watcher)
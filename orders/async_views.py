@@ -0,0 +1,248 @@
+"""
+Async variants of the hot read endpoints.
+
+Under ASGI (ASYNC_READ_VIEWS, on by default in waiterapi/asgi.py) GET
+requests for the restaurant list, restaurant menus, the order list, order
+details and order statistics are answered by these views with the async
+ORM, so a request waiting on a slow client holds no worker thread (static
+files are served ahead of the middleware, see waiterapi/static.py, which
+keeps the chain async). The queries themselves still run one at a time on
+the process's single sync thread. Lists and details are rendered from
+`.values()` rows by the viewsets' row serializers, ?fields=/?expand=
+included. Everything else on those URLs (writes, ?stream=true, cursor
+pagination) still goes to the viewsets, which also provide the querysets,
+filters and serializers: responses are the same either way.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .cache import acreate_menu_version, aget_menu_version, menu_cache_enabled, menu_cache_key, menu_cache_timeout
+from .conditional import aqueryset_validators, etag_matches, not_modified, set_validators
+from .metrics import current_metrics
+from .models import Restaurant, Order
+from .pagination import page_cache_variant, restore_page, wants_cursor
+from .serializers import MenuItemSerializer
+from .streaming import wants_stream
+from .views import (
+    RestaurantViewSet, OrderViewSet, format_statistics_breakdown, format_statistics_totals,
+    statistics_aggregates, statistics_breakdown_rows, statistics_queryset,
+)
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    """Render `data` as JSONRenderer does for the viewsets, timed like DRF responses (see orders.metrics)"""
+    started = time.perf_counter()
+    response = HttpResponse(
+        JSONRenderer().render(data) if data is not None else b'',
+        status=status, content_type='application/json', headers=headers,
+    )
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.render_time += time.perf_counter() - started
+    return response
+
+
+def viewset_for(viewset_class, request, action, **kwargs):
+    """An instance of the viewset set up as for `action`, for its querysets and filters"""
+    view = viewset_class(action=action, args=(), kwargs=kwargs, format_kwarg=None)
+    view.request = Request(request)
+    return view
+
+
+async def filtered_queryset(view):
+    """The viewset's filtered queryset; filter validation may query the database"""
+    return await sync_to_async(view.filter_queryset)(view.get_queryset())
+
+
+async def paginate(view, queryset, serializer_class):
+    """
+    Page of `queryset` rendered as the viewset's page-number pagination
+    renders it, with the count and page fetched through the async ORM
+    """
+    paginator, results = await paginate_page(view, queryset, serializer_class)
+    return paginator.get_paginated_response(results).data
+
+
+async def paginate_rows(view, queryset, row_serializer):
+    """paginate() for a queryset of rows, rendered by `row_serializer`"""
+    paginator = await fetch_page(view, queryset)
+    return paginator.get_paginated_response(await row_serializer.arender(paginator.page.object_list)).data
+
+
+async def paginate_page(view, queryset, serializer_class):
+    """The viewset's paginator set up for the requested page of `queryset`, and the page's rows rendered"""
+    paginator = await fetch_page(view, queryset)
+    return paginator, serializer_class(paginator.page.object_list, many=True).data
+
+
+async def fetch_page(view, queryset):
+    """The viewset's paginator set up for the requested page of `queryset`, with the page fetched"""
+    paginator = view.pagination_class()
+    request = view.request
+    django_paginator = paginator.django_paginator_class(queryset, paginator.get_page_size(request))
+    django_paginator.count = await queryset.acount()
+    page_number = request.query_params.get(paginator.page_query_param) or 1
+    if page_number in paginator.last_page_strings:
+        page_number = django_paginator.num_pages
+    try:
+        paginator.page = django_paginator.page(page_number)
+    except InvalidPage as exc:
+        raise exceptions.NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    paginator.page.object_list = [obj async for obj in paginator.page.object_list]
+    paginator.request = request
+    return paginator
+
+
+async def conditional_list(view):
+    """Like ConditionalGetMixin.list over RowSerializerMixin.list: 304 when unchanged, else the page of rows"""
+    request = view.request
+    try:
+        row_serializer = view.get_row_serializer()
+    except ValueError as exc:
+        return json_response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    queryset = await filtered_queryset(view)
+    rows = row_serializer.rows(queryset, view.row_columns)
+    if wants_cursor(request):
+        return json_response(await paginate_rows(view, rows, row_serializer))
+    etag, last_modified = await aqueryset_validators(
+        request, queryset, view.conditional_timestamps, view.conditional_counts,
+        listing=True, related=view.conditional_related,
+    )
+    if not_modified(request, etag, last_modified):
+        return set_validators(json_response(None, status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+    return set_validators(json_response(await paginate_rows(view, rows, row_serializer)), etag, last_modified)
+
+
+async def restaurant_list(request):
+    return await conditional_list(viewset_for(RestaurantViewSet, request, 'list'))
+
+
+async def aget_restaurant(pk):
+    try:
+        return await Restaurant.objects.aget(pk=pk)
+    except (Restaurant.DoesNotExist, ValueError):
+        raise exceptions.NotFound('No Restaurant matches the given query.')
+
+
+async def restaurant_menu(request, pk):
+    """RestaurantViewSet.menu: shares its cached pages and ETags"""
+    view = viewset_for(RestaurantViewSet, request, 'menu', pk=pk)
+    if wants_stream(view.request):
+        return None
+    if not menu_cache_enabled():
+        restaurant = await aget_restaurant(pk)
+        return json_response(await paginate(view, view.menu_queryset(restaurant), MenuItemSerializer))
+
+    restaurant = None
+    version = await aget_menu_version(pk)
+    if version is None:
+        restaurant = await aget_restaurant(pk)
+        version = await acreate_menu_version(restaurant.pk)
+    etag = f'"menu-{pk}-{version}"'
+    if etag_matches(request, etag):
+        return json_response(None, status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    paginator = view.pagination_class()
+    key = menu_cache_key(pk, version, page_cache_variant(paginator, view.request))
+    cached = await cache.aget(key)
+    if cached is None:
+        restaurant = restaurant or await aget_restaurant(pk)
+        paginator, results = await paginate_page(view, view.menu_queryset(restaurant), MenuItemSerializer)
+        cached = {'count': paginator.page.paginator.count, 'page': paginator.page.number, 'results': results}
+        await cache.aset(key, cached, menu_cache_timeout())
+    restore_page(paginator, view.request, cached['count'], cached['page'])
+    return json_response(paginator.get_paginated_response(cached['results']).data, headers={'ETag': etag})
+
+
+async def order_list(request):
+    view = viewset_for(OrderViewSet, request, 'list')
+    if wants_cursor(view.request):
+        return None
+    return await conditional_list(view)
+
+
+async def order_detail(request, pk):
+    """OrderViewSet.retrieve, with its validators"""
+    view = viewset_for(OrderViewSet, request, 'retrieve', pk=pk)
+    try:
+        row_serializer = view.get_row_serializer()
+    except ValueError as exc:
+        return json_response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    queryset = (await filtered_queryset(view)).filter(pk=pk)
+    etag, last_modified = await aqueryset_validators(
+        request, queryset, view.conditional_timestamps, view.conditional_counts, related=view.conditional_related
+    )
+    if not_modified(request, etag, last_modified):
+        return set_validators(json_response(None, status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+    try:
+        row = await row_serializer.rows(queryset, view.row_columns).aget()
+    except Order.DoesNotExist:
+        raise exceptions.NotFound('No Order matches the given query.')
+    view.check_object_permissions(view.request, row)
+    return set_validators(json_response((await row_serializer.arender([row]))[0]), etag, last_modified)
+
+
+async def order_statistics(request):
+    view = viewset_for(OrderViewSet, request, 'statistics')
+    try:
+        queryset = statistics_queryset(view.get_queryset(), request.GET)
+    except ValueError as exc:
+        return json_response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    if request.GET.get('group_by') != 'restaurant':
+        totals = await queryset.order_by().aaggregate(**statistics_aggregates())
+        return json_response(format_statistics_totals(totals))
+    rows = [row async for row in statistics_breakdown_rows(queryset)]
+    return json_response(format_statistics_breakdown(rows))
+
+
+def read_view(async_get, viewset, actions, **initkwargs):
+    """
+    View answering GET with `async_get`, unless it returns None, and every
+    other method with the viewset's actions, as the router would
+    """
+    sync_view = viewset.as_view(actions, **initkwargs)
+
+    @csrf_exempt
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET':
+            try:
+                response = await async_get(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                # As DRF's exception handler renders them
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                response = json_response(data, status=exc.status_code)
+            if response is not None:
+                return response
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    # Labels the endpoint and finds its query budget like the viewset's own (see orders.metrics)
+    view.cls = viewset
+    view.actions = actions
+    return view
+
+
+restaurants = read_view(
+    restaurant_list, RestaurantViewSet, {'get': 'list', 'post': 'create'}, basename='restaurant', detail=False,
+)
+menu = read_view(
+    restaurant_menu, RestaurantViewSet, {'get': 'menu'}, basename='restaurant', detail=True,
+)
+orders = read_view(
+    order_list, OrderViewSet, {'get': 'list', 'post': 'create'}, basename='order', detail=False,
+)
+order = read_view(
+    order_detail, OrderViewSet,
+    {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+    basename='order', detail=True,
+)
+statistics = read_view(
+    order_statistics, OrderViewSet, {'get': 'statistics'}, basename='order', detail=False,
+)
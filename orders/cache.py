@@ -0,0 +1,82 @@
+"""
+Server-side caching of restaurant menus.
+
+Each restaurant has a menu version stored in the Django cache. Cached menus
+are keyed by that version, so bumping it on any MenuItem/Restaurant write
+invalidates every cached representation at once without having to know
+which keys exist. Versions are bumped when the write commits. Versions are
+random tokens rather than counters so they never repeat after the cache is
+cleared or evicted, which also makes them safe to expose as ETags. Versions
+expire with the menus they key.
+
+A local-memory cache only sees the writes of its own process: with several
+worker processes menus are only cached in a shared backend (MENU_CACHE).
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def menu_version_key(restaurant_id):
+    return f'menu-version:{restaurant_id}'
+
+
+def get_menu_version(restaurant_id):
+    """Return the current menu version, None when none is cached"""
+    return cache.get(menu_version_key(restaurant_id))
+
+
+async def aget_menu_version(restaurant_id):
+    """Async version of get_menu_version"""
+    return await cache.aget(menu_version_key(restaurant_id))
+
+
+def create_menu_version(restaurant_id):
+    """
+    Store a new menu version for an existing restaurant, or return the one
+    set concurrently by another process. Only called once the restaurant
+    has been found, so unknown ids never get a version.
+    """
+    key = menu_version_key(restaurant_id)
+    version = uuid.uuid4().hex
+    if not cache.add(key, version, menu_cache_timeout()):
+        version = cache.get(key, version)
+    return version
+
+
+async def acreate_menu_version(restaurant_id):
+    """Async version of create_menu_version"""
+    key = menu_version_key(restaurant_id)
+    version = uuid.uuid4().hex
+    if not await cache.aadd(key, version, menu_cache_timeout()):
+        version = await cache.aget(key, version)
+    return version
+
+
+def bump_menu_version(*restaurant_ids):
+    """
+    Invalidate the cached menus of the given restaurants once the current
+    transaction commits: their versions are dropped and the next read stores
+    a new one. Dropping them earlier would let a concurrent read cache the
+    not yet committed menu under a fresh version.
+    """
+    keys = [menu_version_key(restaurant_id) for restaurant_id in restaurant_ids if restaurant_id]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def menu_cache_key(restaurant_id, version, variant=()):
+    """Key of one cached menu representation; `variant` covers e.g. the page requested"""
+    digest = hashlib.md5(repr(variant).encode()).hexdigest()
+    return f'menu:{restaurant_id}:{version}:{digest}'
+
+
+def menu_cache_enabled():
+    return getattr(settings, 'MENU_CACHE', True)
+
+
+def menu_cache_timeout():
+    return getattr(settings, 'MENU_CACHE_TIMEOUT', 60 * 60)
+
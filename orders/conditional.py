@@ -0,0 +1,154 @@
+"""
+Conditional GET (ETag / Last-Modified) support for the API viewsets.
+
+Validators are derived from a single aggregate query over the rows a
+response would render (latest `updated_at` values and row counts), so a
+client polling unchanged data gets a 304 without the body ever being
+queried or serialized. Small related tables rendered alongside large ones
+(restaurant and menu item names in orders) are compared as a whole with a
+second aggregate rather than joined to every row.
+"""
+import hashlib
+from functools import partial
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .pagination import wants_cursor
+
+
+def etag_matches(request, etag):
+    """Return True when the request's If-None-Match header matches `etag`"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags or f'W/{etag}' in etags
+
+
+def validator_aggregates(timestamps, counts=()):
+    """
+    Aggregates describing the state of the rendered rows.
+    `timestamps` are the datetime fields whose latest value changes with the
+    rendered data; `counts` are relations whose size is rendered as well.
+    The row count catches deletions, which leave no timestamp behind; it
+    only needs DISTINCT when relations are joined in.
+    """
+    joined = bool(counts) or any('__' in field for field in timestamps)
+    aggregates = {'count': Count('pk', distinct=joined)}
+    for field in timestamps:
+        aggregates[f'max_{field}'] = Max(field)
+    for relation in counts:
+        aggregates[f'count_{relation}'] = Count(relation, distinct=True)
+    return aggregates
+
+
+def with_related_state(state, model, model_state):
+    """`state` extended with the aggregated state of the related `model` table"""
+    prefix = model._meta.model_name
+    return {**state, **{f'{prefix}_{key}': value for key, value in model_state.items()}}
+
+
+def queryset_validators(request, queryset, timestamps, counts=(), listing=False, related=()):
+    """
+    Compute (etag, last_modified) for rendering `queryset` at this URL.
+    `related` lists (model, timestamps, counts) of whole tables whose rows
+    are rendered as well.
+    Lists and responses rendering relation counts get no last_modified:
+    deletions only show in the counts, which If-Modified-Since can't compare.
+    """
+    state = queryset.order_by().aggregate(**validator_aggregates(timestamps, counts))
+    for model, model_timestamps, model_counts in related:
+        aggregates = validator_aggregates(model_timestamps, model_counts)
+        state = with_related_state(state, model, model._default_manager.order_by().aggregate(**aggregates))
+    return validators_from_state(request, state, timestamps, with_last_modified=not (listing or counts or related))
+
+
+async def aqueryset_validators(request, queryset, timestamps, counts=(), listing=False, related=()):
+    """Async version of queryset_validators"""
+    state = await queryset.order_by().aaggregate(**validator_aggregates(timestamps, counts))
+    for model, model_timestamps, model_counts in related:
+        aggregates = validator_aggregates(model_timestamps, model_counts)
+        state = with_related_state(state, model, await model._default_manager.order_by().aaggregate(**aggregates))
+    return validators_from_state(request, state, timestamps, with_last_modified=not (listing or counts or related))
+
+
+def validators_from_state(request, state, timestamps, with_last_modified=True):
+    """(etag, last_modified) from the aggregated state of the rows"""
+    digest = hashlib.md5(repr((request.get_full_path(), sorted(state.items()))).encode())
+    etag = quote_etag(digest.hexdigest())
+    moments = [state[f'max_{field}'] for field in timestamps if state[f'max_{field}']]
+    last_modified = max(moments).timestamp() if moments and with_last_modified else None
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """Evaluate If-None-Match, falling back to If-Modified-Since when absent"""
+    if request.headers.get('If-None-Match'):
+        return etag_matches(request, etag)
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and last_modified is not None and int(last_modified) <= since
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag/Last-Modified headers to list and retrieve, answering 304 when
+    the client's copy is still current.
+    """
+    # Datetime fields whose latest value changes whenever the response does
+    conditional_timestamps = ['updated_at']
+    # Relations whose size is part of the response
+    conditional_counts = []
+    # (model, timestamps, counts) of small tables rendered in full, compared
+    # table-wide instead of joining them to every row
+    conditional_related = []
+
+    def conditional_get(self, request, queryset, render, timestamps=None, counts=None, listing=True, related=None):
+        """
+        Return a 304 for an unchanged `queryset`, otherwise `render()` with validators.
+        `timestamps`/`counts`/`related` override the viewset defaults for
+        actions rendering another model; `listing` is False for single objects.
+        Cursor pages go without validators: aggregating over every matching
+        row is the cost keyset pagination avoids.
+        """
+        if wants_cursor(request):
+            return render()
+        etag, last_modified = queryset_validators(
+            request, queryset,
+            self.conditional_timestamps if timestamps is None else timestamps,
+            self.conditional_counts if counts is None else counts,
+            listing=listing,
+            related=self.conditional_related if related is None else related,
+        )
+        if not_modified(request, etag, last_modified):
+            return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+        response = render()
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, etag, last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_get(request, queryset, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        render = partial(super().retrieve, request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, DjangoValidationError):
+            # Malformed lookups are reported by the regular retrieve path
+            return render()
+        return self.conditional_get(request, queryset, render, listing=False)
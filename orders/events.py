@@ -0,0 +1,105 @@
+"""
+Real-time order events.
+
+Order writes publish events per restaurant to a broker; the server-sent
+events endpoint subscribes to it and pushes them to kitchen screens and
+customer pagers. The default InProcessBroker fans events out within a
+single process, so the streams refuse to run with several workers (see
+WEB_CONCURRENCY). Multi-process deployments can plug in another backend
+through the ORDER_EVENTS_BROKER setting: any class providing
+`publish(restaurant_id, event)` and `subscribe(restaurant_id)` returning a
+subscription with `async get(timeout)` and `close()`.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """Queue of events for one connected client, bound to its event loop"""
+
+    def __init__(self, broker, restaurant_id, max_pending=100):
+        self.broker = broker
+        self.restaurant_id = restaurant_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending)
+
+    def put(self, event):
+        """Thread-safe delivery; events for a client too slow to keep up are dropped"""
+        def deliver():
+            if not self.queue.full():
+                self.queue.put_nowait(event)
+        try:
+            self.loop.call_soon_threadsafe(deliver)
+        except RuntimeError:
+            # The client's event loop is gone; it will unsubscribe on its own
+            pass
+
+    async def get(self, timeout):
+        """Return the next event, or None when nothing arrived within `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fans order events out to the subscribers of this process"""
+    # Subscribers of other worker processes never see the events
+    single_process = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def publish(self, restaurant_id, event):
+        with self.lock:
+            subscribers = list(self.subscribers.get(restaurant_id, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscribe(self, restaurant_id):
+        """Must be called from the event loop that will consume the events"""
+        subscription = Subscription(self, restaurant_id)
+        with self.lock:
+            self.subscribers[restaurant_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.restaurant_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[subscription.restaurant_id]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured by ORDER_EVENTS_BROKER"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'ORDER_EVENTS_BROKER', 'orders.events.InProcessBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish_order_event(event_type, order_data):
+    """
+    Publish an order event once the current transaction commits, so clients
+    never hear about orders that were rolled back.
+    """
+    event = {'type': event_type, 'order': order_data}
+    transaction.on_commit(lambda: get_broker().publish(order_data['restaurant'], event))
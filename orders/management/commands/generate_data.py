@@ -0,0 +1,92 @@
+import time
+from datetime import datetime, time as dt_time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from orders.models import Restaurant, MenuItem, Order, OrderItem
+from orders.synthetic import DEFAULT_CHUNK_SIZE, SyntheticConfig, insert_into_database, write_dump
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a reproducible synthetic dataset of any size for load testing, '
+        'bulk inserted into the database or streamed to a JSON dump'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=20)
+        parser.add_argument('--menu-items', type=int, default=400, help='Total menu items, spread over the restaurants')
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--days', type=int, default=90, help='Orders are spread over this many days up to now')
+        parser.add_argument(
+            '--end', help='Date or datetime the timeline ends at (default: now); fix it to reproduce a dataset later',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Same seed, volumes and end, same dataset')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes generating order chunks in parallel (output does not depend on it)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f'Orders per generated chunk, insert query and transaction (default: {DEFAULT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--output',
+            help='Stream a JSON dump to this file (load it with load_dump) instead of inserting into the database',
+        )
+        parser.add_argument(
+            '--keep-existing', action='store_true',
+            help='Add to the existing data instead of clearing it first, reusing restaurants and menu items by name',
+        )
+
+    def handle(self, *args, **options):
+        for name in ('restaurants', 'menu_items', 'workers', 'chunk_size', 'days'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} must be at least 1')
+        if options['orders'] < 0:
+            raise CommandError('--orders cannot be negative')
+
+        end = None
+        if options['end']:
+            end = parse_datetime(options['end'])
+            if end is None:
+                day = parse_date(options['end'])
+                end = datetime.combine(day, dt_time.min) if day else None
+            if end is None:
+                raise CommandError('--end must be an ISO date or datetime')
+            if timezone.is_naive(end):
+                end = timezone.make_aware(end)
+
+        config = SyntheticConfig(
+            restaurants=options['restaurants'],
+            menu_items=options['menu_items'],
+            orders=options['orders'],
+            days=options['days'],
+            seed=options['seed'],
+            end=end,
+            chunk_size=options['chunk_size'],
+        )
+        started = time.perf_counter()
+        try:
+            self.generate(config, options)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s'))
+
+    def generate(self, config, options):
+        if options['output']:
+            self.stdout.write(f'Writing {config.orders:,} orders to {options["output"]}...')
+            try:
+                with open(options['output'], 'w', encoding='utf-8') as f:
+                    write_dump(config, f, workers=options['workers'], progress=self.stdout.write)
+            except OSError as exc:
+                raise CommandError(f'Cannot write {options["output"]}: {exc}')
+        else:
+            if not options['keep_existing']:
+                self.stdout.write('Clearing existing data...')
+                for model in (OrderItem, Order, MenuItem, Restaurant):
+                    model.objects.all().delete()
+            self.stdout.write(f'Inserting {config.orders:,} orders...')
+            insert_into_database(config, workers=options['workers'], progress=self.stdout.write)
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from orders.loading import BulkLoader, DumpFormatError, DEFAULT_CHUNK_SIZE
+from orders.models import Restaurant, MenuItem, Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Bulk load a JSON data dump (as written by generate_test_data.py), streaming the file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename', nargs='?', default='test_data_dump.json')
+        parser.add_argument(
+            '--keep-existing', action='store_true',
+            help='Add to the existing data instead of clearing it first, reusing restaurants and menu items by name',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f'Rows inserted per query and transaction (default: {DEFAULT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if not options['keep_existing']:
+            self.stdout.write('Clearing existing data...')
+            for model in (OrderItem, Order, MenuItem, Restaurant):
+                model.objects.all().delete()
+
+        loader = BulkLoader(chunk_size=options['chunk_size'], progress=self.stdout.write)
+        started = time.perf_counter()
+        try:
+            with open(options['filename'], 'r', encoding='utf-8') as f:
+                counts = loader.load(f)
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["filename"]}: {exc}')
+        except DumpFormatError as exc:
+            raise CommandError(f'Invalid dump {options["filename"]}: {exc}')
+        except IntegrityError as exc:
+            raise CommandError(f'Cannot load {options["filename"]}: {exc}')
+
+        for section, count in counts.items():
+            skipped, reused = loader.skipped[section], loader.reused[section]
+            note = f' ({skipped:,} skipped: missing parent)' if skipped else ''
+            note += f' ({reused:,} already there)' if reused else ''
+            self.stdout.write(f'  {section}: {count:,}{note}')
+        self.stdout.write(self.style.SUCCESS(f'Loaded in {time.perf_counter() - started:.1f}s'))
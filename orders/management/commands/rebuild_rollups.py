@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from orders.reports import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly reporting rollups from the raw order tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rollup rows inserted per query (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        order_rows, item_rows = rebuild_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {order_rows} order rollups and {item_rows} menu item rollups'
+        ))
@@ -0,0 +1,255 @@
+"""
+Per-request SQL and timing metrics.
+
+When REQUEST_METRICS is enabled, RequestMetricsMiddleware times every request
+and a database execute wrapper, installed on each new connection at startup
+(see OrdersConfig.ready), adds the duration of every query to the metrics of
+the request it runs for. The current request is tracked in a context
+variable, so queries run through sync_to_async in async views count too.
+Serializers and row serializers time the representations they build with
+timed_serialization.
+
+Results go out in a Server-Timing header and into in-process histograms per
+view and action, rendered in Prometheus text format by the /api/_metrics/
+endpoint. Each worker process keeps its own histograms.
+"""
+import functools
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Upper bounds of the histogram buckets
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """Counters of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        # Building the representation of the data (serializers and row
+        # serializers), less the queries they run
+        self.serialize_time = 0.0
+        self.serializing = False
+        # Rendering the response body to JSON
+        self.render_time = 0.0
+        self.view = 'unresolved'
+        self.action = ''
+
+    def server_timing(self, total):
+        app = max(total - self.db_time - self.serialize_time - self.render_time, 0.0)
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.2f}',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'app;dur={app * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current request's metrics"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def timed_serialization(func):
+    """
+    Decorator adding the time spent in `func` to the current request's
+    serialization time, less its queries. Calls nested in another timed call
+    (nested serializers) are counted by the outer one.
+    """
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serializing:
+            return func(*args, **kwargs)
+        metrics.serializing = True
+        started, db_time = time.perf_counter(), metrics.db_time
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.serializing = False
+            metrics.serialize_time += time.perf_counter() - started - (metrics.db_time - db_time)
+    return timed
+
+
+def view_label(request, view_func):
+    """(view, action) naming the endpoint: viewset class and action, or the view function"""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', type(view_func).__name__), ''
+    method = request.method.lower()
+    return view_class.__name__, (getattr(view_func, 'actions', None) or {}).get(method, method)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Histograms and request counters per (view, action)"""
+
+    histograms = {
+        'waiter_request_duration_seconds': ('Wall time of API requests', DURATION_BUCKETS),
+        'waiter_request_db_seconds': ('Time spent in database queries per request', DURATION_BUCKETS),
+        'waiter_request_serialize_seconds': ('Time spent serializing data per request', DURATION_BUCKETS),
+        'waiter_request_render_seconds': ('Time spent rendering response bodies per request', DURATION_BUCKETS),
+        'waiter_request_queries': ('Database queries per request', QUERY_COUNT_BUCKETS),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.series = {}  # (view, action) -> {histogram name: Histogram}
+            self.responses = {}  # (view, action, status) -> count
+
+    def observe(self, metrics, total, status):
+        key = (metrics.view, metrics.action)
+        values = {
+            'waiter_request_duration_seconds': total,
+            'waiter_request_db_seconds': metrics.db_time,
+            'waiter_request_serialize_seconds': metrics.serialize_time,
+            'waiter_request_render_seconds': metrics.render_time,
+            'waiter_request_queries': metrics.queries,
+        }
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {
+                    name: Histogram(buckets) for name, (_, buckets) in self.histograms.items()
+                }
+            for name, value in values.items():
+                series[name].observe(value)
+            response_key = key + (status,)
+            self.responses[response_key] = self.responses.get(response_key, 0) + 1
+
+    def render(self):
+        """The metrics in Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name, (description, buckets) in self.histograms.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (view, action), series in sorted(self.series.items()):
+                    histogram = series[name]
+                    labels = f'view="{escape(view)}",action="{escape(action)}"'
+                    for bound, count in zip(buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+            lines.append('# HELP waiter_requests_total API requests by response status')
+            lines.append('# TYPE waiter_requests_total counter')
+            for (view, action, status), count in sorted(self.responses.items()):
+                lines.append(
+                    f'waiter_requests_total{{view="{escape(view)}",action="{escape(action)}",status="{status}"}} {count}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count, DB time, serialization time, response rendering
+    time and wall time of every request (opt-in with the REQUEST_METRICS
+    setting). Streaming responses are measured until their first byte is ready.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return None
+        metrics.view, metrics.action = view_label(request, view_func)
+        return None
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook: time it up to the post-render callback
+        metrics = current_metrics.get()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.render_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, response, metrics):
+        total = time.perf_counter() - metrics.started
+        response['Server-Timing'] = metrics.server_timing(total)
+        registry.observe(metrics, total, response.status_code)
+        return response
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:34
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_table_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(help_text='Start of the hour (UTC) the orders were created in')),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='orders.menuitem')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='menu_item_rollups', to='orders.restaurant')),
+            ],
+            options={
+                'ordering': ['restaurant', 'period_start', 'menu_item'],
+                'unique_together': {('restaurant', 'period_start', 'menu_item')},
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(help_text='Start of the hour (UTC) the orders were created in')),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('done_orders', models.PositiveIntegerField(default=0)),
+                ('cancelled_orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_rollups', to='orders.restaurant')),
+            ],
+            options={
+                'ordering': ['restaurant', 'period_start'],
+                'unique_together': {('restaurant', 'period_start')},
+            },
+        ),
+    ]
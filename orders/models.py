@@ -2,6 +2,8 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from .cache import bump_menu_version
+
 
 class Restaurant(models.Model):
     """Model representing a restaurant in the food court"""
@@ -17,6 +19,17 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Override save to invalidate the cached menu (it shows the restaurant name)"""
+        super().save(*args, **kwargs)
+        bump_menu_version(self.pk)
+
+    def delete(self, *args, **kwargs):
+        restaurant_id = self.pk
+        result = super().delete(*args, **kwargs)
+        bump_menu_version(restaurant_id)
+        return result
+
 
 class MenuItem(models.Model):
     """Model representing menu items for each restaurant"""
@@ -32,10 +45,24 @@ class MenuItem(models.Model):
     class Meta:
         ordering = ['restaurant', 'category', 'name']
         unique_together = ['restaurant', 'name']
+        indexes = [
+            # Restaurant menus ordered by category and name, availability checked in the index
+            models.Index(fields=['restaurant', 'category', 'name', 'is_available'], name='menuitem_rest_cat_avail_idx'),
+        ]
 
     def __str__(self):
         return f"{self.restaurant.name} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        """Override save to invalidate the cached menu of the restaurant"""
+        super().save(*args, **kwargs)
+        bump_menu_version(self.restaurant_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_menu_version(self.restaurant_id)
+        return result
+
 
 class Order(models.Model):
     """Model representing customer orders"""
@@ -57,6 +84,14 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset scans of the changes feed
+            models.Index(fields=['updated_at', 'id'], name='order_updated_id_idx'),
+            # Order lists, newest first: overall, per restaurant and per restaurant + status
+            models.Index(fields=['-created_at'], name='order_created_idx'),
+            models.Index(fields=['restaurant', '-created_at'], name='order_rest_created_idx'),
+            models.Index(fields=['restaurant', 'status', '-created_at'], name='order_rest_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.customer_name} at {self.restaurant.name}"
@@ -83,6 +118,9 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity}x {self.menu_item.name} for Order #{self.order.id}"
 
+    # The reporting rollups are refreshed by the order-level write paths (the
+    # views and the admin), once per order rather than once per item
+
     def save(self, *args, **kwargs):
         """Override save to calculate subtotal automatically"""
         self.unit_price = self.menu_item.price
@@ -91,3 +129,43 @@ class OrderItem(models.Model):
         # Update order total after saving order item
         self.order.calculate_total()
         self.order.save()
+
+    def delete(self, *args, **kwargs):
+        """Override delete to update the order total as save does"""
+        result = super().delete(*args, **kwargs)
+        self.order.calculate_total()
+        self.order.save()
+        return result
+
+
+class OrderRollup(models.Model):
+    """Hourly order totals per restaurant, maintained by orders.reports"""
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='order_rollups')
+    period_start = models.DateTimeField(help_text="Start of the hour (UTC) the orders were created in")
+    orders_count = models.PositiveIntegerField(default=0)
+    done_orders = models.PositiveIntegerField(default=0)
+    cancelled_orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['restaurant', 'period_start']
+        unique_together = ['restaurant', 'period_start']
+
+    def __str__(self):
+        return f"{self.restaurant_id} @ {self.period_start:%Y-%m-%d %H:00}"
+
+
+class MenuItemRollup(models.Model):
+    """Hourly quantity and revenue of each menu item sold in completed orders"""
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='menu_item_rollups')
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='rollups')
+    period_start = models.DateTimeField(help_text="Start of the hour (UTC) the orders were created in")
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['restaurant', 'period_start', 'menu_item']
+        unique_together = ['restaurant', 'period_start', 'menu_item']
+
+    def __str__(self):
+        return f"{self.menu_item_id} @ {self.period_start:%Y-%m-%d %H:00}"
@@ -0,0 +1,67 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination over orders, newest first.
+    Pages are located by position instead of OFFSET and no COUNT(*) query
+    is issued, so deep pages cost the same as the first one.
+    """
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        # Always page on (created_at, id): arbitrary ?ordering= fields would
+        # make the cursor position ambiguous
+        return self.ordering
+
+
+def wants_cursor(request):
+    """Cursor mode is requested with ?pagination=cursor or by following a cursor link"""
+    return request.query_params.get('pagination') == 'cursor' or 'cursor' in request.query_params
+
+
+class OrderPagination(PageNumberPagination):
+    """
+    Page-number pagination by default, switching to OrderCursorPagination per
+    request (see wants_cursor).
+    """
+    cursor_pagination_class = OrderCursorPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if wants_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+def page_cache_variant(paginator, request):
+    """
+    What the page a PageNumberPagination serves for `request` depends on,
+    normalized for cache keys: other query parameters are ignored
+    """
+    number = request.query_params.get(paginator.page_query_param) or '1'
+    if number not in paginator.last_page_strings:
+        try:
+            number = int(number)
+        except ValueError:
+            pass
+    return number, paginator.get_page_size(request)
+
+
+def restore_page(paginator, request, count, number):
+    """
+    Set a PageNumberPagination up as paginate_queryset() leaves it for page
+    `number` of `count` rows, without a query, so get_paginated_response()
+    builds the links of a cached page for this request
+    """
+    django_paginator = paginator.django_paginator_class((), paginator.get_page_size(request))
+    django_paginator.count = count
+    paginator.page = django_paginator.page(number)
+    paginator.request = request
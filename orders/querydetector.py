@@ -0,0 +1,161 @@
+"""
+N+1 and slow query detection.
+
+With QUERY_DETECTOR set, QueryDetectorMiddleware watches the SQL of every
+request (through a database execute wrapper, like orders.metrics) and logs
+to the `orders.queries` logger:
+
+- queries of the same shape (same SQL once parameters and IN lists are
+  abstracted) repeated QUERY_DETECTOR_REPEAT_THRESHOLD times or more, the
+  N+1 pattern, with the line of project code that issued them
+- queries slower than SLOW_QUERY_MS, with their call site
+- requests issuing more queries than their endpoint's budget, declared in
+  the `query_budgets` attribute of the viewset ({action: max queries})
+
+In 'raise' mode, used by the test runner (see orders.testing), exceeding a
+budget raises QueryBudgetExceeded instead, failing the test that made the
+request.
+"""
+import logging
+import os
+import re
+import time
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import view_label
+
+logger = logging.getLogger('orders.queries')
+
+current_log = ContextVar('current_query_log', default=None)
+
+TRANSACTION_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+IGNORED_FILES = {os.path.abspath(__file__), os.path.abspath(os.path.join(os.path.dirname(__file__), 'metrics.py'))}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request issued more queries than its endpoint's budget"""
+
+
+def query_shape(sql):
+    """SQL with IN lists and inline numbers (LIMIT/OFFSET) abstracted away"""
+    return NUMBER.sub('?', IN_LIST.sub('(%s, ...)', sql))
+
+
+def call_site():
+    """Innermost frame of project code (outside site-packages) on the current stack"""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(base_dir) and 'site-packages' not in filename and filename not in IGNORED_FILES:
+            return f'{os.path.relpath(filename, base_dir)}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class QueryLog:
+    """Queries issued by one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+        self.sites = {}  # shape -> call site, once it repeats
+        self.slow = []  # (milliseconds, sql, call site)
+        self.repeat_threshold = settings.QUERY_DETECTOR_REPEAT_THRESHOLD
+        self.slow_ms = settings.SLOW_QUERY_MS
+        self.view = 'unresolved'
+        self.action = ''
+        self.budget = None
+
+    def add(self, sql, duration):
+        self.count += 1
+        shape = query_shape(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == self.repeat_threshold:
+            self.sites[shape] = call_site()
+        if duration * 1000 >= self.slow_ms:
+            self.slow.append((duration * 1000, sql, call_site()))
+
+    def repeated(self):
+        """[(count, shape, call site)] of the queries repeated at least the threshold"""
+        return [(count, shape, self.sites[shape]) for shape, count in self.shapes.items() if shape in self.sites]
+
+
+def watch_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current request's log"""
+    log = current_log.get()
+    # Savepoints depend on how transactions nest (every atomic block is one in tests), not on the endpoint
+    if log is None or sql.startswith(TRANSACTION_STATEMENTS):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.add(sql, time.perf_counter() - started)
+
+
+def install_query_watcher(connection, **kwargs):
+    if watch_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(watch_query)
+
+
+class QueryDetectorMiddleware:
+    """Reports N+1 patterns, slow queries and query budget overruns (see module docstring)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.QUERY_DETECTOR not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        log = QueryLog()
+        token = current_log.set(log)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_log.reset(token)
+        self.report(request, log)
+        return response
+
+    async def __acall__(self, request):
+        log = QueryLog()
+        token = current_log.set(log)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_log.reset(token)
+        self.report(request, log)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        log = current_log.get()
+        if log is not None:
+            log.view, log.action = view_label(request, view_func)
+            budgets = getattr(getattr(view_func, 'cls', None), 'query_budgets', {})
+            log.budget = budgets.get(log.action)
+        return None
+
+    def report(self, request, log):
+        endpoint = f'{request.method} {request.get_full_path()} ({log.view}.{log.action})'
+        for count, shape, site in log.repeated():
+            logger.warning('Repeated query in %s: %d times at %s: %s', endpoint, count, site, shape)
+        for milliseconds, sql, site in log.slow:
+            logger.warning('Slow query in %s: %.1f ms at %s: %s', endpoint, milliseconds, site, sql)
+        if log.budget is not None and log.count > log.budget:
+            message = f'{endpoint} issued {log.count} queries, over its budget of {log.budget}'
+            if settings.QUERY_DETECTOR == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
@@ -0,0 +1,113 @@
+"""
+Maintenance of the hourly reporting rollups (OrderRollup / MenuItemRollup).
+
+Rollups are kept per restaurant and per hour of order creation. Whenever an
+order is created or changes, only the hour bucket it belongs to is
+recomputed, which keeps every write a small, bounded amount of extra work and
+makes the refresh idempotent regardless of how the order was changed.
+"""
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncHour
+
+from .models import Order, OrderItem, OrderRollup, MenuItemRollup
+
+
+def hour_bucket(moment):
+    """Return the start of the UTC hour containing `moment`"""
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def order_aggregates():
+    return {
+        'orders_count': Count('id'),
+        'done_orders': Count('id', filter=Q(status='done')),
+        'cancelled_orders': Count('id', filter=Q(status='cancelled')),
+        'revenue': Sum('total_amount', filter=Q(status='done'), default=Decimal('0.00')),
+    }
+
+
+def item_aggregates():
+    return {
+        'quantity': Sum('quantity'),
+        'revenue': Sum('subtotal'),
+    }
+
+
+def refresh_rollups(orders, items=True):
+    """
+    Recompute the rollup buckets touched by the given orders.
+    Pass items=False when no completed order changed (e.g. for brand new
+    orders) to skip recomputing the menu item rollups.
+    """
+    buckets = {(order.restaurant_id, hour_bucket(order.created_at)) for order in orders}
+    for restaurant_id, period_start in buckets:
+        refresh_bucket(restaurant_id, period_start, items=items)
+
+
+@transaction.atomic
+def refresh_bucket(restaurant_id, period_start, items=True):
+    """Recompute the rollups of one restaurant for the hour starting at `period_start`"""
+    period_end = period_start + timedelta(hours=1)
+    orders = Order.objects.filter(
+        restaurant_id=restaurant_id,
+        created_at__gte=period_start,
+        created_at__lt=period_end,
+    )
+
+    totals = orders.order_by().aggregate(**order_aggregates())
+    rollup = OrderRollup.objects.filter(restaurant_id=restaurant_id, period_start=period_start)
+    if not totals['orders_count']:
+        rollup.delete()
+    elif not rollup.update(**totals):
+        OrderRollup.objects.create(restaurant_id=restaurant_id, period_start=period_start, **totals)
+
+    if not items:
+        return
+    item_rows = (
+        OrderItem.objects.filter(order__in=orders.filter(status='done'))
+        .order_by()
+        .values('menu_item_id')
+        .annotate(**item_aggregates())
+    )
+    MenuItemRollup.objects.filter(restaurant_id=restaurant_id, period_start=period_start).delete()
+    MenuItemRollup.objects.bulk_create([
+        MenuItemRollup(restaurant_id=restaurant_id, period_start=period_start, **row)
+        for row in item_rows
+    ])
+
+
+@transaction.atomic
+def rebuild_rollups(batch_size=1000):
+    """Drop all rollups and recompute them from the raw order tables"""
+    OrderRollup.objects.all().delete()
+    MenuItemRollup.objects.all().delete()
+
+    order_rows = (
+        Order.objects.order_by()
+        .annotate(period_start=TruncHour('created_at', tzinfo=dt_timezone.utc))
+        .values('restaurant_id', 'period_start')
+        .annotate(**order_aggregates())
+    )
+    OrderRollup.objects.bulk_create(
+        (OrderRollup(**row) for row in order_rows.iterator()), batch_size=batch_size
+    )
+
+    item_rows = (
+        OrderItem.objects.filter(order__status='done')
+        .order_by()
+        .annotate(
+            restaurant_id=F('order__restaurant_id'),
+            period_start=TruncHour('order__created_at', tzinfo=dt_timezone.utc),
+        )
+        .values('restaurant_id', 'period_start', 'menu_item_id')
+        .annotate(**item_aggregates())
+    )
+    MenuItemRollup.objects.bulk_create(
+        (MenuItemRollup(**row) for row in item_rows.iterator()), batch_size=batch_size
+    )
+
+    return OrderRollup.objects.count(), MenuItemRollup.objects.count()
@@ -0,0 +1,302 @@
+"""
+Fast read path: serializer output rendered straight from `.values()` rows.
+
+Rendering a page through a ModelSerializer builds model instances, a
+serializer per row (per order item too for OrderSerializer) and walks every
+field's get_attribute/to_representation. A RowSerializer compiles the read
+fields of a serializer once into (name, column, conversion) triples, fetches
+only those columns with QuerySet.values() and builds the same dicts, so the
+rendered JSON is byte for byte what the serializer produces.
+
+Conversions are the serializer fields' own to_representation, skipped for
+fields rendering database values unchanged (strings, integers, booleans,
+primary keys); None stays None, as with serializers. ISO 8601 datetimes,
+two per row, look the current timezone up once per render instead of once
+per value.
+
+Clients can ask for part of the representation: ?fields=id,status,... keeps
+only those fields, with 'order_items.menu_item_name' for the fields of
+nested rows, and leaves nested rows out unless named in ?fields= or in
+?expand=order_items. Columns and nested queries are trimmed to match.
+"""
+from functools import cached_property
+
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers, status
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .metrics import timed_serialization
+
+# Fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+def field_column(model, field):
+    """The values() column holding the value `field` renders"""
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        # Foreign keys are read as 'restaurant_id': a 'restaurant' column would
+        # also replace the related model's ordering in ORDER BY restaurant
+        return model._meta.get_field(field.source).attname
+    return field.source.replace('.', '__')
+
+
+class DateTimeConversion:
+    """DateTimeField.to_representation in ISO 8601, bound to the field's timezone for a render"""
+
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self):
+        field = self.field
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if not timezone.is_aware(value):
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+
+
+def field_conversion(field):
+    """The function rendering a column value as `field` does, None when it is the value itself"""
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        # The column already holds the related primary key
+        return None
+    if isinstance(field, serializers.DateTimeField) and (
+        getattr(field, 'format', api_settings.DATETIME_FORMAT) or ''
+    ).lower() == ISO_8601:
+        return DateTimeConversion(field)
+    return field.to_representation
+
+
+def choice_display(model, field_name):
+    """Conversion rendering a choice as get_FOO_display does"""
+    labels = dict(model._meta.get_field(field_name).flatchoices)
+    return lambda value: str(labels.get(value, value))
+
+
+class RowSerializer:
+    """
+    Renders `.values()` rows as `serializer_class` renders instances.
+
+    Each field is read from the column named after its source
+    ('restaurant.name' is 'restaurant__name', foreign keys are 'restaurant_id'). `columns` maps fields
+    rendered by a method to (column, conversion) instead, and `nested` maps
+    many=True serializer fields to (RowSerializer, foreign key to the parent).
+    """
+
+    def __init__(self, serializer_class, columns=None, nested=None):
+        self.serializer_class = serializer_class
+        self.columns = columns or {}
+        self.nested = nested or {}
+
+    @cached_property
+    def fields(self):
+        """(name, column, conversion) per rendered field, compiled on first use; nested fields have no column"""
+        model = self.serializer_class.Meta.model
+        fields = []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if name in self.nested:
+                fields.append((name, None, None))
+            elif name in self.columns:
+                fields.append((name, *self.columns[name]))
+            else:
+                fields.append((name, field_column(model, field), field_conversion(field)))
+        return fields
+
+    @cached_property
+    def pk_column(self):
+        return self.serializer_class.Meta.model._meta.pk.name
+
+    @cached_property
+    def values(self):
+        """Columns fetched for a row, including the primary key its nested rows are looked up by"""
+        values = list(dict.fromkeys(column for _, column, _ in self.fields if column is not None))
+        if self.nested and self.pk_column not in values:
+            values.append(self.pk_column)
+        return values
+
+    @property
+    def field_names(self):
+        return [name for name, _, _ in self.fields]
+
+    def selection(self, fields=None, expand=None):
+        """
+        The fields requested with ?fields= and ?expand= (comma separated) as
+        {field name: nested field names, or None for all of them}; None when
+        neither is given. Raises ValueError for unknown fields.
+        """
+        expand = [name.strip() for name in (expand or '').split(',') if name.strip()]
+        for name in expand:
+            if name not in self.nested:
+                raise ValueError(f"Cannot expand '{name}'; expandable fields: {', '.join(self.nested) or 'none'}")
+        if not fields:
+            return None
+
+        selection = {}
+        for name in (name.strip() for name in fields.split(',')):
+            if not name:
+                continue
+            field_name, _, nested_name = name.partition('.')
+            if field_name not in self.field_names:
+                raise ValueError(f"Unknown field '{name}'; available fields: {', '.join(self.field_names)}")
+            if not nested_name:
+                selection[field_name] = None
+                continue
+            if field_name not in self.nested:
+                raise ValueError(f"Unknown field '{name}': '{field_name}' has no nested fields")
+            if nested_name not in self.nested[field_name][0].field_names:
+                raise ValueError(
+                    f"Unknown field '{name}'; available fields: "
+                    + ', '.join(f'{field_name}.{nested}' for nested in self.nested[field_name][0].field_names)
+                )
+            if selection.get(field_name, []) is not None:
+                selection.setdefault(field_name, []).append(nested_name)
+        for name in expand:
+            selection[name] = None
+        return selection
+
+    def select(self, selection):
+        """Copy rendering only the fields of `selection` (see selection())"""
+        nested = {
+            name: (row_serializer if selection[name] is None else row_serializer.select(dict.fromkeys(selection[name])),
+                   parent_field)
+            for name, (row_serializer, parent_field) in self.nested.items()
+            if name in selection
+        }
+        selected = RowSerializer(self.serializer_class, self.columns, nested)
+        selected.fields = [field for field in self.fields if field[0] in selection]
+        return selected
+
+    def rows(self, queryset, columns=()):
+        """
+        `queryset` as the rows to render, with the extra `columns`; its
+        prefetches are replaced by the nested rows of render()
+        """
+        return queryset.prefetch_related(None).values(*dict.fromkeys([*self.values, *columns]))
+
+    def related_queryset(self, parent_field, parent_pks):
+        """Rows of the default queryset for the given parents, with their `parent_field`"""
+        model = self.serializer_class.Meta.model
+        queryset = model._default_manager.filter(**{f'{parent_field}__in': parent_pks})
+        return queryset.values(parent_field, *self.values)
+
+    def group_rows(self, parent_field, parent_pks, rows, rendered):
+        grouped = {pk: [] for pk in parent_pks}
+        for row, data in zip(rows, rendered):
+            grouped[row[parent_field]].append(data)
+        return grouped
+
+    def related_rows(self, parent_field, parent_pks):
+        """Rendered rows of the default queryset grouped by `parent_field`, for the given parents"""
+        rows = list(self.related_queryset(parent_field, parent_pks))
+        return self.group_rows(parent_field, parent_pks, rows, self.render(rows))
+
+    async def arelated_rows(self, parent_field, parent_pks):
+        """Async version of related_rows"""
+        rows = [row async for row in self.related_queryset(parent_field, parent_pks)]
+        return self.group_rows(parent_field, parent_pks, rows, await self.arender(rows))
+
+    def render(self, rows):
+        """List of the serialized representations of `rows`, with one query per nested relation"""
+        rows = list(rows)
+        nested = {}
+        if rows and self.nested:
+            parent_pks = [row[self.pk_column] for row in rows]
+            for name, (row_serializer, parent_field) in self.nested.items():
+                nested[name] = row_serializer.related_rows(parent_field, parent_pks)
+        return self.build(rows, nested)
+
+    async def arender(self, rows):
+        """Async version of render, the nested rows fetched with the async ORM"""
+        rows = list(rows)
+        nested = {}
+        if rows and self.nested:
+            parent_pks = [row[self.pk_column] for row in rows]
+            for name, (row_serializer, parent_field) in self.nested.items():
+                nested[name] = await row_serializer.arelated_rows(parent_field, parent_pks)
+        return self.build(rows, nested)
+
+    @timed_serialization
+    def build(self, rows, nested):
+        """Representations of `rows`, given their rendered nested rows as {name: {parent pk: rows}}"""
+        fields = [
+            (name, column, conversion.bind() if isinstance(conversion, DateTimeConversion) else conversion)
+            for name, column, conversion in self.fields
+        ]
+        rendered = []
+        for row in rows:
+            data = {}
+            for name, column, conversion in fields:
+                if column is None:
+                    data[name] = nested[name][row[self.pk_column]]
+                    continue
+                value = row[column]
+                data[name] = value if value is None or conversion is None else conversion(value)
+            rendered.append(data)
+        return rendered
+
+
+class RowSerializerMixin:
+    """
+    Serves list and retrieve from `.values()` rows rendered by `row_serializer`
+    instead of the serializer, trimmed to the fields asked for with ?fields=
+    and ?expand=; None keeps the serializer and full representations.
+    """
+    row_serializer = None
+    # Columns fetched whether rendered or not
+    row_columns = []
+
+    def get_row_serializer(self, row_serializer=None):
+        """`row_serializer` (the viewset's by default) for the requested fields; ValueError for unknown ones"""
+        row_serializer = row_serializer or self.row_serializer
+        params = self.request.query_params
+        selection = row_serializer.selection(params.get('fields'), params.get('expand'))
+        return row_serializer if selection is None else row_serializer.select(selection)
+
+    def list(self, request, *args, **kwargs):
+        if self.row_serializer is None:
+            return super().list(request, *args, **kwargs)
+        return self.list_rows(self.filter_queryset(self.get_queryset()))
+
+    def list_rows(self, queryset, row_serializer=None, row_columns=None, paginator=None):
+        """
+        Response listing `queryset` as list does; actions listing another
+        model pass its row serializer, row columns and paginator
+        """
+        try:
+            row_serializer = self.get_row_serializer(row_serializer)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        rows = row_serializer.rows(queryset, self.row_columns if row_columns is None else row_columns)
+        paginator = self.paginator if paginator is None else paginator
+        page = None if paginator is None else paginator.paginate_queryset(rows, self.request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(row_serializer.render(page))
+        return Response(row_serializer.render(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.row_serializer is None:
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            row_serializer = self.get_row_serializer()
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(row_serializer.render([self.get_object_row(row_serializer)])[0])
+
+    def get_object_row(self, row_serializer):
+        """get_object() as a row of `row_serializer`"""
+        queryset = row_serializer.rows(self.filter_queryset(self.get_queryset()), self.row_columns)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, row)
+        return row
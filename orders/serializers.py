@@ -1,8 +1,52 @@
+from django.db import transaction
 from rest_framework import serializers
+from .metrics import timed_serialization
 from .models import Restaurant, MenuItem, Order, OrderItem
 
 
-class RestaurantSerializer(serializers.ModelSerializer):
+def prefetch_menu_items(payloads):
+    """
+    Load every menu item referenced by the given order payloads in one query.
+    Returns a dict of menu items keyed by primary key.
+    """
+    ids = set()
+    for payload in payloads:
+        if not isinstance(payload, dict) or not isinstance(payload.get('order_items'), list):
+            continue
+        for item in payload['order_items']:
+            if not isinstance(item, dict):
+                continue
+            try:
+                ids.add(int(item.get('menu_item')))
+            except (TypeError, ValueError):
+                continue
+    return MenuItem.objects.order_by().in_bulk(ids)
+
+
+class MenuItemField(serializers.PrimaryKeyRelatedField):
+    """Menu item reference resolved from the lookup primed in the serializer context"""
+
+    def to_internal_value(self, data):
+        menu_items = self.context.get('menu_items')
+        if menu_items is not None and not isinstance(data, bool):
+            try:
+                menu_item = menu_items.get(int(data))
+            except (TypeError, ValueError):
+                menu_item = None
+            if menu_item is not None:
+                return menu_item
+        return super().to_internal_value(data)
+
+
+class TimedSerializerMixin:
+    """Counts building representations as serialization time in the request metrics"""
+
+    @timed_serialization
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+
+class RestaurantSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Restaurant model"""
     menu_items_count = serializers.SerializerMethodField()
 
@@ -12,10 +56,14 @@ class RestaurantSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
     def get_menu_items_count(self, obj):
-        return obj.menu_items.filter(is_available=True).count()
+        """Annotated by RestaurantViewSet for lists; counted with a query for single objects"""
+        count = getattr(obj, 'menu_items_count', None)
+        if count is None:
+            count = obj.menu_items.filter(is_available=True).count()
+        return count
 
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for MenuItem model"""
     restaurant_name = serializers.CharField(source='restaurant.name', read_only=True)
 
@@ -28,7 +76,8 @@ class MenuItemSerializer(serializers.ModelSerializer):
 
 class OrderItemCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating OrderItem instances"""
-    
+    menu_item = MenuItemField(queryset=MenuItem.objects.all())
+
     class Meta:
         model = OrderItem
         fields = ['menu_item', 'quantity', 'special_instructions']
@@ -45,7 +94,7 @@ class OrderItemCreateSerializer(serializers.ModelSerializer):
         return data
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for OrderItem model with full details"""
     menu_item_name = serializers.CharField(source='menu_item.name', read_only=True)
     menu_item_description = serializers.CharField(source='menu_item.description', read_only=True)
@@ -65,28 +114,48 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['restaurant', 'customer_name', 'table_number', 'notes', 'order_items']
 
+    def to_internal_value(self, data):
+        """Resolve all referenced menu items with a single query before validating"""
+        if 'menu_items' not in self.context:
+            self.context['menu_items'] = prefetch_menu_items([data])
+        return super().to_internal_value(data)
+
+    @transaction.atomic
     def create(self, validated_data):
-        """Create order with associated order items"""
+        """
+        Create order with associated order items.
+        Lines are priced from the already resolved menu items and inserted
+        with a single bulk insert, so the order total is written only once.
+        """
         order_items_data = validated_data.pop('order_items')
+        order_items = [
+            OrderItem(
+                unit_price=item_data['menu_item'].price,
+                subtotal=item_data['menu_item'].price * item_data['quantity'],
+                **item_data
+            )
+            for item_data in order_items_data
+        ]
+        validated_data['total_amount'] = sum(item.subtotal for item in order_items)
         order = Order.objects.create(**validated_data)
-        
-        for item_data in order_items_data:
-            OrderItem.objects.create(order=order, **item_data)
-        
-        # Calculate and save total
-        order.calculate_total()
-        order.save()
-        
+
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+
         return order
 
     def validate_order_items(self, value):
         """Validate that order has at least one item"""
         if not value:
             raise serializers.ValidationError("Order must contain at least one item.")
+        menu_item_ids = [item['menu_item'].id for item in value]
+        if len(menu_item_ids) != len(set(menu_item_ids)):
+            raise serializers.ValidationError("Each menu item may only appear once per order.")
         return value
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Order model with full details"""
     restaurant_name = serializers.CharField(source='restaurant.name', read_only=True)
     order_items = OrderItemSerializer(many=True, read_only=True)
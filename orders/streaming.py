@@ -0,0 +1,116 @@
+"""
+Streaming responses for full exports.
+
+Rows are read with QuerySet.iterator(chunk_size=...), which also runs the
+queryset's prefetches once per chunk, and serialized chunk by chunk, so
+memory use stays flat however many rows are exported.
+
+Under ASGI the content is wrapped in an async iterator advancing the sync
+one in a thread, a batch of pieces at a time: given a sync iterator, Django
+would read all of it into a list before sending the first byte.
+"""
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def iter_chunks(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of model instances, `chunk_size` rows at a time"""
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_serialized_chunks(queryset, serializer_class, chunk_size=DEFAULT_CHUNK_SIZE, context=None):
+    """Yield lists of serialized rows, `chunk_size` rows at a time"""
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield serializer_class(chunk, many=True, context=context or {}).data
+
+
+def iter_json_array(queryset, serializer_class, chunk_size=DEFAULT_CHUNK_SIZE, context=None):
+    """Yield the JSON array of all serialized rows piece by piece"""
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    yield '['
+    first = True
+    for rows in iter_serialized_chunks(queryset, serializer_class, chunk_size, context):
+        for row in rows:
+            yield ('' if first else ',') + encoder.encode(row)
+            first = False
+    yield ']'
+
+
+def iter_ndjson(queryset, serializer_class, chunk_size=DEFAULT_CHUNK_SIZE, context=None):
+    """Yield one JSON document per row, newline delimited"""
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for rows in iter_serialized_chunks(queryset, serializer_class, chunk_size, context):
+        yield ''.join(encoder.encode(row) + '\n' for row in rows)
+
+
+# Leading characters making spreadsheet applications read a cell as a formula
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_text(value):
+    """Free text for a CSV cell, quoted with a leading ' when it would be read as a formula"""
+    if value and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class Echo:
+    """File-like object returning what is written, to feed csv.writer into a stream"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(header, rows):
+    """Yield CSV lines for `header` followed by every row of the `rows` iterable"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def aiter_batches(iterator, batch_size=DEFAULT_CHUNK_SIZE):
+    """Async iterator over the strings of `iterator`, joined `batch_size` at a time in a thread"""
+    iterator = iter(iterator)
+
+    def next_batch():
+        return list(islice(iterator, batch_size))
+
+    async def batches():
+        while batch := await sync_to_async(next_batch)():
+            yield ''.join(batch)
+    return batches()
+
+
+def streaming_response(request, content, content_type):
+    """StreamingHttpResponse sending `content` without buffering it under ASGI as well"""
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = aiter_batches(content)
+    return StreamingHttpResponse(content, content_type=content_type)
+
+
+def stream_json_array(request, queryset, serializer_class, chunk_size=DEFAULT_CHUNK_SIZE, context=None):
+    """StreamingHttpResponse rendering every row of `queryset` as one JSON array"""
+    return streaming_response(
+        request, iter_json_array(queryset, serializer_class, chunk_size, context), 'application/json'
+    )
+
+
+def wants_stream(request):
+    """Full streamed exports are requested explicitly with ?stream=true"""
+    return request.query_params.get('stream', '').lower() in ('1', 'true')
+
@@ -0,0 +1,366 @@
+"""
+Synthetic data generation for load testing.
+
+Produces configurable volumes of restaurants, menu items, orders and order
+items with realistic shapes: a few popular restaurants take most of the
+orders, orders peak at lunch and dinner and on weekends, recent orders are
+still pending or in progress while older ones are done or cancelled.
+
+Output is fully determined by the seed. Orders are generated in chunks that
+only depend on (seed, chunk index), so chunks can be produced by parallel
+worker processes while the parent process writes them, in order, either
+straight into the database with bulk inserts or into a streamed JSON dump
+in the format read by orders.loading.
+"""
+import bisect
+import json
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from multiprocessing import get_context
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .cache import bump_menu_version
+from .loading import bulk_create_menu_items, bulk_create_orders, bulk_create_restaurants
+from .models import Restaurant, MenuItem, Order, OrderItem
+from .reports import rebuild_rollups
+
+# Dishes per cuisine, with their menu category
+CUISINES = {
+    'Pizza': [('Margherita', 'Main'), ('Pepperoni', 'Main'), ('Calzone', 'Main'),
+              ('Garlic Bread', 'Side'), ('Tiramisu', 'Dessert'), ('Lemonade', 'Drink')],
+    'Burger': [('Classic Burger', 'Main'), ('Cheeseburger', 'Main'), ('Veggie Burger', 'Main'),
+               ('Fries', 'Side'), ('Onion Rings', 'Side'), ('Milkshake', 'Drink')],
+    'Sushi': [('Salmon Nigiri', 'Main'), ('California Roll', 'Main'), ('Miso Soup', 'Side'),
+              ('Edamame', 'Side'), ('Mochi', 'Dessert'), ('Green Tea', 'Drink')],
+    'Taco': [('Carnitas Taco', 'Main'), ('Fish Taco', 'Main'), ('Burrito', 'Main'),
+             ('Nachos', 'Side'), ('Churros', 'Dessert'), ('Horchata', 'Drink')],
+    'Wok': [('Pad Thai', 'Main'), ('Fried Rice', 'Main'), ('Kung Pao Chicken', 'Main'),
+            ('Spring Rolls', 'Side'), ('Dumplings', 'Side'), ('Bubble Tea', 'Drink')],
+    'Salad': [('Caesar Salad', 'Main'), ('Greek Salad', 'Main'), ('Quinoa Bowl', 'Main'),
+              ('Soup of the Day', 'Side'), ('Fruit Cup', 'Dessert'), ('Smoothie', 'Drink')],
+}
+VARIANTS = ['', 'Large ', 'Spicy ', 'Deluxe ', 'Mini ', 'Family ', 'Vegan ', 'Double ']
+CATEGORY_PRICES = {'Main': (7, 22), 'Side': (3, 8), 'Dessert': (4, 9), 'Drink': (2, 6)}
+CUSTOMER_NAMES = [
+    'Alex', 'Ana', 'Ben', 'Carla', 'Diego', 'Emma', 'Fatima', 'Hiro', 'Ines', 'Jon',
+    'Kim', 'Luis', 'Maya', 'Noah', 'Olga', 'Priya', 'Sam', 'Tom', 'Valeria', 'Yuki',
+]
+NOTES = ['', '', '', '', 'No onions', 'Extra napkins', 'Allergic to nuts', 'To go']
+
+# Relative order volume per hour of day (food court open 10:00-22:00)
+HOUR_WEIGHTS = [0] * 10 + [2, 5, 10, 10, 6, 3, 3, 4, 8, 9, 7, 4] + [0] * 2
+# Monday .. Sunday
+WEEKDAY_WEIGHTS = [0.8, 0.8, 0.9, 0.9, 1.1, 1.4, 1.3]
+# Lines per order, and quantity per line
+LINE_COUNT_WEIGHTS = {1: 30, 2: 35, 3: 20, 4: 10, 5: 5}
+QUANTITY_WEIGHTS = {1: 80, 2: 15, 3: 5}
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class SyntheticConfig:
+    """Volumes and shape of the generated dataset"""
+
+    def __init__(self, restaurants=20, menu_items=400, orders=10000, days=90, seed=0,
+                 end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.restaurants = restaurants
+        self.menu_items = menu_items
+        self.orders = orders
+        self.days = days
+        self.seed = seed
+        # Truncated to the hour so the timeline does not depend on when generation runs
+        self.end = (end or timezone.now()).astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+        self.chunk_size = chunk_size
+
+    @property
+    def chunk_count(self):
+        return (self.orders + self.chunk_size - 1) // self.chunk_size
+
+
+def build_restaurants(config):
+    """Restaurant rows with their popularity weight (Zipf-like)"""
+    rng = random.Random(f'{config.seed}:restaurants')
+    cuisines = list(CUISINES)
+    restaurants = []
+    for index in range(config.restaurants):
+        cuisine = cuisines[index % len(cuisines)]
+        restaurants.append({
+            'id': index + 1,
+            'name': f'{cuisine} Place {index + 1}',
+            'description': f'{cuisine} dishes made to order',
+            'is_active': rng.random() > 0.05,
+            'cuisine': cuisine,
+            'weight': 1 / (index + 1) ** 0.8,
+        })
+    return restaurants
+
+
+def build_menu_items(config, restaurants):
+    """Menu item rows spread evenly over the restaurants"""
+    rng = random.Random(f'{config.seed}:menu')
+    menu_items = []
+    for index in range(config.menu_items):
+        restaurant = restaurants[index % len(restaurants)]
+        position = index // len(restaurants)
+        dishes = CUISINES[restaurant['cuisine']]
+        variant = VARIANTS[(position // len(dishes)) % len(VARIANTS)]
+        number = position // (len(dishes) * len(VARIANTS))
+        dish, category = dishes[position % len(dishes)]
+        low, high = CATEGORY_PRICES[category]
+        menu_items.append({
+            'id': index + 1,
+            'restaurant_id': restaurant['id'],
+            'name': f"{variant}{dish}{f' #{number + 1}' if number else ''}",
+            'description': '',
+            'price': str((Decimal(rng.randint(low * 4, high * 4)) / 4).quantize(Decimal('0.01'))),
+            'is_available': rng.random() > 0.08,
+            'category': category,
+        })
+    return menu_items
+
+
+def build_timeline(config):
+    """Hourly buckets over the configured period with cumulative order volume"""
+    start = config.end - timedelta(days=config.days)
+    hours = []
+    cumulative = []
+    total = 0.0
+    moment = start
+    while moment < config.end:
+        total += HOUR_WEIGHTS[moment.hour] * WEEKDAY_WEIGHTS[moment.weekday()]
+        hours.append(moment)
+        cumulative.append(total)
+        moment += timedelta(hours=1)
+    return hours, cumulative
+
+
+def pick_status(rng, age):
+    """Status of an order created `age` ago"""
+    if age < timedelta(minutes=15):
+        return rng.choices(['pending', 'in_progress', 'cancelled'], [70, 28, 2])[0]
+    if age < timedelta(hours=1):
+        return rng.choices(['pending', 'in_progress', 'done', 'cancelled'], [10, 40, 45, 5])[0]
+    return rng.choices(['done', 'cancelled'], [93, 7])[0]
+
+
+class ChunkGenerator:
+    """
+    Generates chunks of orders. Order i of N is placed at volume quantile
+    (i + jitter) / N of the timeline, so order IDs grow with creation time
+    like in a real database and every chunk is independent of the others.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        restaurants = build_restaurants(config)
+        self.menus = {}
+        for item in build_menu_items(config, restaurants):
+            if item['is_available']:
+                self.menus.setdefault(item['restaurant_id'], []).append((item['id'], Decimal(item['price'])))
+        if config.orders and not self.menus:
+            raise ValueError('Orders need at least one available menu item')
+        # Only restaurants with something to order get orders
+        self.restaurant_ids = []
+        self.restaurant_cum_weights = []
+        total = 0.0
+        for restaurant in restaurants:
+            if restaurant['id'] in self.menus:
+                total += restaurant['weight']
+                self.restaurant_ids.append(restaurant['id'])
+                self.restaurant_cum_weights.append(total)
+        self.hours, self.cumulative = build_timeline(config)
+        self.last_open_hour = self.cumulative.index(self.cumulative[-1])
+
+    def __call__(self, chunk_index):
+        """Return [(order row, [order item rows])] for one chunk"""
+        config = self.config
+        rng = random.Random(f'{config.seed}:orders:{chunk_index}')
+        first = chunk_index * config.chunk_size
+        last = min(first + config.chunk_size, config.orders)
+        total_volume = self.cumulative[-1]
+        line_counts, line_weights = list(LINE_COUNT_WEIGHTS), list(LINE_COUNT_WEIGHTS.values())
+        quantities, quantity_weights = list(QUANTITY_WEIGHTS), list(QUANTITY_WEIGHTS.values())
+
+        chunk = []
+        for index in range(first, last):
+            volume = (index + rng.random()) / config.orders * total_volume
+            # First hour whose cumulative volume exceeds the target (never a closed hour)
+            bucket = min(bisect.bisect_right(self.cumulative, volume), self.last_open_hour)
+            # Position inside the hour in proportion to the volume already used
+            previous = self.cumulative[bucket - 1] if bucket else 0.0
+            fraction = min(max((volume - previous) / (self.cumulative[bucket] - previous), 0.0), 1.0)
+            created_at = self.hours[bucket] + timedelta(seconds=fraction * 3599)
+            restaurant_id = rng.choices(self.restaurant_ids, cum_weights=self.restaurant_cum_weights)[0]
+            menu = self.menus[restaurant_id]
+            status = pick_status(rng, config.end - created_at)
+            lines = rng.sample(menu, min(rng.choices(line_counts, line_weights)[0], len(menu)))
+
+            order_id = index + 1
+            items = []
+            total = Decimal('0.00')
+            for line, (menu_item_id, price) in enumerate(lines):
+                quantity = rng.choices(quantities, quantity_weights)[0]
+                total += price * quantity
+                items.append({
+                    'id': order_id * 10 + line,
+                    'order_id': order_id,
+                    'menu_item_id': menu_item_id,
+                    'quantity': quantity,
+                    'unit_price': str(price),
+                    'subtotal': str(price * quantity),
+                    'special_instructions': '',
+                })
+            updated_at = created_at
+            if status in ('done', 'cancelled'):
+                updated_at += timedelta(minutes=rng.randint(5, 40))
+            chunk.append(({
+                'id': order_id,
+                'restaurant_id': restaurant_id,
+                'customer_name': f'{rng.choice(CUSTOMER_NAMES)} {rng.randint(1, 999)}',
+                'table_number': str(rng.randint(1, 60)) if rng.random() < 0.7 else None,
+                'status': status,
+                'total_amount': str(total),
+                'notes': rng.choice(NOTES),
+                'created_at': created_at.isoformat(),
+                'updated_at': updated_at.isoformat(),
+            }, items))
+        return chunk
+
+
+_worker_generator = None
+
+
+def _generate_in_worker(chunk_index):
+    return _worker_generator(chunk_index)
+
+
+def iter_order_chunks(generator, workers=1):
+    """Yield the generator's order chunks in order, produced by `workers` processes"""
+    global _worker_generator
+    indexes = range(generator.config.chunk_count)
+    if workers <= 1:
+        yield from map(generator, indexes)
+        return
+    # Forked workers inherit the generator and only build rows; they must
+    # not inherit open database connections
+    connections.close_all()
+    _worker_generator = generator
+    with get_context('fork').Pool(workers) as pool:
+        yield from pool.imap(_generate_in_worker, indexes)
+
+
+def write_dump(config, fileobj, workers=1, progress=None):
+    """Stream the dataset as a JSON dump readable by orders.loading / load_dump"""
+    progress = progress or (lambda message: None)
+    generator = ChunkGenerator(config)
+    restaurants = build_restaurants(config)
+    menu_items = build_menu_items(config, restaurants)
+
+    def write_section(name, rows, first_section=False):
+        fileobj.write(('' if first_section else ',\n') + json.dumps(name) + ': [')
+        first_row = True
+        for row in rows:
+            fileobj.write(('\n' if first_row else ',\n') + json.dumps(row, ensure_ascii=False))
+            first_row = False
+        fileobj.write('\n]')
+
+    fileobj.write('{')
+    write_section('restaurants', (
+        {key: value for key, value in r.items() if key not in ('cuisine', 'weight')} for r in restaurants
+    ), first_section=True)
+    write_section('menu_items', menu_items)
+
+    # Orders and their items are separate sections, so the items of each
+    # chunk are spooled to a temporary file written out after the orders
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+        orders_written = 0
+
+        def orders():
+            nonlocal orders_written
+            for chunk in iter_order_chunks(generator, workers):
+                for order, items in chunk:
+                    for item in items:
+                        spool.write(json.dumps(item) + '\n')
+                    yield order
+                orders_written += len(chunk)
+                progress(f'  orders: {orders_written:,} generated')
+
+        write_section('orders', orders())
+        spool.seek(0)
+        write_section('order_items', (json.loads(line) for line in spool))
+    fileobj.write('\n}\n')
+
+
+def insert_into_database(config, workers=1, progress=None):
+    """Bulk insert the dataset into the database, one transaction per chunk"""
+    progress = progress or (lambda message: None)
+    generator = ChunkGenerator(config)
+    restaurants = build_restaurants(config)
+    menu_items = build_menu_items(config, restaurants)
+
+    # Restaurants and menu items already there (from an earlier run kept with
+    # --keep-existing) are reused, the new orders added to them
+    with transaction.atomic():
+        created, new_restaurants = bulk_create_restaurants(
+            Restaurant(name=r['name'], description=r['description'], is_active=r['is_active'])
+            for r in restaurants
+        )
+        restaurant_ids = {r['id']: restaurant.id for r, restaurant in zip(restaurants, created)}
+        created, new_menu_items = bulk_create_menu_items(
+            (
+                MenuItem(
+                    restaurant_id=restaurant_ids[item['restaurant_id']],
+                    name=item['name'],
+                    description=item['description'],
+                    price=Decimal(item['price']),
+                    is_available=item['is_available'],
+                    category=item['category'],
+                )
+                for item in menu_items
+            ),
+            batch_size=config.chunk_size,
+        )
+        menu_item_ids = {item['id']: menu_item.id for item, menu_item in zip(menu_items, created)}
+    progress(
+        f'  {new_restaurants:,} restaurants and {new_menu_items:,} menu items inserted'
+        f' ({len(restaurants) - new_restaurants:,} and {len(menu_items) - new_menu_items:,} already there)'
+    )
+
+    orders_written = 0
+    for chunk in iter_order_chunks(generator, workers):
+        with transaction.atomic():
+            orders = bulk_create_orders(
+                Order(
+                    restaurant_id=restaurant_ids[order['restaurant_id']],
+                    customer_name=order['customer_name'],
+                    table_number=order['table_number'],
+                    status=order['status'],
+                    total_amount=Decimal(order['total_amount']),
+                    notes=order['notes'],
+                    created_at=datetime.fromisoformat(order['created_at']),
+                    updated_at=datetime.fromisoformat(order['updated_at']),
+                )
+                for order, _ in chunk
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(
+                    order_id=order.id,
+                    menu_item_id=menu_item_ids[item['menu_item_id']],
+                    quantity=item['quantity'],
+                    unit_price=Decimal(item['unit_price']),
+                    subtotal=Decimal(item['subtotal']),
+                    special_instructions=item['special_instructions'],
+                )
+                for order, (_, items) in zip(orders, chunk)
+                for item in items
+            )
+        orders_written += len(chunk)
+        progress(f'  orders: {orders_written:,} inserted')
+
+    bump_menu_version(*restaurant_ids.values())
+    progress('Rebuilding report rollups...')
+    rebuild_rollups()
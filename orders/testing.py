@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """
+    Runs the suite with the query detector in 'raise' mode, so any test
+    request going over its endpoint's query budget fails (see orders.querydetector).
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.saved_query_detector = settings.QUERY_DETECTOR
+        settings.QUERY_DETECTOR = 'raise'
+
+    def teardown_test_environment(self, **kwargs):
+        settings.QUERY_DETECTOR = self.saved_query_detector
+        super().teardown_test_environment(**kwargs)
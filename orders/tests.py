@@ -1,3 +1,1579 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import tempfile
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.db.models import Sum
+from django.test import AsyncClient, AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.test import APIClient
+
+from waiterapi.deployment import check_server_settings
+from waiterapi.static import StaticFilesApplication
+
+from . import async_views
+from .cache import menu_version_key
+from .loading import DumpFormatError, iter_json_sections
+from .metrics import RequestMetrics, current_metrics, registry
+from .querydetector import QueryBudgetExceeded, query_shape
+from .reports import refresh_rollups
+from .models import Restaurant, MenuItem, Order, OrderItem, OrderRollup, MenuItemRollup
+from .pagination import OrderCursorPagination, OrderPagination
+from .synthetic import ChunkGenerator, SyntheticConfig, iter_order_chunks, write_dump
+from .serializers import OrderItemSerializer, OrderSerializer, RestaurantSerializer
+from .views import MenuItemViewSet, OrderViewSet, RestaurantViewSet, optimize_order_queryset
+from .writer import WriteCoordinator
+
+
+def create_orders(restaurant, menu_items, count, status='pending'):
+    """Create `count` orders, each containing every menu item once"""
+    orders = []
+    for i in range(count):
+        order = Order.objects.create(
+            restaurant=restaurant,
+            customer_name=f'Customer {i}',
+            table_number=str(i),
+            status=status,
+        )
+        for menu_item in menu_items:
+            OrderItem.objects.create(order=order, menu_item=menu_item, quantity=1)
+        orders.append(order)
+    # As the order write paths do
+    refresh_rollups(orders)
+    return orders
+
+
+class OrderQueryCountTests(TestCase):
+    """Order endpoints must run a constant number of queries regardless of page size"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Pizza Palace')
+        self.menu_items = [
+            MenuItem.objects.create(
+                restaurant=self.restaurant,
+                name=f'Item {i}',
+                description=f'Description {i}',
+                price=Decimal('5.00'),
+            )
+            for i in range(3)
+        ]
+
+    def assertConstantQueries(self, url, expected):
+        """Assert `url` costs `expected` queries with both 1 and 10 orders"""
+        create_orders(self.restaurant, self.menu_items, 1)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        create_orders(self.restaurant, self.menu_items, 9)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        # order validators + restaurant/menu validators + count + orders + order items
+        response = self.assertConstantQueries('/api/orders/', 5)
+        order = response.data['results'][0]
+        self.assertEqual(order['restaurant_name'], 'Pizza Palace')
+        self.assertEqual(len(order['order_items']), 3)
+
+    def test_by_restaurant(self):
+        # restaurant lookup + 2 validators + count + orders + order items
+        url = f'/api/orders/by_restaurant/?restaurant_id={self.restaurant.id}'
+        self.assertConstantQueries(url, 6)
+
+    def test_restaurant_orders(self):
+        # restaurant lookup + 2 validators + count + orders + order items
+        url = f'/api/restaurants/{self.restaurant.id}/orders/'
+        response = self.assertConstantQueries(url, 6)
+        self.assertEqual(response.data['results'][0]['order_items'][0]['menu_item_description'], 'Description 0')
+
+    def test_retrieve(self):
+        order = create_orders(self.restaurant, self.menu_items, 1)[0]
+        # order validators + restaurant/menu validators + order + order items
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/orders/{order.id}/')
+        self.assertEqual(len(response.data['order_items']), 3)
+
+    def test_order_items_load_the_serializer_columns(self):
+        create_orders(self.restaurant, self.menu_items, 1)
+        order = optimize_order_queryset(Order.objects.all()).get()
+        item = order.order_items.all()[0]
+        # Exactly what OrderItemSerializer reads: nothing deferred on the item,
+        # and only the menu item fields it renders
+        self.assertEqual(item.get_deferred_fields(), set())
+        self.assertEqual({'name', 'description'} & item.menu_item.get_deferred_fields(), set())
+        self.assertIn('price', item.menu_item.get_deferred_fields())
+        with self.assertNumQueries(0):
+            OrderItemSerializer(order.order_items.all(), many=True).data
+
+
+class RestaurantMenuItemsCountTests(TestCase):
+    """menu_items_count is annotated on restaurant lists instead of counted per row"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurants = [Restaurant.objects.create(name=f'Restaurant {i:02}') for i in range(15)]
+        for i, restaurant in enumerate(self.restaurants[:5]):
+            for j in range(i + 1):
+                MenuItem.objects.create(restaurant=restaurant, name=f'Dish {j}', price=Decimal('3.00'))
+        MenuItem.objects.create(
+            restaurant=self.restaurants[0], name='Sold out', price=Decimal('3.00'), is_available=False
+        )
+
+    def test_list(self):
+        # validators + count + one query for the page, however many restaurants
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/restaurants/')
+        counts = {row['name']: row['menu_items_count'] for row in response.data['results']}
+        self.assertEqual(counts['Restaurant 00'], 1)
+        self.assertEqual(counts['Restaurant 04'], 5)
+        self.assertEqual(counts['Restaurant 14'], 0)
+
+    def test_single_objects(self):
+        restaurant = self.restaurants[2]
+        response = self.client.get(f'/api/restaurants/{restaurant.id}/')
+        self.assertEqual(response.data['menu_items_count'], 3)
+        response = self.client.patch(f'/api/restaurants/{restaurant.id}/', {'description': 'New'}, format='json')
+        self.assertEqual(response.data['menu_items_count'], 3)
+        response = self.client.post('/api/restaurants/', {'name': 'Brand New'}, format='json')
+        self.assertEqual(response.data['menu_items_count'], 0)
+
+
+class OrderCreateTests(TestCase):
+    """Order creation prices and inserts all lines in bulk"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Burger Barn')
+        self.menu_items = [
+            MenuItem.objects.create(
+                restaurant=self.restaurant, name=f'Item {i}', price=Decimal('2.50') + i
+            )
+            for i in range(30)
+        ]
+
+    def post_order(self, menu_items):
+        return self.client.post('/api/orders/', {
+            'restaurant': self.restaurant.id,
+            'customer_name': 'Group',
+            'order_items': [
+                {'menu_item': menu_item.id, 'quantity': 2} for menu_item in menu_items
+            ],
+        }, format='json')
+
+    def test_totals(self):
+        response = self.post_order(self.menu_items[:3])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_amount'], '21.00')
+        self.assertEqual(response.data['order_items'][2]['subtotal'], '9.00')
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.total_amount, Decimal('21.00'))
+        self.assertEqual(order.order_items.count(), 3)
+
+    def test_query_count_independent_of_line_count(self):
+        # The first order of the hour also inserts its reporting rollup
+        self.post_order(self.menu_items[:1])
+        with self.assertNumQueries(12):
+            self.post_order(self.menu_items[:1])
+        with self.assertNumQueries(12):
+            self.post_order(self.menu_items)
+
+    def test_duplicate_menu_items_rejected(self):
+        response = self.post_order([self.menu_items[0], self.menu_items[0]])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('order_items', response.data)
+
+    def test_unknown_menu_item_rejected(self):
+        response = self.client.post('/api/orders/', {
+            'restaurant': self.restaurant.id,
+            'customer_name': 'Ghost',
+            'order_items': [{'menu_item': 9999, 'quantity': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderBatchTests(TestCase):
+    """Batch submission validates together and reports a result per order"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Taco Stand')
+        self.taco = MenuItem.objects.create(restaurant=self.restaurant, name='Taco', price=Decimal('3.00'))
+        self.soda = MenuItem.objects.create(restaurant=self.restaurant, name='Soda', price=Decimal('1.50'))
+
+    def payload(self, name, *menu_items):
+        return {
+            'restaurant': self.restaurant.id,
+            'customer_name': name,
+            'order_items': [{'menu_item': item.id, 'quantity': 1} for item in menu_items],
+        }
+
+    def test_all_created(self):
+        response = self.client.post('/api/orders/batch/', [
+            self.payload('Ana', self.taco),
+            self.payload('Luis', self.taco, self.soda),
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['status'] for r in response.data], ['created', 'created'])
+        self.assertEqual(response.data[1]['order']['total_amount'], '4.50')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_partial_failure(self):
+        response = self.client.post('/api/orders/batch/', [
+            self.payload('Ana', self.taco),
+            self.payload('Nobody'),
+        ], format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data[0]['status'], 'created')
+        self.assertEqual(response.data[1]['status'], 'invalid')
+        self.assertIn('order_items', response.data[1]['errors'])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_rejects_non_list(self):
+        response = self.client.post('/api/orders/batch/', self.payload('Ana', self.taco), format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderStatisticsTests(TestCase):
+    """Statistics are computed with a single aggregate query"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.pizza = Restaurant.objects.create(name='Pizza Palace')
+        self.sushi = Restaurant.objects.create(name='Sushi Spot')
+        margherita = MenuItem.objects.create(restaurant=self.pizza, name='Margherita', price=Decimal('10.00'))
+        roll = MenuItem.objects.create(restaurant=self.sushi, name='Roll', price=Decimal('7.25'))
+        create_orders(self.pizza, [margherita], 2, status='done')
+        create_orders(self.pizza, [margherita], 1, status='pending')
+        create_orders(self.sushi, [roll], 1, status='done')
+        create_orders(self.sushi, [roll], 1, status='cancelled')
+
+    def test_totals(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/orders/statistics/')
+        self.assertEqual(response.data, {
+            'total_orders': 5,
+            'pending_orders': 1,
+            'in_progress_orders': 0,
+            'done_orders': 3,
+            'cancelled_orders': 1,
+            'total_revenue': '27.25',
+        })
+
+    def test_restaurant_filter(self):
+        response = self.client.get(f'/api/orders/statistics/?restaurant_id={self.sushi.id}')
+        self.assertEqual(response.data['total_orders'], 2)
+        self.assertEqual(response.data['total_revenue'], '7.25')
+
+    def test_group_by_restaurant(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/orders/statistics/?group_by=restaurant')
+        self.assertEqual(response.data['total_orders'], 5)
+        self.assertEqual(response.data['total_revenue'], '27.25')
+        breakdown = response.data['restaurants']
+        self.assertEqual([row['restaurant_name'] for row in breakdown], ['Pizza Palace', 'Sushi Spot'])
+        self.assertEqual(breakdown[0]['done_orders'], 2)
+        self.assertEqual(breakdown[0]['total_revenue'], '20.00')
+
+    def test_date_range(self):
+        response = self.client.get('/api/orders/statistics/?created_before=2000-01-01')
+        self.assertEqual(response.data['total_orders'], 0)
+        self.assertEqual(response.data['total_revenue'], '0.00')
+        response = self.client.get('/api/orders/statistics/?created_after=2000-01-01T00:00:00Z')
+        self.assertEqual(response.data['total_orders'], 5)
+
+    def test_invalid_date(self):
+        response = self.client.get('/api/orders/statistics/?created_after=yesterday')
+        self.assertEqual(response.status_code, 400)
+
+
+class ReportTests(TestCase):
+    """Rollups are maintained on writes and served by /api/reports/"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Noodle Bar')
+        self.ramen = MenuItem.objects.create(restaurant=self.restaurant, name='Ramen', price=Decimal('12.00'))
+        self.gyoza = MenuItem.objects.create(restaurant=self.restaurant, name='Gyoza', price=Decimal('6.00'))
+
+    def place_order(self, *lines):
+        response = self.client.post('/api/orders/', {
+            'restaurant': self.restaurant.id,
+            'customer_name': 'Guest',
+            'order_items': [{'menu_item': item.id, 'quantity': quantity} for item, quantity in lines],
+        }, format='json')
+        return response.data['id']
+
+    def complete(self, order_id):
+        for new_status in ('in_progress', 'done'):
+            self.client.patch(f'/api/orders/{order_id}/update_status/', {'status': new_status}, format='json')
+
+    def test_rollups_follow_status_changes(self):
+        first = self.place_order((self.ramen, 1), (self.gyoza, 2))
+        self.place_order((self.gyoza, 1))
+        rollup = OrderRollup.objects.get()
+        self.assertEqual(rollup.orders_count, 2)
+        self.assertEqual(rollup.done_orders, 0)
+        self.assertFalse(MenuItemRollup.objects.exists())
+
+        self.complete(first)
+        rollup.refresh_from_db()
+        self.assertEqual(rollup.done_orders, 1)
+        self.assertEqual(rollup.revenue, Decimal('24.00'))
+        self.assertEqual(MenuItemRollup.objects.get(menu_item=self.gyoza).quantity, 2)
+
+    def test_report_endpoint(self):
+        self.complete(self.place_order((self.ramen, 1), (self.gyoza, 2)))
+        self.complete(self.place_order((self.ramen, 2)))
+        self.place_order((self.gyoza, 1))
+
+        response = self.client.get('/api/reports/?top=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        row = response.data[0]
+        self.assertEqual(row['orders_count'], 3)
+        self.assertEqual(row['done_orders'], 2)
+        self.assertEqual(row['revenue'], '48.00')
+        self.assertEqual(row['average_ticket'], '24.00')
+        self.assertEqual(row['top_items'], [
+            {'menu_item': self.ramen.id, 'menu_item_name': 'Ramen', 'quantity': 3, 'revenue': '36.00'},
+        ])
+
+        response = self.client.get('/api/reports/?granularity=hour')
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data[0]['top_items']), 2)
+
+    def test_rebuild_matches_incremental(self):
+        self.complete(self.place_order((self.ramen, 1)))
+        self.place_order((self.gyoza, 2))
+        expected = self.client.get('/api/reports/?granularity=hour').data
+        OrderRollup.objects.all().delete()
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.client.get('/api/reports/?granularity=hour').data, expected)
+
+    def test_invalid_restaurant_id(self):
+        response = self.client.get('/api/reports/?restaurant_id=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+
+    def test_item_writes_leave_rollups_to_the_order(self):
+        order = Order.objects.get(pk=self.place_order((self.ramen, 1)))
+        with CaptureQueriesContext(connection) as queries:
+            item = OrderItem.objects.create(order=order, menu_item=self.gyoza, quantity=2)
+        self.assertFalse([query for query in queries if 'rollup' in query['sql']])
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('24.00'))
+
+        item.delete()
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('12.00'))
+
+
+class MenuCacheTests(TransactionTestCase):
+    """Restaurant menus are cached and invalidated when writes commit"""
+
+    def setUp(self):
+        # Cached versions outlive the rows of earlier tests
+        cache.clear()
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Curry House')
+        self.korma = MenuItem.objects.create(restaurant=self.restaurant, name='Korma', price=Decimal('11.00'))
+        self.url = f'/api/restaurants/{self.restaurant.id}/menu/'
+
+    def test_cached_until_menu_item_changes(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+        self.client.patch(f'/api/menu-items/{self.korma.id}/', {'price': '12.50'}, format='json')
+        third = self.client.get(self.url)
+        self.assertEqual(third.data['results'][0]['price'], '12.50')
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+    def test_restaurant_rename_invalidates(self):
+        self.client.get(self.url)
+        self.client.patch(f'/api/restaurants/{self.restaurant.id}/', {'name': 'Curry Palace'}, format='json')
+        self.assertEqual(self.client.get(self.url).data['results'][0]['restaurant_name'], 'Curry Palace')
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_unknown_restaurant(self):
+        self.assertEqual(self.client.get('/api/restaurants/9999/menu/').status_code, 404)
+        response = self.client.get('/api/restaurants/9999/menu/', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+        # No version is stored for restaurants that don't exist
+        self.assertIsNone(cache.get(menu_version_key(9999)))
+
+    def test_versions_expire(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.client.get(self.url)
+        self.assertEqual(add.call_args.args[2], settings.MENU_CACHE_TIMEOUT)
+
+    def test_deleted_restaurant(self):
+        etag = self.client.get(self.url)['ETag']
+        self.restaurant.delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+    def test_keyed_on_page_only(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url + '?page=1&utm_source=mail')
+            self.client.get(self.url + '?page=01')
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            for i in range(5):
+                self.client.get(f'{self.url}?nonce={i}')
+        cache_set.assert_not_called()
+
+    def test_links_built_per_request(self):
+        for i in range(25):
+            MenuItem.objects.create(restaurant=self.restaurant, name=f'Naan {i:02}', price=Decimal('2.00'))
+        first = self.client.get(self.url, HTTP_HOST='a.example')
+        self.assertTrue(first.data['next'].startswith('http://a.example/'))
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, HTTP_HOST='b.example')
+        self.assertTrue(second.data['next'].startswith('http://b.example/'))
+        self.assertEqual(second.data['results'], first.data['results'])
+        last = self.client.get(self.url + '?page=last', HTTP_HOST='c.example')
+        self.assertEqual(len(last.data['results']), 6)
+        self.assertTrue(last.data['previous'].startswith('http://c.example/'))
+
+    def test_bumped_on_commit(self):
+        self.client.get(self.url)
+        version = cache.get(menu_version_key(self.restaurant.id))
+        with transaction.atomic():
+            self.korma.name = 'Lamb korma'
+            self.korma.save()
+            # Until the rename commits, other requests keep the committed menu
+            self.assertEqual(cache.get(menu_version_key(self.restaurant.id)), version)
+        self.assertIsNone(cache.get(menu_version_key(self.restaurant.id)))
+        self.assertEqual(self.client.get(self.url).data['results'][0]['name'], 'Lamb korma')
+
+    def test_rolled_back_write_keeps_version(self):
+        self.client.get(self.url)
+        version = cache.get(menu_version_key(self.restaurant.id))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.korma.name = 'Lamb korma'
+            self.korma.save()
+            MenuItem.objects.create(restaurant=self.restaurant, name='Lamb korma', price=Decimal('1.00'))
+        self.assertEqual(cache.get(menu_version_key(self.restaurant.id)), version)
+
+    @override_settings(MENU_CACHE=False)
+    def test_disabled(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['results'][0]['name'], 'Korma')
+        self.assertNotIn('ETag', response)
+        self.korma.name = 'Lamb korma'
+        self.korma.save()
+        self.assertEqual(self.client.get(self.url).data['results'][0]['name'], 'Lamb korma')
+
+
+class ConditionalGetTests(TestCase):
+    """List and detail responses carry validators and answer 304 when unchanged"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Salad Bar')
+        self.caesar = MenuItem.objects.create(restaurant=self.restaurant, name='Caesar', price=Decimal('8.00'))
+        self.order = create_orders(self.restaurant, [self.caesar], 1)[0]
+
+    def assertNotModified(self, url, queries=1):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(queries):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        if 'Last-Modified' in response:
+            cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(cached.status_code, 304)
+        return response['ETag']
+
+    def test_endpoints(self):
+        # Restaurant scoped actions look the restaurant up first; orders also
+        # compare the restaurant and menu item tables
+        for url, queries in (
+            ('/api/restaurants/', 1),
+            (f'/api/restaurants/{self.restaurant.id}/', 1),
+            (f'/api/restaurants/{self.restaurant.id}/orders/?status=pending', 3),
+            ('/api/menu-items/', 1),
+            (f'/api/menu-items/{self.caesar.id}/', 1),
+            ('/api/orders/', 2),
+            (f'/api/orders/{self.order.id}/', 2),
+            (f'/api/orders/by_restaurant/?restaurant_id={self.restaurant.id}', 3),
+        ):
+            with self.subTest(url=url):
+                self.assertNotModified(url, queries)
+
+    def test_status_change_invalidates(self):
+        url = f'/api/restaurants/{self.restaurant.id}/orders/?status=pending'
+        etag = self.assertNotModified(url, 3)
+        self.client.patch(f'/api/orders/{self.order.id}/update_status/', {'status': 'in_progress'}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_deletion_invalidates(self):
+        etag = self.assertNotModified('/api/restaurants/')
+        self.caesar.delete()
+        response = self.client.get('/api/restaurants/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['menu_items_count'], 0)
+
+    def test_last_modified_only_without_deletable_rows(self):
+        # Lists and rendered relation counts change on deletions, which leave no timestamp
+        for url in ('/api/orders/', f'/api/orders/{self.order.id}/', f'/api/restaurants/{self.restaurant.id}/'):
+            response = self.client.get(url)
+            self.assertNotIn('Last-Modified', response, url)
+            moment = 'Fri, 01 Jan 2100 00:00:00 GMT'
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=moment).status_code, 200, url)
+        self.assertIn('Last-Modified', self.client.get(f'/api/menu-items/{self.caesar.id}/'))
+
+    def test_menu_item_change_invalidates_orders(self):
+        etags = {url: self.assertNotModified(url, 2) for url in ('/api/orders/', f'/api/orders/{self.order.id}/')}
+        self.caesar.name = 'Caesar Salad'
+        self.caesar.save()
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn('Caesar Salad', response.content.decode())
+
+    def test_order_item_removal_invalidates(self):
+        url = f'/api/orders/{self.order.id}/'
+        etag = self.assertNotModified(url, 2)
+        # OrderItem.delete touches the order
+        self.order.order_items.get().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['order_items'], [])
+
+    def test_order_validators_skip_the_order_items(self):
+        url = '/api/orders/'
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        order_query, related_query = (query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('JOIN', order_query)
+        self.assertNotIn('orders_orderitem', related_query)
+
+    def test_restaurant_and_menu_changes_invalidate_orders(self):
+        url = '/api/orders/'
+        etag = self.assertNotModified(url, 2)
+        self.restaurant.name = 'Salad Corner'
+        self.restaurant.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['restaurant_name'], 'Salad Corner')
+        # Deleting a menu item removes its order lines without touching the order
+        etag = response['ETag']
+        self.caesar.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['order_items'], [])
+
+    def test_missing_object(self):
+        self.assertEqual(self.client.get('/api/orders/9999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/orders/abc/').status_code, 404)
+
+
+class OrderEventTests(TransactionTestCase):
+    """Order writes are pushed to server-sent event subscribers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Wok Express')
+        self.noodles = MenuItem.objects.create(restaurant=self.restaurant, name='Noodles', price=Decimal('9.00'))
+
+    async def read_event(self, stream):
+        while True:
+            chunk = await asyncio.wait_for(anext(stream), timeout=5)
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if not chunk.startswith(':'):
+                return chunk
+
+    async def test_stream_receives_created_and_status_changed(self):
+        response = await self.async_client.get(f'/api/restaurants/{self.restaurant.id}/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b': connected\n\n')
+
+        created = await sync_to_async(self.client.post)('/api/orders/', {
+            'restaurant': self.restaurant.id,
+            'customer_name': 'Pager 7',
+            'order_items': [{'menu_item': self.noodles.id, 'quantity': 1}],
+        }, format='json')
+        event = await self.read_event(stream)
+        self.assertTrue(event.startswith('event: order.created\n'))
+        self.assertEqual(json.loads(event.split('data: ', 1)[1])['id'], created.data['id'])
+
+        await sync_to_async(self.client.patch)(
+            f"/api/orders/{created.data['id']}/update_status/", {'status': 'in_progress'}, format='json'
+        )
+        event = await self.read_event(stream)
+        self.assertTrue(event.startswith('event: order.status_changed\n'))
+        self.assertEqual(json.loads(event.split('data: ', 1)[1])['status'], 'in_progress')
+        await stream.aclose()
+
+    async def test_update_publishes_status_change(self):
+        order = (await sync_to_async(create_orders)(self.restaurant, [self.noodles], 1))[0]
+        response = await self.async_client.get(f'/api/restaurants/{self.restaurant.id}/events/')
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        await sync_to_async(self.client.patch)(f'/api/orders/{order.id}/', {'status': 'done'}, format='json')
+        event = await self.read_event(stream)
+        self.assertTrue(event.startswith('event: order.status_changed\n'))
+        self.assertEqual(json.loads(event.split('data: ', 1)[1])['status'], 'done')
+        await stream.aclose()
+
+    async def test_unknown_restaurant(self):
+        response = await self.async_client.get('/api/restaurants/9999/events/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_requires_asgi(self):
+        response = self.client.get(f'/api/restaurants/{self.restaurant.id}/events/')
+        self.assertEqual(response.status_code, 501)
+        self.assertIn('error', response.json())
+
+    @override_settings(WEB_CONCURRENCY=4)
+    async def test_in_process_broker_needs_one_worker(self):
+        response = await self.async_client.get(f'/api/restaurants/{self.restaurant.id}/events/')
+        self.assertEqual(response.status_code, 501)
+        self.assertIn('ORDER_EVENTS_BROKER', response.json()['error'])
+
+
+@override_settings(CHANGES_FEED_LAG_MS=0)
+class OrderChangesFeedTests(TestCase):
+    """The changes feed returns only orders touched after the cursor"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Crepe Corner')
+        self.crepe = MenuItem.objects.create(restaurant=self.restaurant, name='Crepe', price=Decimal('6.50'))
+        self.orders = create_orders(self.restaurant, [self.crepe], 3)
+
+    def test_paging_and_updates(self):
+        response = self.client.get('/api/orders/changes/?limit=2')
+        self.assertEqual([o['id'] for o in response.data['results']], [o.id for o in self.orders[:2]])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(f"/api/orders/changes/?since={response.data['next_cursor']}")
+        self.assertEqual([o['id'] for o in response.data['results']], [self.orders[2].id])
+        self.assertFalse(response.data['has_more'])
+        cursor = response.data['next_cursor']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/orders/changes/?since={cursor}')
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(response.data['next_cursor'], cursor)
+
+        self.client.patch(f'/api/orders/{self.orders[0].id}/update_status/', {'status': 'in_progress'}, format='json')
+        response = self.client.get(f'/api/orders/changes/?since={cursor}')
+        self.assertEqual([o['status'] for o in response.data['results']], ['in_progress'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/orders/changes/?since=bogus').status_code, 400)
+
+    @override_settings(CHANGES_FEED_LAG_MS=60 * 1000)
+    def test_recent_changes_wait_for_the_lag(self):
+        # A write still waiting to commit could have an older updated_at than these
+        response = self.client.get('/api/orders/changes/')
+        self.assertEqual(response.data['results'], [])
+        Order.objects.filter(pk=self.orders[1].pk).update(updated_at=timezone.now() - timedelta(minutes=2))
+        response = self.client.get('/api/orders/changes/')
+        self.assertEqual([o['id'] for o in response.data['results']], [self.orders[1].id])
+
+
+class OrderCursorPaginationTests(TestCase):
+    """Keyset pagination walks orders newest first without counting"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Bagel Bros')
+        self.bagel = MenuItem.objects.create(restaurant=self.restaurant, name='Bagel', price=Decimal('3.00'))
+        self.orders = create_orders(self.restaurant, [self.bagel], 25)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(order['id'] for order in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_order_list(self):
+        expected = [order.id for order in reversed(self.orders)]
+        self.assertEqual(self.walk('/api/orders/?pagination=cursor'), expected)
+        self.assertEqual(
+            self.walk(f'/api/orders/by_restaurant/?restaurant_id={self.restaurant.id}&pagination=cursor'),
+            expected,
+        )
+
+    def test_restaurant_orders(self):
+        url = f'/api/restaurants/{self.restaurant.id}/orders/?pagination=cursor'
+        self.assertEqual(self.walk(url), [order.id for order in reversed(self.orders)])
+
+    def test_page_number_remains_default(self):
+        response = self.client.get('/api/orders/?page=2')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_no_count_query(self):
+        # orders + order items: no validators, no COUNT
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/?pagination=cursor')
+            self.client.get(response.data['next'])
+        self.assertEqual(len(queries), 4)
+        for query in queries:
+            # Only the page (LIMIT) and the order items of its orders are read
+            self.assertTrue(' LIMIT ' in query['sql'] or '"order_id" IN (' in query['sql'], query['sql'])
+        self.assertNotIn('ETag', response)
+
+
+class RestaurantActionPaginationTests(TestCase):
+    """Restaurant menu and orders are paginated, with an explicit streaming export"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Deli Depot')
+        self.menu_items = [
+            MenuItem.objects.create(restaurant=self.restaurant, name=f'Sandwich {i:02}', price=Decimal('7.00'))
+            for i in range(25)
+        ]
+        self.orders = create_orders(self.restaurant, self.menu_items[:2], 25)
+
+    def stream(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_menu_pages(self):
+        url = f'/api/restaurants/{self.restaurant.id}/menu/'
+        first = self.client.get(url)
+        self.assertEqual(first.data['count'], 25)
+        self.assertEqual(len(first.data['results']), 20)
+        second = self.client.get(url + '?page=2')
+        self.assertEqual([item['name'] for item in second.data['results']], [f'Sandwich {i}' for i in range(20, 25)])
+
+    def test_menu_stream(self):
+        items = self.stream(f'/api/restaurants/{self.restaurant.id}/menu/?stream=true')
+        self.assertEqual(len(items), 25)
+        self.assertEqual(items[0]['restaurant_name'], 'Deli Depot')
+
+    def test_orders_pages(self):
+        response = self.client.get(f'/api/restaurants/{self.restaurant.id}/orders/')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_orders_stream(self):
+        orders = self.stream(f'/api/restaurants/{self.restaurant.id}/orders/?stream=true')
+        self.assertEqual([order['id'] for order in orders], [order.id for order in reversed(self.orders)])
+        self.assertEqual(len(orders[0]['order_items']), 2)
+
+    async def test_menu_stream_under_asgi(self):
+        response = await self.async_client.get(f'/api/restaurants/{self.restaurant.id}/menu/?stream=true')
+        self.assertTrue(response.is_async)
+        items = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual(len(items), 25)
+
+
+class OrderExportTests(TestCase):
+    """Orders export as streamed NDJSON or CSV with the list filters"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Fry Shack')
+        self.other = Restaurant.objects.create(name='Pie Place')
+        self.fries = MenuItem.objects.create(restaurant=self.restaurant, name='Fries', price=Decimal('3.50'))
+        self.shake = MenuItem.objects.create(restaurant=self.restaurant, name='Shake', price=Decimal('4.00'))
+        self.pie = MenuItem.objects.create(restaurant=self.other, name='Pie', price=Decimal('5.00'))
+        self.orders = create_orders(self.restaurant, [self.fries, self.shake], 3)
+        create_orders(self.other, [self.pie], 2)
+
+    def content(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        lines = self.content(f'/api/orders/export/?restaurant={self.restaurant.id}').splitlines()
+        orders = [json.loads(line) for line in lines]
+        self.assertEqual([order['id'] for order in orders], [order.id for order in reversed(self.orders)])
+        self.assertEqual(len(orders[0]['order_items']), 2)
+
+    def test_csv(self):
+        rows = list(csv.reader(StringIO(self.content('/api/orders/export/?export_format=csv'))))
+        self.assertEqual(rows[0][:2], ['order_id', 'restaurant_id'])
+        # 3 orders with 2 lines and 2 orders with 1 line
+        self.assertEqual(len(rows) - 1, 8)
+        self.assertIn(['Fries', '1', '3.50', '3.50'], [row[11:15] for row in rows[1:]])
+
+    def test_csv_formulas_are_escaped(self):
+        order = self.orders[0]
+        order.customer_name = '=HYPERLINK("http://example.com")'
+        order.notes = '@SUM(A1)'
+        order.save()
+        order.order_items.update(special_instructions='-1+2')
+        content = self.content(f'/api/orders/export/?export_format=csv&restaurant={self.restaurant.id}')
+        rows = list(csv.reader(StringIO(content)))
+        row = next(row for row in rows[1:] if row[0] == str(order.id))
+        self.assertEqual(row[3], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(row[7], "'@SUM(A1)")
+        self.assertEqual(row[15], "'-1+2")
+
+    async def test_streamed_under_asgi(self):
+        # Sync iterators would be read into memory before the first byte under ASGI
+        response = await self.async_client.get(f'/api/orders/export/?restaurant={self.restaurant.id}')
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        orders = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([order['id'] for order in orders], [order.id for order in reversed(self.orders)])
+
+    def test_date_range(self):
+        self.assertEqual(self.content('/api/orders/export/?created_before=2000-01-01'), '')
+        response = self.client.get('/api/orders/export/?created_after=soon')
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkLoadTests(TestCase):
+    """Data dumps are streamed and bulk inserted"""
+
+    dump = {
+        'restaurants': [
+            {'id': 10, 'name': 'Soup Spot', 'description': '', 'is_active': True},
+        ],
+        'menu_items': [
+            {'id': 20, 'restaurant_id': 10, 'name': 'Tomato', 'description': '', 'price': '4.25',
+             'is_available': True, 'category': 'Main'},
+            {'id': 21, 'restaurant_id': 99, 'name': 'Orphan', 'description': '', 'price': '1.00',
+             'is_available': True, 'category': 'Main'},
+        ],
+        'orders': [
+            {'id': 30, 'restaurant_id': 10, 'customer_name': 'Ana', 'status': 'done', 'total_amount': '0',
+             'notes': ''},
+            {'id': 31, 'restaurant_id': 10, 'customer_name': 'Bo', 'status': 'pending', 'total_amount': '0',
+             'notes': ''},
+        ],
+        'order_items': [
+            {'id': 40, 'order_id': 30, 'menu_item_id': 20, 'quantity': 2, 'special_instructions': ''},
+        ],
+    }
+
+    def test_iter_json_sections_across_chunk_boundaries(self):
+        text = json.dumps({'meta': {'version': 1}, **self.dump, 'empty': []}, indent=2)
+        rows = list(iter_json_sections(StringIO(text), read_size=7))
+        self.assertEqual(
+            rows,
+            [(section, row) for section in ('restaurants', 'menu_items', 'orders', 'order_items')
+             for row in self.dump[section]],
+        )
+
+    def test_invalid_dump(self):
+        with self.assertRaises(DumpFormatError):
+            list(iter_json_sections(StringIO('{"restaurants": [{"id": 1}')))
+
+    def test_load_dump_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(self.dump, f)
+        self.addCleanup(os.remove, f.name)
+
+        out = StringIO()
+        call_command('load_dump', f.name, '--chunk-size', '1', stdout=out)
+        self.assertIn('1 skipped', out.getvalue())
+
+        restaurant = Restaurant.objects.get()
+        self.assertEqual(restaurant.name, 'Soup Spot')
+        self.assertEqual(MenuItem.objects.get().price, Decimal('4.25'))
+        done, pending = Order.objects.order_by('customer_name')
+        self.assertEqual(done.total_amount, Decimal('8.50'))
+        self.assertEqual(pending.total_amount, Decimal('0.00'))
+        self.assertEqual(OrderRollup.objects.get().revenue, Decimal('8.50'))
+
+    def test_load_twice_keeping_existing(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(self.dump, f)
+        self.addCleanup(os.remove, f.name)
+
+        call_command('load_dump', f.name, '--keep-existing', stdout=StringIO())
+        out = StringIO()
+        call_command('load_dump', f.name, '--keep-existing', stdout=out)
+        self.assertIn('restaurants: 0 (1 already there)', out.getvalue())
+        self.assertEqual(Restaurant.objects.count(), 1)
+        self.assertEqual(MenuItem.objects.count(), 1)
+        self.assertEqual(Order.objects.count(), 4)
+        self.assertEqual(OrderRollup.objects.get().revenue, Decimal('17.00'))
+
+    def test_integrity_error(self):
+        dump = {**self.dump, 'order_items': self.dump['order_items'] * 2}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(dump, f)
+        self.addCleanup(os.remove, f.name)
+        with self.assertRaisesMessage(CommandError, 'UNIQUE constraint failed'):
+            call_command('load_dump', f.name, stdout=StringIO())
+
+    def test_timestamps_kept_without_touching_auto_now(self):
+        dump = {**self.dump, 'orders': [
+            {**self.dump['orders'][0], 'created_at': '2026-01-05T10:00:00Z', 'updated_at': '2026-01-05T10:30:00Z'},
+        ]}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(dump, f)
+        self.addCleanup(os.remove, f.name)
+
+        fields = [Order._meta.get_field('created_at'), Order._meta.get_field('updated_at')]
+        flags = []
+        bulk_create = Order.objects.bulk_create
+
+        def record_flags(*args, **kwargs):
+            # Other threads saving orders meanwhile must still get auto_now timestamps
+            flags.append([(field.auto_now, field.auto_now_add) for field in fields])
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(Order.objects, 'bulk_create', side_effect=record_flags):
+            call_command('load_dump', f.name, stdout=StringIO())
+        self.assertEqual(flags, [[(False, True), (True, False)]])
+        order = Order.objects.get()
+        self.assertEqual(order.created_at, datetime(2026, 1, 5, 10, tzinfo=dt_timezone.utc))
+        self.assertEqual(order.updated_at, datetime(2026, 1, 5, 10, 30, tzinfo=dt_timezone.utc))
+
+
+class SyntheticDataTests(TestCase):
+    """Synthetic datasets are reproducible and shaped like real traffic"""
+
+    config_options = {'restaurants': 4, 'menu_items': 40, 'orders': 300, 'chunk_size': 100}
+
+    def config(self, **options):
+        end = datetime(2026, 3, 2, 12, tzinfo=dt_timezone.utc)
+        return SyntheticConfig(end=end, **{**self.config_options, **options})
+
+    def test_dump_is_reproducible_whatever_the_worker_count(self):
+        single, parallel = StringIO(), StringIO()
+        write_dump(self.config(), single)
+        write_dump(self.config(), parallel, workers=2)
+        self.assertEqual(single.getvalue(), parallel.getvalue())
+
+        other_seed = StringIO()
+        write_dump(self.config(seed=1), other_seed)
+        self.assertNotEqual(single.getvalue(), other_seed.getvalue())
+
+    def test_orders_follow_the_timeline(self):
+        orders = [order for chunk in iter_order_chunks(ChunkGenerator(self.config())) for order, _ in chunk]
+        self.assertEqual([order['id'] for order in orders], list(range(1, 301)))
+        created = [order['created_at'] for order in orders]
+        self.assertEqual(created, sorted(created))
+        # Nothing is ordered while the food court is closed
+        self.assertTrue(all(10 <= datetime.fromisoformat(c).hour < 22 for c in created))
+        # Only the most recent orders are still open
+        self.assertEqual({order['status'] for order in orders[:200]} - {'done', 'cancelled'}, set())
+
+    def test_generate_and_load_round_trip(self):
+        call_command(
+            'generate_data', '--restaurants', '4', '--menu-items', '40', '--orders', '300',
+            '--end', '2026-03-02T12:00', stdout=StringIO(),
+        )
+        self.assertEqual(Order.objects.count(), 300)
+        order = Order.objects.order_by('id').first()
+        self.assertEqual(order.total_amount, sum(item.subtotal for item in order.order_items.all()))
+        created = list(Order.objects.order_by('id').values_list('created_at', flat=True))
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            pass
+        self.addCleanup(os.remove, f.name)
+        call_command(
+            'generate_data', '--restaurants', '4', '--menu-items', '40', '--orders', '300',
+            '--end', '2026-03-02T12:00', '--output', f.name, stdout=StringIO(),
+        )
+        call_command('load_dump', f.name, stdout=StringIO())
+        self.assertEqual(list(Order.objects.order_by('id').values_list('created_at', flat=True)), created)
+        self.assertEqual(OrderRollup.objects.aggregate(n=Sum('orders_count'))['n'], 300)
+
+
+    def test_keep_existing_reuses_restaurants(self):
+        options = ['--restaurants', '4', '--menu-items', '40', '--orders', '100', '--end', '2026-03-02T12:00']
+        call_command('generate_data', *options, stdout=StringIO())
+        restaurants = set(Restaurant.objects.values_list('id', 'name'))
+        for seed in ('0', '1'):
+            call_command('generate_data', *options, '--seed', seed, '--keep-existing', stdout=StringIO())
+        self.assertEqual(set(Restaurant.objects.values_list('id', 'name')), restaurants)
+        self.assertEqual(MenuItem.objects.count(), 40)
+        self.assertEqual(Order.objects.count(), 300)
+        self.assertEqual(OrderRollup.objects.aggregate(n=Sum('orders_count'))['n'], 300)
+
+@override_settings(REQUEST_METRICS=True)
+class RequestMetricsTests(TestCase):
+    """Opt-in per-request query and timing metrics"""
+
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Salad Bar')
+        self.caesar = MenuItem.objects.create(restaurant=self.restaurant, name='Caesar', price=Decimal('8.00'))
+        create_orders(self.restaurant, [self.caesar], 2)
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/')
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'db', 'serialize', 'render', 'app', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+
+    def test_serialization_timed_apart(self):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            # A single restaurant counts its menu items with a query
+            RestaurantSerializer(self.restaurant).data
+            serialized = metrics.serialize_time
+            OrderViewSet.row_serializer.render(Order.objects.values(*OrderViewSet.row_serializer.values))
+        finally:
+            current_metrics.reset(token)
+        self.assertGreater(serialized, 0)
+        self.assertGreater(metrics.serialize_time, serialized)
+        self.assertEqual(metrics.queries, 3)
+        self.assertGreater(metrics.db_time, 0)
+        self.assertFalse(metrics.serializing)
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/orders/')
+        self.client.get(f'/api/orders/{Order.objects.first().id}/')
+        self.client.get(f'/api/restaurants/{self.restaurant.id}/menu/')
+        self.client.get('/api/orders/999999/')
+
+        response = self.client.get('/api/_metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE waiter_request_duration_seconds histogram', text)
+        self.assertIn('waiter_request_serialize_seconds_count{view="OrderViewSet",action="list"} 1', text)
+        self.assertIn('waiter_request_duration_seconds_count{view="OrderViewSet",action="list"} 1', text)
+        self.assertIn('waiter_request_queries_bucket{view="RestaurantViewSet",action="menu",le="+Inf"} 1', text)
+        self.assertIn('waiter_requests_total{view="OrderViewSet",action="retrieve",status="200"} 1', text)
+        self.assertIn('waiter_requests_total{view="OrderViewSet",action="retrieve",status="404"} 1', text)
+
+    async def test_async_handler(self):
+        response = await AsyncClient().get('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[0-9.]+;desc="[1-9][0-9]* queries"')
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled(self):
+        response = self.client.get('/api/orders/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get('/api/_metrics/').status_code, 404)
+
+    @override_settings(WEB_CONCURRENCY=4)
+    def test_several_workers(self):
+        # Histograms of one worker out of four would pass for the whole server
+        self.assertIn('Server-Timing', self.client.get('/api/orders/'))
+        self.assertEqual(self.client.get('/api/_metrics/').status_code, 501)
+
+
+@override_settings(QUERY_DETECTOR='raise')
+class QueryBudgetTests(TestCase):
+    """Endpoints stay within their query budgets whatever the amount of data"""
+
+    def setUp(self):
+        self.client = APIClient()
+        restaurants = [Restaurant.objects.create(name=f'Restaurant {i}') for i in range(25)]
+        self.restaurant = restaurants[0]
+        self.menu_items = [
+            MenuItem.objects.create(restaurant=restaurant, name=f'Dish {i}', price=Decimal('5.00'))
+            for restaurant in restaurants[:3]
+            for i in range(8)
+        ]
+        for restaurant in restaurants[:3]:
+            create_orders(restaurant, list(restaurant.menu_items.all()[:4]), 10)
+
+    def test_endpoints_within_budget(self):
+        order = Order.objects.filter(restaurant=self.restaurant).first()
+        menu_item = self.menu_items[0]
+        payload = {
+            'restaurant': self.restaurant.id,
+            'customer_name': 'Budget',
+            'order_items': [{'menu_item': item.id, 'quantity': 2} for item in self.menu_items[:5]],
+        }
+        # Every request goes through the detector, which raises when over budget
+        for method, url, data in (
+            ('get', '/api/restaurants/', None),
+            ('get', f'/api/restaurants/{self.restaurant.id}/', None),
+            ('get', f'/api/restaurants/{self.restaurant.id}/menu/', None),
+            ('get', f'/api/restaurants/{self.restaurant.id}/orders/', None),
+            ('patch', f'/api/restaurants/{self.restaurant.id}/', {'name': 'Renamed'}),
+            ('get', '/api/menu-items/', None),
+            ('get', f'/api/menu-items/{menu_item.id}/', None),
+            ('patch', f'/api/menu-items/{menu_item.id}/', {'price': '6.00'}),
+            ('get', '/api/orders/', None),
+            ('get', '/api/orders/?pagination=cursor', None),
+            ('get', f'/api/orders/{order.id}/', None),
+            ('post', '/api/orders/', payload),
+            ('patch', f'/api/orders/{order.id}/', {'notes': 'Window seat'}),
+            ('patch', f'/api/orders/{order.id}/update_status/', {'status': 'in_progress'}),
+            ('get', f'/api/orders/by_restaurant/?restaurant_id={self.restaurant.id}', None),
+            ('get', '/api/orders/changes/', None),
+            ('get', '/api/orders/statistics/?group_by=restaurant', None),
+            ('get', '/api/reports/', None),
+            ('delete', f'/api/orders/{order.id}/', None),
+        ):
+            response = getattr(self.client, method)(url, data, format='json')
+            self.assertLess(response.status_code, 400, f'{method.upper()} {url}')
+
+    def test_over_budget_fails(self):
+        with mock.patch.object(OrderViewSet, 'query_budgets', {'list': 1}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'over its budget of 1'):
+                self.client.get('/api/orders/')
+
+    @override_settings(QUERY_DETECTOR='log')
+    def test_repeated_queries_are_logged(self):
+        # Without select_related every menu item serialized loads its restaurant separately
+        with mock.patch.object(MenuItemViewSet, 'queryset', MenuItem.objects.all()), \
+                mock.patch.object(MenuItemViewSet, 'row_serializer', None):
+            with self.assertLogs('orders.queries', 'WARNING') as logs:
+                self.client.get('/api/menu-items/')
+        self.assertIn('Repeated query in GET /api/menu-items/ (MenuItemViewSet.list): 20 times at orders/', logs.output[0])
+        self.assertIn('FROM "orders_restaurant"', logs.output[0])
+
+    def test_query_shape(self):
+        self.assertEqual(
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 20 OFFSET 40'),
+            'SELECT * FROM t WHERE id IN (%s, ...) LIMIT ? OFFSET ?',
+        )
+
+
+class RowSerializerTests(TestCase):
+    """list/retrieve rendered from values() rows are byte-identical to the serializers' output"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Café Ünïcode', description='Crêpes & "quotes"')
+        # Sorted before the first restaurant by name, menu items are ordered by restaurant name
+        other = Restaurant.objects.create(name='Annex', is_active=False)
+        self.menu_items = [
+            MenuItem.objects.create(restaurant=self.restaurant, name='Soup', price=Decimal('4.5'), category='Starter'),
+            MenuItem.objects.create(restaurant=self.restaurant, name='Steak', price=Decimal('21.99'), description='Rare'),
+            MenuItem.objects.create(restaurant=self.restaurant, name='Tea', price=Decimal('2.00'), is_available=False),
+            MenuItem.objects.create(restaurant=other, name='Water', price=Decimal('1.00')),
+        ]
+        # Items added in another order than the menu, with a null table number and several statuses
+        order = Order.objects.create(restaurant=self.restaurant, customer_name='Zoë', notes='No salt')
+        for menu_item, quantity in ((self.menu_items[2], 3), (self.menu_items[0], 1), (self.menu_items[1], 2)):
+            OrderItem.objects.create(order=order, menu_item=menu_item, quantity=quantity, special_instructions='Hot')
+        self.order = order
+        create_orders(self.restaurant, self.menu_items[:2], 3, status='in_progress')
+        create_orders(other, self.menu_items[3:], 2, status='cancelled')
+        Order.objects.create(restaurant=other, customer_name='Empty', table_number='7')
+
+    def assert_same_output(self, viewset, path):
+        fast = self.client.get(path)
+        with mock.patch.object(viewset, 'row_serializer', None):
+            reference = self.client.get(path)
+        self.assertEqual(fast.status_code, reference.status_code, path)
+        self.assertEqual(fast.content, reference.content, path)
+
+    @mock.patch.object(OrderPagination, 'page_size', 3)
+    @mock.patch.object(OrderCursorPagination, 'page_size', 3)
+    def test_output_matches_serializers(self):
+        next_cursor = self.client.get('/api/orders/?pagination=cursor').data['next']
+        for viewset, path in (
+            (OrderViewSet, '/api/orders/'),
+            (OrderViewSet, '/api/orders/?page=3'),
+            (OrderViewSet, '/api/orders/?pagination=cursor'),
+            (OrderViewSet, next_cursor),
+            (OrderViewSet, '/api/orders/?ordering=total_amount&status=in_progress'),
+            (OrderViewSet, f'/api/orders/{self.order.id}/'),
+            (OrderViewSet, '/api/orders/999999/'),
+            (MenuItemViewSet, '/api/menu-items/'),
+            (MenuItemViewSet, '/api/menu-items/?ordering=-price&search=e'),
+            (MenuItemViewSet, f'/api/menu-items/{self.menu_items[0].id}/'),
+            (RestaurantViewSet, '/api/restaurants/'),
+            (RestaurantViewSet, f'/api/restaurants/{self.restaurant.id}/'),
+            (RestaurantViewSet, '/api/restaurants/999999/'),
+        ):
+            self.assert_same_output(viewset, path)
+
+    def test_order_items_fetched_once_per_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/')
+        self.assertEqual(len(response.data['results']), 7)
+        self.assertEqual([item['menu_item_name'] for item in response.data['results'][-1]['order_items']], ['Tea', 'Soup', 'Steak'])
+        self.assertEqual(sum('FROM "orders_orderitem"' in query['sql'] for query in queries), 1)
+
+
+class FieldSelectionTests(TestCase):
+    """?fields= and ?expand= trim the representation and the queries behind it"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Kitchen')
+        self.menu_items = [
+            MenuItem.objects.create(restaurant=self.restaurant, name=f'Dish {i}', price=Decimal('8.00'),
+                                    description='Long description')
+            for i in range(3)
+        ]
+        self.orders = create_orders(self.restaurant, self.menu_items, 4)
+
+    def get(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        return response, [query['sql'] for query in queries]
+
+    def test_kitchen_view(self):
+        response, queries = self.get('/api/orders/?fields=id,table_number,status,order_items.menu_item_name')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0], {
+            'id': self.orders[-1].id, 'table_number': '3', 'status': 'pending',
+            'order_items': [{'menu_item_name': f'Dish {i}'} for i in range(3)],
+        })
+        self.assertFalse(any('"description"' in sql or '"notes"' in sql for sql in queries))
+
+    def test_nested_rows_only_when_expanded(self):
+        response, queries = self.get('/api/orders/?fields=id,status')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'status'])
+        self.assertFalse(any('FROM "orders_orderitem"' in sql for sql in queries))
+
+        full = self.client.get('/api/orders/').data['results']
+        response, _ = self.get('/api/orders/?fields=id&expand=order_items')
+        self.assertEqual(
+            response.data['results'],
+            [{'id': order['id'], 'order_items': order['order_items']} for order in full],
+        )
+        # Without ?fields= the representation is complete, as before
+        self.assertEqual(self.client.get('/api/orders/?expand=order_items').data['results'], full)
+
+    def test_retrieve_and_other_viewsets(self):
+        order = self.orders[0]
+        response = self.client.get(f'/api/orders/{order.id}/?fields=status_display,total_amount')
+        self.assertEqual(response.data, {'status_display': 'Pending', 'total_amount': '24.00'})
+        response = self.client.get('/api/restaurants/?fields=name,menu_items_count')
+        self.assertEqual(response.data['results'], [{'name': 'Kitchen', 'menu_items_count': 3}])
+        response = self.client.get(f'/api/menu-items/{self.menu_items[0].id}/?fields=restaurant_name,price')
+        self.assertEqual(response.data, {'restaurant_name': 'Kitchen', 'price': '8.00'})
+
+    @mock.patch.object(OrderCursorPagination, 'page_size', 3)
+    def test_cursor_pages(self):
+        response = self.client.get('/api/orders/?pagination=cursor&fields=id')
+        next_page = self.client.get(response.data['next'])
+        ids = [order['id'] for order in response.data['results'] + next_page.data['results']]
+        self.assertEqual(ids, [order.id for order in reversed(self.orders)])
+
+    def test_restaurant_order_actions(self):
+        # The kitchen tablet poll
+        for path in (
+            f'/api/restaurants/{self.restaurant.id}/orders/?status=pending&fields=id,table_number',
+            f'/api/orders/by_restaurant/?restaurant_id={self.restaurant.id}&status=pending&fields=id,table_number',
+        ):
+            with self.subTest(path=path):
+                response, queries = self.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    response.data['results'],
+                    [{'id': order.id, 'table_number': order.table_number} for order in reversed(self.orders)],
+                )
+                self.assertFalse(any('FROM "orders_orderitem"' in sql for sql in queries))
+        full = self.client.get('/api/orders/?fields=id&expand=order_items').data['results']
+        response = self.client.get(f'/api/restaurants/{self.restaurant.id}/orders/?fields=id&expand=order_items')
+        self.assertEqual(response.data['results'], full)
+
+    @mock.patch.object(OrderCursorPagination, 'page_size', 3)
+    def test_restaurant_orders_cursor_pages(self):
+        response = self.client.get(f'/api/restaurants/{self.restaurant.id}/orders/?pagination=cursor&fields=id')
+        next_page = self.client.get(response.data['next'])
+        ids = [order['id'] for order in response.data['results'] + next_page.data['results']]
+        self.assertEqual(ids, [order.id for order in reversed(self.orders)])
+
+    def test_unknown_fields(self):
+        for path in (
+            '/api/orders/?fields=id,secret',
+            '/api/orders/?fields=status.name',
+            '/api/orders/?fields=order_items.price',
+            '/api/orders/?expand=restaurant',
+            f'/api/restaurants/{self.restaurant.id}/?fields=menu',
+            f'/api/restaurants/{self.restaurant.id}/orders/?fields=secret',
+            f'/api/orders/by_restaurant/?restaurant_id={self.restaurant.id}&expand=restaurant',
+        ):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 400, path)
+            self.assertIn('error', response.data)
+
+
+class SQLiteProfileTests(TestCase):
+    """Every connection gets the SQLite profile of the settings"""
+
+    def test_pragmas_applied(self):
+        pragmas = settings.SQLITE_PRAGMAS
+        with connection.cursor() as cursor:
+            def pragma(name):
+                return cursor.execute(f'PRAGMA {name}').fetchone()[0]
+
+            self.assertEqual(pragma('busy_timeout'), pragmas['busy_timeout'])
+            self.assertEqual(pragma('cache_size'), pragmas['cache_size'])
+            self.assertEqual(pragma('synchronous'), {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3}[pragmas['synchronous']])
+            self.assertEqual(pragma('temp_store'), 2)  # MEMORY
+
+    def test_immediate_transactions(self):
+        self.assertEqual(connection.transaction_mode, settings.DATABASES['default']['OPTIONS']['transaction_mode'].upper())
+
+
+class ServerSettingsTests(TestCase):
+    """Servers refuse to start with development settings and DEBUG off"""
+
+    @override_settings(DEBUG=False, SECRET_KEY=settings.DEVELOPMENT_SECRET_KEY)
+    def test_development_secret_key(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_server_settings()
+
+    @override_settings(DEBUG=False, SECRET_KEY='production-key')
+    def test_secret_key_set(self):
+        check_server_settings()
+
+    @override_settings(DEBUG=True, SECRET_KEY=settings.DEVELOPMENT_SECRET_KEY)
+    def test_debug(self):
+        check_server_settings()
+
+
+class ASGIStaticFilesTests(TestCase):
+    """Under ASGI static files are served ahead of Django, whose middleware stays async"""
+
+    def test_middleware_async_capable(self):
+        for path in settings.MIDDLEWARE:
+            if path != 'whitenoise.middleware.WhiteNoiseMiddleware':
+                self.assertTrue(getattr(import_string(path), 'async_capable', False), path)
+
+    def call(self, application, path, headers=()):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': list(headers)}
+        async_to_sync(application)(scope, receive, send)
+        return messages
+
+    def test_static_files(self):
+        async def django_application(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'django'})
+
+        with tempfile.TemporaryDirectory() as root:
+            with open(os.path.join(root, 'app.css'), 'w') as f:
+                f.write('body {}')
+            with override_settings(STATIC_ROOT=root, WHITENOISE_AUTOREFRESH=False):
+                application = StaticFilesApplication(django_application)
+            messages = self.call(application, '/static/app.css')
+            self.assertEqual(messages[0]['status'], 200)
+            self.assertIn((b'content-type', b'text/css; charset="utf-8"'), messages[0]['headers'])
+            self.assertEqual(b''.join(message.get('body', b'') for message in messages[1:]), b'body {}')
+
+            etag = dict(messages[0]['headers'])[b'etag']
+            self.assertEqual(self.call(application, '/static/app.css', [(b'if-none-match', etag)])[0]['status'], 304)
+            self.assertEqual(self.call(application, '/api/orders/')[1]['body'], b'django')
+
+
+@override_settings(ORDER_WRITE_COORDINATOR=True)
+class WriteCoordinatorTests(TransactionTestCase):
+    """Order writes go through the group commit writer thread"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Wok Express')
+        self.noodles = MenuItem.objects.create(restaurant=self.restaurant, name='Noodles', price=Decimal('9.00'))
+
+    def test_create_and_update_status(self):
+        response = self.client.post('/api/orders/', {
+            'restaurant': self.restaurant.id,
+            'customer_name': 'Alice',
+            'order_items': [{'menu_item': self.noodles.id, 'quantity': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_amount'], '18.00')
+        order_id = response.data['id']
+
+        response = self.client.patch(f'/api/orders/{order_id}/update_status/', {'status': 'in_progress'}, format='json')
+        self.assertEqual(response.data['status'], 'in_progress')
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'in_progress')
+        self.assertEqual(OrderRollup.objects.get(restaurant=self.restaurant).orders_count, 1)
+
+    def test_writes_grouped_in_one_commit(self):
+        coordinator = WriteCoordinator(window=0.5)
+        futures = [
+            coordinator.submit(lambda name=name: Restaurant.objects.create(name=name).name)
+            for name in ['Taco Stand', 'Wok Express', 'Pizza Corner']
+        ]
+        self.assertEqual(futures[0].result(timeout=5), 'Taco Stand')
+        # The duplicate name only rolls back its own write
+        with self.assertRaises(IntegrityError):
+            futures[1].result(timeout=5)
+        self.assertEqual(futures[2].result(timeout=5), 'Pizza Corner')
+        self.assertEqual((coordinator.commits, coordinator.writes), (1, 3))
+        self.assertEqual(Restaurant.objects.count(), 3)
+
+    def test_writer_survives_failures(self):
+        class Abort(BaseException):
+            pass
+
+        def abort():
+            raise Abort()
+
+        coordinator = WriteCoordinator()
+        # Patched on the class: `connection` is the test thread's, not the writer's
+        close = mock.patch.object(
+            type(connections[DEFAULT_DB_ALIAS]), 'close_if_unusable_or_obsolete',
+            side_effect=RuntimeError('closed'),
+        )
+        with close, self.assertLogs('orders.writer', 'ERROR') as logs, self.assertRaises(Abort):
+            coordinator.submit(abort).result(timeout=5)
+        self.assertIn('Closing the writer connection failed', logs.output[0])
+        self.assertEqual(coordinator.submit(lambda: Restaurant.objects.count()).result(timeout=5), 1)
+        self.assertTrue(coordinator.thread.is_alive())
+
+    def test_abandoned_writes_are_skipped(self):
+        coordinator = WriteCoordinator(window=0.5)
+        future = coordinator.submit(lambda: Restaurant.objects.create(name='Never'))
+        self.assertTrue(future.cancel())
+        coordinator.submit(lambda: None).result(timeout=5)
+        self.assertFalse(Restaurant.objects.filter(name='Never').exists())
+
+    @override_settings(GROUP_COMMIT_TIMEOUT_MS=50)
+    def test_timeout(self):
+        stalled = mock.Mock()
+        stalled.submit.return_value = Future()
+        with mock.patch('orders.writer.get_coordinator', return_value=stalled):
+            response = self.client.post('/api/orders/', {
+                'restaurant': self.restaurant.id,
+                'customer_name': 'Bob',
+                'order_items': [{'menu_item': self.noodles.id, 'quantity': 1}],
+            }, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('error', response.data)
+        self.assertTrue(stalled.submit.return_value.cancelled())
+
+
+class AsyncReadViewTests(TestCase):
+    """The async read endpoints answer exactly like the viewsets"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.factory = AsyncRequestFactory()
+        self.restaurant = Restaurant.objects.create(name='Pizza Palace')
+        Restaurant.objects.create(name='Closed Grill', is_active=False)
+        menu_items = [
+            MenuItem.objects.create(restaurant=self.restaurant, name=f'Item {i}', price=Decimal('5.00'))
+            for i in range(25)
+        ]
+        self.orders = create_orders(self.restaurant, menu_items[:3], 25)
+        self.orders[0].status = 'done'
+        self.orders[0].save()
+
+    def fetch(self, view, path, *args, headers=None, **kwargs):
+        cache.clear()
+        response = async_to_sync(view)(self.factory.get(path, headers=headers), *args, **kwargs)
+        if hasattr(response, 'render'):
+            # Delegated to the viewset, normally rendered by the request handler
+            response.render()
+        return response
+
+    def test_same_responses(self):
+        order_id = self.orders[0].id
+        cases = [
+            (async_views.restaurants, '/api/restaurants/', {}),
+            (async_views.restaurants, '/api/restaurants/?is_active=true&search=pizza', {}),
+            (async_views.orders, '/api/orders/', {}),
+            (async_views.orders, '/api/orders/?page=2&status=pending&ordering=created_at', {}),
+            (async_views.orders, '/api/orders/?page=9', {}),
+            (async_views.orders, '/api/orders/?restaurant=999', {}),
+            (async_views.orders, '/api/orders/?pagination=cursor', {}),
+            (async_views.orders, '/api/orders/?fields=id,status', {}),
+            (async_views.restaurants, '/api/restaurants/?fields=name&expand=', {}),
+            (async_views.orders, '/api/orders/?fields=id,order_items.quantity&page=2', {}),
+            (async_views.orders, '/api/orders/?fields=nope', {}),
+            (async_views.order, f'/api/orders/{order_id}/', {'pk': order_id}),
+            (async_views.order, f'/api/orders/{order_id}/?fields=id,order_items.quantity', {'pk': order_id}),
+            (async_views.order, '/api/orders/999/', {'pk': 999}),
+            (async_views.statistics, '/api/orders/statistics/', {}),
+            (async_views.statistics, '/api/orders/statistics/?group_by=restaurant', {}),
+            (async_views.statistics, '/api/orders/statistics/?created_after=yesterday', {}),
+        ]
+        for view, path, kwargs in cases:
+            with self.subTest(path=path):
+                expected = self.client.get(path)
+                response = self.fetch(view, path, **kwargs)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+                self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+    def test_rendered_from_rows(self):
+        order_id = self.orders[0].id
+        with mock.patch.object(OrderSerializer, 'to_representation', side_effect=AssertionError), \
+                mock.patch.object(RestaurantSerializer, 'to_representation', side_effect=AssertionError):
+            for view, path, kwargs in (
+                (async_views.restaurants, '/api/restaurants/', {}),
+                (async_views.orders, '/api/orders/', {}),
+                (async_views.order, f'/api/orders/{order_id}/', {'pk': order_id}),
+            ):
+                with self.subTest(path=path):
+                    self.assertEqual(self.fetch(view, path, **kwargs).status_code, 200)
+
+    def test_menu(self):
+        path = f'/api/restaurants/{self.restaurant.id}/menu/?page=2'
+        cache.clear()
+        expected = self.client.get(path)
+        response = self.fetch(async_views.menu, path, self.restaurant.id)
+        self.assertEqual(response.content, expected.content)
+        response = async_to_sync(async_views.menu)(
+            self.factory.get(path, headers={'If-None-Match': response['ETag']}), self.restaurant.id
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.fetch(async_views.menu, '/api/restaurants/999/menu/', 999).status_code, 404)
+
+    def test_not_modified(self):
+        etag = self.client.get('/api/orders/')['ETag']
+        response = self.fetch(async_views.orders, '/api/orders/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_queries_within_budget(self):
+        for view, path, args, action in [
+            (async_views.restaurants, '/api/restaurants/', (), 'list'),
+            (async_views.orders, '/api/orders/', (), 'list'),
+            (async_views.order, f'/api/orders/{self.orders[0].id}/', (self.orders[0].id,), 'retrieve'),
+        ]:
+            with self.subTest(path=path), CaptureQueriesContext(connection) as queries:
+                self.fetch(view, path, *args)
+            self.assertLessEqual(len(queries), view.cls.query_budgets[action])
+
+    def test_writes_reach_viewset(self):
+        request = self.factory.post('/api/orders/', {
+            'restaurant': self.restaurant.id,
+            'customer_name': 'Alice',
+            'order_items': [{'menu_item': self.orders[0].order_items.first().menu_item_id, 'quantity': 1}],
+        }, content_type='application/json')
+        response = async_to_sync(async_views.orders)(request)
+        response.render()
+        self.assertEqual(response.status_code, 201)
@@ -1,14 +1,32 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
 router.register(r'restaurants', views.RestaurantViewSet)
 router.register(r'menu-items', views.MenuItemViewSet)
 router.register(r'orders', views.OrderViewSet)
+router.register(r'reports', views.ReportViewSet, basename='report')
 
 # The API URLs are now determined automatically by the router
 urlpatterns = [
+    path('api/_metrics/', views.metrics, name='metrics'),
+    path('api/restaurants/<int:restaurant_id>/events/', views.restaurant_events, name='restaurant-events'),
+]
+
+# Under ASGI the hot read endpoints are answered by their async variants;
+# the other methods on these URLs still reach the viewsets
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns += [
+        path('api/restaurants/', async_views.restaurants),
+        path('api/restaurants/<int:pk>/menu/', async_views.menu),
+        path('api/orders/', async_views.orders),
+        path('api/orders/statistics/', async_views.statistics),
+        path('api/orders/<int:pk>/', async_views.order),
+    ]
+
+urlpatterns += [
     path('api/', include(router.urls)),
 ] 
\ No newline at end of file
@@ -1,82 +1,365 @@
+import base64
+import binascii
+import json
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+from functools import partial
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
-from .models import Restaurant, MenuItem, Order, OrderItem
+from .models import Restaurant, MenuItem, Order, OrderItem, OrderRollup, MenuItemRollup
+from .reports import refresh_rollups
+from .cache import (
+    bump_menu_version, create_menu_version, get_menu_version, menu_cache_enabled, menu_cache_key,
+    menu_cache_timeout,
+)
+from .conditional import ConditionalGetMixin, etag_matches
+from .events import get_broker, publish_order_event
+from .metrics import registry
+from .pagination import OrderPagination, page_cache_variant, restore_page
+from .rows import RowSerializer, RowSerializerMixin, choice_display
+from .streaming import (
+    csv_text, iter_chunks, iter_csv, iter_ndjson, stream_json_array, streaming_response, wants_stream,
+)
+from .writer import WriteTimeout, run_write
 from .serializers import (
-    RestaurantSerializer, MenuItemSerializer, OrderSerializer,
-    OrderCreateSerializer, OrderStatusUpdateSerializer
+    RestaurantSerializer, MenuItemSerializer, OrderSerializer, OrderItemSerializer,
+    OrderCreateSerializer, OrderStatusUpdateSerializer, prefetch_menu_items
 )
 
 
-class RestaurantViewSet(viewsets.ModelViewSet):
+def format_amount(value):
+    """Render a money amount the way DecimalField serializes it (two decimals)"""
+    return str(Decimal(value).quantize(Decimal('0.01')))
+
+
+def filter_created_range(queryset, params):
+    """
+    Apply the created_after/created_before query parameters (ISO dates or
+    datetimes, both inclusive). Raises ValueError for malformed values.
+    """
+    for param, lookup in (('created_after', 'gte'), ('created_before', 'lte')):
+        value = params.get(param)
+        if not value:
+            continue
+        try:
+            day = parse_date(value)
+            moment = None if day else parse_datetime(value)
+        except ValueError:
+            day = moment = None
+        if day is not None:
+            queryset = queryset.filter(**{f'created_at__date__{lookup}': day})
+            continue
+        if moment is None:
+            raise ValueError(f'{param} must be an ISO date or datetime')
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        queryset = queryset.filter(**{f'created_at__{lookup}': moment})
+    return queryset
+
+
+def statistics_queryset(queryset, params):
+    """Orders counted by the statistics: restaurant_id and created range filters (ValueError if malformed)"""
+    restaurant_id = params.get('restaurant_id')
+    if restaurant_id:
+        queryset = queryset.filter(restaurant_id=restaurant_id)
+    return filter_created_range(queryset, params)
+
+
+def statistics_aggregates():
+    return {
+        'total_orders': Count('id'),
+        'pending_orders': Count('id', filter=Q(status='pending')),
+        'in_progress_orders': Count('id', filter=Q(status='in_progress')),
+        'done_orders': Count('id', filter=Q(status='done')),
+        'cancelled_orders': Count('id', filter=Q(status='cancelled')),
+        # Revenue only counts completed orders
+        'total_revenue': Sum('total_amount', filter=Q(status='done'), default=Decimal('0.00')),
+    }
+
+
+def format_statistics_totals(totals):
+    totals['total_revenue'] = format_amount(totals['total_revenue'])
+    return totals
+
+
+def statistics_breakdown_rows(queryset):
+    """One row of statistics per restaurant"""
+    return (
+        queryset.order_by('restaurant__name')
+        .values('restaurant_id', 'restaurant__name')
+        .annotate(**statistics_aggregates())
+    )
+
+
+def format_statistics_breakdown(rows):
+    """Per-restaurant statistics, with the overall totals derived from the same rows"""
+    keys = list(statistics_aggregates())
+    totals = format_statistics_totals({key: sum(row[key] for row in rows) for key in keys})
+    totals['restaurants'] = [
+        {
+            'restaurant': row['restaurant_id'],
+            'restaurant_name': row['restaurant__name'],
+            **{key: row[key] for key in keys},
+            'total_revenue': format_amount(row['total_revenue']),
+        }
+        for row in rows
+    ]
+    return totals
+
+
+def encode_change_cursor(order):
+    """Opaque cursor pointing just after `order` in (updated_at, id) order"""
+    raw = f'{order.updated_at.isoformat()}|{order.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_change_cursor(cursor):
+    """Return (updated_at, id) from a cursor, raising ValueError when malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (binascii.Error, UnicodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+    updated_at, _, order_id = raw.partition('|')
+    moment = parse_datetime(updated_at)
+    if moment is None:
+        raise ValueError('Invalid cursor')
+    return moment, int(order_id)
+
+
+# Order items as OrderSerializer renders them, for the row serializers and
+# for the columns the order item prefetch loads
+ORDER_ITEM_ROWS = RowSerializer(OrderItemSerializer)
+
+
+def optimize_order_queryset(queryset):
+    """
+    Eager-load everything OrderSerializer reads so a page of orders costs a
+    constant number of queries: restaurant name via a join, and all order
+    items (with the menu item fields OrderItemSerializer renders) in one
+    extra query, loading only the columns the serializer reads.
+    """
+    columns = ORDER_ITEM_ROWS.values
+    relations = {column.rpartition('__')[0] for column in columns if '__' in column}
+    order_items = OrderItem.objects.select_related(*relations).only('order_id', *columns)
+    return queryset.select_related('restaurant').prefetch_related(
+        Prefetch('order_items', queryset=order_items)
+    )
+
+
+def annotate_menu_items_count(queryset):
+    """
+    Annotate the number of available menu items RestaurantSerializer renders,
+    as a correlated subquery: the page is fetched in a single query, and
+    COUNT/aggregate queries over the queryset leave the unused annotation out.
+    """
+    available = (
+        MenuItem.objects.filter(restaurant=OuterRef('pk'), is_available=True)
+        .order_by()
+        .values('restaurant')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return queryset.annotate(menu_items_count=Coalesce(Subquery(available), 0))
+
+
+class RestaurantViewSet(ConditionalGetMixin, RowSerializerMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing restaurants
     Provides CRUD operations for restaurants
     """
     queryset = Restaurant.objects.all()
     serializer_class = RestaurantSerializer
+    # list/retrieve render rows; menu_items_count is annotated by get_queryset
+    row_serializer = RowSerializer(RestaurantSerializer, columns={'menu_items_count': ('menu_items_count', None)})
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['is_active']
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
+    # menu_items_count depends on the menu items, so they feed the validators too
+    conditional_timestamps = ['updated_at', 'menu_items__updated_at']
+    conditional_counts = ['menu_items']
+    # Maximum queries per action, enforced in tests (see orders/querydetector.py)
+    query_budgets = {
+        'list': 3, 'retrieve': 2, 'create': 3, 'update': 3, 'partial_update': 3, 'menu': 3, 'orders': 6,
+    }
+
+    # Actions rendering restaurants with RestaurantSerializer
+    serialized_actions = ['list', 'retrieve', 'update', 'partial_update']
+
+    def get_queryset(self):
+        """Annotate menu_items_count for actions that serialize restaurants"""
+        queryset = super().get_queryset()
+        if self.action in self.serialized_actions:
+            queryset = annotate_menu_items_count(queryset)
+        return queryset
 
     @action(detail=True, methods=['get'])
     def menu(self, request, pk=None):
-        """Get menu items for a specific restaurant"""
-        restaurant = self.get_object()
-        menu_items = MenuItem.objects.filter(restaurant=restaurant, is_available=True)
-        serializer = MenuItemSerializer(menu_items, many=True)
-        return Response(serializer.data)
+        """
+        Get menu items for a specific restaurant, paginated like the other
+        lists; ?stream=true streams the full menu instead.
+        Each page is cached per restaurant until a menu item or the
+        restaurant changes; the cache version doubles as the response ETag.
+        """
+        if not menu_cache_enabled():
+            if wants_stream(request):
+                return stream_json_array(request, self.menu_queryset(self.get_object()), MenuItemSerializer)
+            page = self.paginate_queryset(self.menu_queryset(self.get_object()))
+            return self.get_paginated_response(MenuItemSerializer(page, many=True).data)
+
+        restaurant = None
+        version = get_menu_version(pk)
+        if version is None:
+            # Look the restaurant up before storing a version for it
+            restaurant = self.get_object()
+            version = create_menu_version(restaurant.pk)
+        etag = f'"menu-{pk}-{version}"'
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        if wants_stream(request):
+            menu_items = self.menu_queryset(restaurant or self.get_object())
+            response = stream_json_array(request, menu_items, MenuItemSerializer)
+            response['ETag'] = etag
+            return response
+
+        # Pages are cached without their links, which depend on the request's host
+        key = menu_cache_key(pk, version, page_cache_variant(self.paginator, request))
+        cached = cache.get(key)
+        if cached is None:
+            page = self.paginate_queryset(self.menu_queryset(restaurant or self.get_object()))
+            cached = {
+                'count': self.paginator.page.paginator.count,
+                'page': self.paginator.page.number,
+                'results': MenuItemSerializer(page, many=True).data,
+            }
+            cache.set(key, cached, menu_cache_timeout())
+        restore_page(self.paginator, request, cached['count'], cached['page'])
+        response = self.get_paginated_response(cached['results'])
+        response['ETag'] = etag
+        return response
+
+    def menu_queryset(self, restaurant):
+        return (
+            MenuItem.objects.filter(restaurant=restaurant, is_available=True)
+            .select_related('restaurant')
+            .order_by('category', 'name')
+        )
 
     @action(detail=True, methods=['get'])
     def orders(self, request, pk=None):
-        """Get orders for a specific restaurant"""
+        """
+        Get orders for a specific restaurant, paginated and trimmed with
+        ?fields=/?expand= like the order list (including ?pagination=cursor);
+        ?stream=true streams every order instead.
+        """
         restaurant = self.get_object()
-        orders = Order.objects.filter(restaurant=restaurant)
+        orders = optimize_order_queryset(Order.objects.filter(restaurant=restaurant))
         
         # Filter by status if provided
         status_filter = request.query_params.get('status')
         if status_filter:
             orders = orders.filter(status=status_filter)
         
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        def render():
+            if wants_stream(request):
+                return stream_json_array(request, orders, OrderSerializer)
+            return self.list_rows(
+                orders, OrderViewSet.row_serializer, OrderViewSet.row_columns, OrderPagination(),
+            )
+
+        return self.conditional_get(
+            request, orders, render,
+            timestamps=OrderViewSet.conditional_timestamps, counts=OrderViewSet.conditional_counts,
+            related=OrderViewSet.conditional_related,
+        )
 
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(ConditionalGetMixin, RowSerializerMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing menu items
     Provides CRUD operations for menu items
     """
-    queryset = MenuItem.objects.all()
+    queryset = MenuItem.objects.select_related('restaurant')
     serializer_class = MenuItemSerializer
+    row_serializer = RowSerializer(MenuItemSerializer)
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['restaurant', 'is_available', 'category']
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'price', 'created_at']
     ordering = ['restaurant', 'category', 'name']
+    conditional_timestamps = ['updated_at', 'restaurant__updated_at']
+    query_budgets = {'list': 3, 'retrieve': 2, 'create': 3, 'update': 2, 'partial_update': 2, 'destroy': 6}
 
+    def perform_update(self, serializer):
+        """Also invalidate the previous restaurant's menu when an item moves"""
+        previous_restaurant_id = serializer.instance.restaurant_id
+        menu_item = serializer.save()
+        if menu_item.restaurant_id != previous_restaurant_id:
+            bump_menu_version(previous_restaurant_id)
 
-class OrderViewSet(viewsets.ModelViewSet):
+
+class OrderViewSet(ConditionalGetMixin, RowSerializerMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing orders
     Provides comprehensive order management functionality
     """
     queryset = Order.objects.all()
+    # list/retrieve render rows, the order items of a page fetched in one query
+    row_serializer = RowSerializer(
+        OrderSerializer,
+        columns={'status_display': ('status', choice_display(Order, 'status'))},
+        nested={'order_items': (ORDER_ITEM_ROWS, 'order_id')},
+    )
+    # Cursor pages are located by created_at, rendered or not
+    row_columns = ['created_at']
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['restaurant', 'status']
     search_fields = ['customer_name']
     ordering_fields = ['created_at', 'updated_at', 'total_amount']
     ordering = ['-created_at']
+    pagination_class = OrderPagination
+    # Only indexed order columns: OrderItem.save and delete touch the order.
+    # Restaurant and menu item names (and menu items removed with their order
+    # lines) are caught by the state of those small tables as a whole
+    conditional_timestamps = ['updated_at']
+    conditional_related = [(Restaurant, ['updated_at', 'menu_items__updated_at'], ['menu_items'])]
+    # Writes also refresh the report rollups; batch grows with the number of orders
+    query_budgets = {
+        'list': 5, 'retrieve': 4, 'create': 13, 'update': 11, 'partial_update': 11, 'destroy': 11,
+        'update_status': 9, 'by_restaurant': 6, 'changes': 2, 'export': 3, 'statistics': 1,
+    }
+
+    # Actions that render orders with OrderSerializer and need eager loading
+    serialized_actions = ['list', 'retrieve', 'update', 'partial_update', 'update_status', 'changes', 'export']
+
+    def get_queryset(self):
+        """Apply the eager-loading plan for actions that serialize full orders"""
+        queryset = super().get_queryset()
+        if self.action in self.serialized_actions:
+            queryset = optimize_order_queryset(queryset)
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
-        if self.action == 'create':
+        if self.action in ('create', 'batch'):
             return OrderCreateSerializer
         elif self.action == 'update_status':
             return OrderStatusUpdateSerializer
@@ -86,27 +369,122 @@ class OrderViewSet(viewsets.ModelViewSet):
         """Create a new order with order items"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        order = serializer.save()
-        
+
+        def write():
+            order = serializer.save()
+            refresh_rollups([order], items=False)
+            return order
+
+        try:
+            order = run_write(write)
+        except WriteTimeout as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
         # Return the created order with full details
+        order = optimize_order_queryset(Order.objects.filter(pk=order.pk)).get()
         response_serializer = OrderSerializer(order)
+        publish_order_event('order.created', response_serializer.data)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
+    def perform_update(self, serializer):
+        """
+        Refresh the rollups of both the previous and the new restaurant, and
+        publish status changes as update_status does
+        """
+        previous = Order(
+            restaurant_id=serializer.instance.restaurant_id,
+            created_at=serializer.instance.created_at,
+            status=serializer.instance.status,
+        )
+        order = serializer.save()
+        refresh_rollups([previous, order])
+        # DRF drops the prefetched items after an update: respond with an eagerly loaded copy
+        serializer.instance = optimize_order_queryset(Order.objects.filter(pk=order.pk)).get()
+        if serializer.instance.status != previous.status:
+            publish_order_event('order.status_changed', OrderSerializer(serializer.instance).data)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        refresh_rollups([instance])
+
+    # Maximum number of orders accepted by a single batch request
+    batch_max_size = 500
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Create several orders in one request.
+        All payloads share a single menu item lookup and the valid orders are
+        committed in one transaction. The response lists a result per payload,
+        in the same order as the request.
+        """
+        payloads = request.data
+        if not isinstance(payloads, list) or not payloads:
+            return Response(
+                {'error': 'Expected a non-empty list of orders'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(payloads) > self.batch_max_size:
+            return Response(
+                {'error': f'A batch may contain at most {self.batch_max_size} orders'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        context = self.get_serializer_context()
+        context['menu_items'] = prefetch_menu_items(payloads)
+        order_serializers = [OrderCreateSerializer(data=payload, context=context) for payload in payloads]
+        valid = [serializer.is_valid() for serializer in order_serializers]
+
+        with transaction.atomic():
+            created_ids = [
+                serializer.save().pk if is_valid else None
+                for serializer, is_valid in zip(order_serializers, valid)
+            ]
+
+        created = optimize_order_queryset(Order.objects.filter(pk__in=[pk for pk in created_ids if pk]))
+        created = {order.pk: order for order in created}
+        refresh_rollups(created.values(), items=False)
+        results = []
+        for serializer, pk in zip(order_serializers, created_ids):
+            if pk is None:
+                results.append({'status': 'invalid', 'errors': serializer.errors})
+            else:
+                order_data = OrderSerializer(created[pk]).data
+                publish_order_event('order.created', order_data)
+                results.append({'status': 'created', 'order': order_data})
+
+        if all(valid):
+            response_status = status.HTTP_201_CREATED
+        elif any(valid):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(results, status=response_status)
+
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
         """Update only the status of an order"""
         order = self.get_object()
         serializer = OrderStatusUpdateSerializer(order, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        
+
+        def write():
+            serializer.save()
+            refresh_rollups([order])
+
+        try:
+            run_write(write)
+        except WriteTimeout as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
         # Return the updated order with full details
         response_serializer = OrderSerializer(order)
+        publish_order_event('order.status_changed', response_serializer.data)
         return Response(response_serializer.data)
 
     @action(detail=False, methods=['get'])
     def by_restaurant(self, request):
-        """Get orders filtered by restaurant"""
+        """Get orders filtered by restaurant, rendered like the order list"""
         restaurant_id = request.query_params.get('restaurant_id')
         if not restaurant_id:
             return Response(
@@ -115,47 +493,287 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
         
         restaurant = get_object_or_404(Restaurant, id=restaurant_id)
-        orders = Order.objects.filter(restaurant=restaurant)
+        orders = optimize_order_queryset(Order.objects.filter(restaurant=restaurant))
         
         # Apply additional filters
         status_filter = request.query_params.get('status')
         if status_filter:
             orders = orders.filter(status=status_filter)
         
-        # Paginate the results
-        page = self.paginate_queryset(orders)
-        if page is not None:
-            serializer = OrderSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return self.conditional_get(request, orders, partial(self.list_rows, orders))
+
+    # Default and maximum number of orders returned by one changes request
+    changes_page_size = 100
+    changes_max_page_size = 500
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Get orders created or updated after a cursor, oldest change first.
+        Pass the returned next_cursor as ?since= on the following call; omit
+        it to start from the beginning. Accepts the regular order filters
+        and ?limit= (up to 500). Changes show up CHANGES_FEED_LAG_MS after
+        they are made, once every earlier write has committed.
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', self.changes_page_size)), self.changes_max_page_size)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        settled = timezone.now() - timedelta(milliseconds=settings.CHANGES_FEED_LAG_MS)
+        orders = self.filter_queryset(self.get_queryset()).filter(updated_at__lte=settled).order_by('updated_at', 'id')
+        since = request.query_params.get('since')
+        if since:
+            try:
+                updated_at, order_id = decode_change_cursor(since)
+            except ValueError:
+                return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+            orders = orders.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=order_id)
+            )
+
+        page = list(orders[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        if page:
+            next_cursor = encode_change_cursor(page[-1])
+        else:
+            next_cursor = since
+        return Response({
+            'results': OrderSerializer(page, many=True).data,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+        })
+
+    # Columns of the CSV export, one row per order line
+    export_csv_columns = [
+        'order_id', 'restaurant_id', 'restaurant_name', 'customer_name', 'table_number', 'status',
+        'total_amount', 'notes', 'created_at', 'updated_at',
+        'menu_item_id', 'menu_item_name', 'quantity', 'unit_price', 'subtotal', 'special_instructions',
+    ]
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every matching order as NDJSON (default, one order per line) or
+        CSV (export_format=csv, one row per order line) with constant memory.
+        Accepts the regular order filters plus created_after/created_before.
+        """
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return Response(
+                {'error': 'export_format must be either ndjson or csv'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            orders = filter_created_range(self.filter_queryset(self.get_queryset()), request.query_params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if export_format == 'csv':
+            response = streaming_response(
+                request, iter_csv(self.export_csv_columns, self.export_csv_rows(orders)), 'text/csv'
+            )
+        else:
+            response = streaming_response(
+                request, iter_ndjson(orders, OrderSerializer), 'application/x-ndjson'
+            )
+        response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+        return response
+
+    def export_csv_rows(self, orders):
+        # Free text goes through csv_text so spreadsheets don't run it as formulas
+        for chunk in iter_chunks(orders):
+            for order in chunk:
+                head = [
+                    order.id, order.restaurant_id, csv_text(order.restaurant.name), csv_text(order.customer_name),
+                    csv_text(order.table_number) or '', order.status, order.total_amount, csv_text(order.notes),
+                    order.created_at.isoformat(), order.updated_at.isoformat(),
+                ]
+                items = order.order_items.all()
+                if not items:
+                    yield head + [''] * 6
+                for item in items:
+                    yield head + [
+                        item.menu_item_id, csv_text(item.menu_item.name), item.quantity,
+                        item.unit_price, item.subtotal, csv_text(item.special_instructions),
+                    ]
 
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """Get order statistics"""
+        """
+        Get order statistics computed with a single aggregate query.
+        Optional filters: restaurant_id, created_after, created_before
+        (ISO dates or datetimes). Pass group_by=restaurant to also get a
+        per-restaurant breakdown.
+        """
+        try:
+            queryset = statistics_queryset(self.get_queryset(), request.query_params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.query_params.get('group_by') != 'restaurant':
+            totals = queryset.order_by().aggregate(**statistics_aggregates())
+            return Response(format_statistics_totals(totals))
+
+        return Response(format_statistics_breakdown(list(statistics_breakdown_rows(queryset))))
+
+
+class ReportViewSet(viewsets.ViewSet):
+    """
+    ViewSet for sales reports
+    Reads from the hourly rollup tables instead of the raw orders
+    """
+    query_budgets = {'list': 2}
+
+    def list(self, request):
+        """
+        Revenue, order counts, average ticket and top items per restaurant
+        per day (default) or per hour (granularity=hour).
+        Optional filters: restaurant_id, date_from, date_to (ISO dates), top.
+        """
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in ('day', 'hour'):
+            return Response(
+                {'error': 'granularity must be either day or hour'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            top = int(request.query_params.get('top', 5))
+        except ValueError:
+            return Response({'error': 'top must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {}
         restaurant_id = request.query_params.get('restaurant_id')
-        queryset = self.get_queryset()
-        
         if restaurant_id:
-            queryset = queryset.filter(restaurant_id=restaurant_id)
-        
-        total_orders = queryset.count()
-        pending_orders = queryset.filter(status='pending').count()
-        in_progress_orders = queryset.filter(status='in_progress').count()
-        done_orders = queryset.filter(status='done').count()
-        cancelled_orders = queryset.filter(status='cancelled').count()
-        
-        # Calculate total revenue from completed orders
-        total_revenue = sum(
-            order.total_amount for order in queryset.filter(status='done')
+            try:
+                filters['restaurant_id'] = int(restaurant_id)
+            except ValueError:
+                return Response({'error': 'restaurant_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        for param, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                day = parse_date(value)
+            except ValueError:
+                day = None
+            if day is None:
+                return Response(
+                    {'error': f'{param} must be an ISO date'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            filters[f'period_start__date__{lookup}'] = day
+
+        if granularity == 'day':
+            period = TruncDate('period_start', tzinfo=dt_timezone.utc)
+        else:
+            period = F('period_start')
+
+        rows = (
+            OrderRollup.objects.filter(**filters)
+            .annotate(period=period)
+            .values('restaurant_id', 'restaurant__name', 'period')
+            .annotate(
+                orders_count=Sum('orders_count'),
+                done_orders=Sum('done_orders'),
+                cancelled_orders=Sum('cancelled_orders'),
+                revenue=Sum('revenue'),
+            )
+            .order_by('period', 'restaurant__name')
         )
-        
-        return Response({
-            'total_orders': total_orders,
-            'pending_orders': pending_orders,
-            'in_progress_orders': in_progress_orders,
-            'done_orders': done_orders,
-            'cancelled_orders': cancelled_orders,
-            'total_revenue': str(total_revenue),
-        })
+        items = (
+            MenuItemRollup.objects.filter(**filters)
+            .annotate(period=period)
+            .values('restaurant_id', 'period', 'menu_item_id', 'menu_item__name')
+            .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-quantity', '-revenue', 'menu_item__name')
+        )
+
+        top_items = {}
+        for item in items:
+            bucket = top_items.setdefault((item['restaurant_id'], item['period']), [])
+            if len(bucket) < top:
+                bucket.append({
+                    'menu_item': item['menu_item_id'],
+                    'menu_item_name': item['menu_item__name'],
+                    'quantity': item['quantity'],
+                    'revenue': format_amount(item['revenue']),
+                })
+
+        return Response([
+            {
+                'restaurant': row['restaurant_id'],
+                'restaurant_name': row['restaurant__name'],
+                'period': row['period'],
+                'orders_count': row['orders_count'],
+                'done_orders': row['done_orders'],
+                'cancelled_orders': row['cancelled_orders'],
+                'revenue': format_amount(row['revenue']),
+                'average_ticket': format_amount(
+                    row['revenue'] / row['done_orders'] if row['done_orders'] else 0
+                ),
+                'top_items': top_items.get((row['restaurant_id'], row['period']), []),
+            }
+            for row in rows
+        ])
+
+
+# Seconds between keep-alive comments on idle event streams
+EVENT_STREAM_KEEPALIVE = 15
+
+
+async def restaurant_events(request, restaurant_id):
+    """
+    Server-sent events stream of order.created / order.status_changed events
+    for one restaurant. Optional ?status= only forwards orders in that status.
+    Requires an ASGI server (see waiterapi/asgi.py): under WSGI the endless
+    stream would be read into memory and hold the worker forever.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'Order event streams require an ASGI server (SERVER=uvicorn)'},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    if getattr(get_broker(), 'single_process', False) and settings.WEB_CONCURRENCY > 1:
+        return JsonResponse(
+            {'error': 'The in-process event broker only reaches clients of one worker: '
+                      'configure a shared ORDER_EVENTS_BROKER or run a single worker (WEB_CONCURRENCY=1)'},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    if not await Restaurant.objects.filter(pk=restaurant_id).aexists():
+        raise Http404('No Restaurant matches the given query.')
+    status_filter = request.GET.get('status')
+
+    async def stream():
+        subscription = get_broker().subscribe(restaurant_id)
+        try:
+            yield ': connected\n\n'
+            while True:
+                event = await subscription.get(timeout=EVENT_STREAM_KEEPALIVE)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                elif not status_filter or event['order']['status'] == status_filter:
+                    yield f"event: {event['type']}\ndata: {json.dumps(event['order'], cls=DjangoJSONEncoder)}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def metrics(request):
+    """Request metrics of this process in Prometheus text format (needs REQUEST_METRICS)"""
+    if not settings.REQUEST_METRICS:
+        raise Http404('Request metrics are disabled.')
+    if settings.WEB_CONCURRENCY > 1:
+        # Each scrape would only see the worker that happened to answer it
+        return JsonResponse(
+            {'error': 'Request metrics are kept per process: run a single worker (WEB_CONCURRENCY=1) to collect them'},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
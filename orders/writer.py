@@ -0,0 +1,153 @@
+"""
+Group commit of order writes.
+
+SQLite has a single writer at a time and every transaction pays for its own
+commit. With ORDER_WRITE_COORDINATOR enabled, order creations and status
+updates are handed to one writer thread per process instead of each request
+committing on its own: writes arriving within GROUP_COMMIT_WINDOW_MS of the
+first one waiting are run back to back in a single transaction, each in its
+own savepoint so a failing write only rolls back itself. Every request then
+gets its own result, or its own exception, once the group has committed.
+Requests wait at most GROUP_COMMIT_TIMEOUT_MS (WriteTimeout); writes given
+up on before the writer picked them up are skipped.
+
+Requests validate their input and read the data needed for their response
+in their own thread; only the write itself goes through the writer.
+"""
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class WriteTimeout(Exception):
+    """The writer did not run a write within GROUP_COMMIT_TIMEOUT_MS"""
+
+
+class WriteCoordinator:
+    """Runs submitted writes on a single thread, committing them in groups"""
+
+    def __init__(self, window=0.002, max_batch=100):
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = queue.SimpleQueue()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.commits = 0
+        self.writes = 0
+        self.thread = threading.Thread(target=self.run, name='order-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, work):
+        """
+        Queue `work`, a callable run inside the group's transaction, and return
+        a Future of its result. It runs in a copy of the caller's context, so
+        its queries still count for the request that submitted it.
+        """
+        future = Future()
+        self.queue.put((work, contextvars.copy_context(), future))
+        return future
+
+    def next_batch(self):
+        """Block for a write, then gather those arriving within the window"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            # Writes whose callers gave up waiting are dropped
+            batch = [entry for entry in self.next_batch() if entry[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.commit(batch)
+            except BaseException as exc:
+                # The commit itself failed: none of the writes happened
+                logger.exception('Group commit of %d writes failed', len(batch))
+                results = [(None, exc)] * len(batch)
+            finally:
+                try:
+                    connection.close_if_unusable_or_obsolete()
+                except Exception:
+                    # The thread must outlive a broken connection: the next batch reconnects
+                    logger.exception('Closing the writer connection failed')
+            for (_, _, future), (result, error) in zip(batch, results):
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    def commit(self, batch):
+        """Run the batch in one transaction: [(result, exception)] per write"""
+        results = []
+        with transaction.atomic():
+            for work, context, _ in batch:
+                try:
+                    with transaction.atomic():
+                        results.append((context.run(work), None))
+                except BaseException as exc:
+                    results.append((None, exc))
+        with self.lock:
+            self.commits += 1
+            self.writes += len(batch)
+        return results
+
+
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
+
+def coordinator_running():
+    return _coordinator is not None and _coordinator.pid == os.getpid() and _coordinator.thread.is_alive()
+
+
+def get_coordinator():
+    """
+    Return the process-wide coordinator, starting its thread on first use
+    (and after a fork, or should the thread have died)
+    """
+    global _coordinator
+    if not coordinator_running():
+        with _coordinator_lock:
+            if not coordinator_running():
+                if _coordinator is not None and _coordinator.pid == os.getpid():
+                    logger.error('The order writer thread died, starting a new one')
+                _coordinator = WriteCoordinator(
+                    window=settings.GROUP_COMMIT_WINDOW_MS / 1000,
+                    max_batch=settings.GROUP_COMMIT_MAX_BATCH,
+                )
+    return _coordinator
+
+
+def run_write(work):
+    """
+    Run the write `work` and return its result: through the coordinator when
+    ORDER_WRITE_COORDINATOR is enabled, else directly in the calling thread.
+    Exceptions raised by `work` propagate to the caller either way; through
+    the coordinator, WriteTimeout when it is not done in time (a write the
+    writer had already started may still commit).
+    """
+    # Inside a transaction the writer's connection couldn't see the caller's uncommitted rows
+    if not settings.ORDER_WRITE_COORDINATOR or connection.in_atomic_block:
+        return work()
+    future = get_coordinator().submit(work)
+    try:
+        return future.result(timeout=settings.GROUP_COMMIT_TIMEOUT_MS / 1000)
+    except TimeoutError:
+        future.cancel()
+        raise WriteTimeout('The order write did not complete in time') from None
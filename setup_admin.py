@@ -17,9 +17,11 @@ def setup_admin_and_data():
     
     from orders.models import Restaurant
     
-    # Check if data already exists
+    # Check if data already exists: keep it across restarts unless asked to reload
     data_exists = Restaurant.objects.exists()
-    
+    if data_exists and '--reload' not in sys.argv:
+        print("✅ Data already loaded, skipping (pass --reload to replace it)")
+        return True
     
     # Check if dump file exists, if not generate it
     if not os.path.exists('test_data_dump.json'):
@@ -1,20 +1,40 @@
 #!/bin/bash
-
-# Wait a moment for any file system operations to complete
-sleep 2
+set -e
 
 # Run Django migrations
 echo "Running migrations..."
-python manage.py migrate
+python manage.py migrate --noinput
 
-# Set up admin user and sample data
+# Set up admin user and sample data, only on an empty database
+# (set RELOAD_TEST_DATA=1 to replace existing data with a fresh load)
 echo "Setting up admin user and sample data..."
-python setup_admin.py
+if [ "$RELOAD_TEST_DATA" = "1" ]; then
+    python setup_admin.py --reload
+else
+    python setup_admin.py
+fi
+
+case "${DEBUG,,}" in
+    1|true|yes)
+        # Development server, with autoreload and static files from the apps
+        echo "Starting Django development server..."
+        exec python manage.py runserver 0.0.0.0:8000
+        ;;
+esac
+
+if [ ! -f staticfiles/staticfiles.json ]; then
+    echo "Collecting static files..."
+    python manage.py collectstatic --noinput
+fi
 
-# Collect static files
-echo "Collecting static files..."
-python manage.py collectstatic --noinput
+if [ "$SERVER" = "uvicorn" ]; then
+    # ASGI, required for the real-time order event streams and serving the
+    # async read endpoints: uvicorn workers managed by gunicorn
+    export CONN_MAX_AGE="${CONN_MAX_AGE:-0}"
+    echo "Starting gunicorn with uvicorn workers..."
+    exec gunicorn waiterapi.asgi:application --config gunicorn.conf.py \
+        --worker-class uvicorn.workers.UvicornWorker
+fi
 
-# Start the Django development server
-echo "Starting Django server..."
-python manage.py runserver 0.0.0.0:8000 
\ No newline at end of file
+echo "Starting gunicorn..."
+exec gunicorn waiterapi.wsgi:application --config gunicorn.conf.py
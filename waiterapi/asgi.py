@@ -12,5 +12,15 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'waiterapi.settings')
+# Async variants of the hot read endpoints (orders/async_views.py)
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
+# Static files are served ahead of Django, keeping the middleware chain async
+os.environ.setdefault('STATIC_FILES_MIDDLEWARE', '0')
 
 application = get_asgi_application()
+
+from waiterapi.deployment import check_server_settings  # noqa: E402  (needs the settings)
+from waiterapi.static import StaticFilesApplication  # noqa: E402
+
+check_server_settings()
+application = StaticFilesApplication(application)
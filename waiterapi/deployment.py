@@ -0,0 +1,14 @@
+"""
+Checks run when a server loads the application (waiterapi/wsgi.py, asgi.py).
+
+Management commands and tests can run with development settings; serving
+requests with DEBUG off cannot.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def check_server_settings():
+    """Raise ImproperlyConfigured for settings unfit to serve requests"""
+    if not settings.DEBUG and settings.SECRET_KEY == settings.DEVELOPMENT_SECRET_KEY:
+        raise ImproperlyConfigured('Set the SECRET_KEY environment variable (or DEBUG=1 for development)')
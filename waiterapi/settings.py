@@ -10,22 +10,27 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
-# Quick-start development settings - unsuitable for production
+# Deployment settings come from the environment (see README.md)
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-k%n0jx)po)ts$%w&uz7^o)8!0m189+@rko-5%)1en(24l&_7#m'
+# The development key only serves management commands, tests and DEBUG
+# servers: waiterapi/wsgi.py and asgi.py refuse to start with it otherwise.
+DEVELOPMENT_SECRET_KEY = 'django-insecure-k%n0jx)po)ts$%w&uz7^o)8!0m189+@rko-5%)1en(24l&_7#m'
+SECRET_KEY = os.environ.get('SECRET_KEY', DEVELOPMENT_SECRET_KEY)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Off unless DEBUG=1: in debug mode every SQL query is kept in memory.
+DEBUG = os.environ.get('DEBUG', '').lower() in ('1', 'true', 'yes')
 
-ALLOWED_HOSTS = ['*']
+ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '*').split(',')
 
 
 # Application definition
@@ -44,6 +49,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so it times the whole request; inactive unless REQUEST_METRICS is set
+    'orders.metrics.RequestMetricsMiddleware',
+    # N+1 / slow query / query budget checks; inactive unless QUERY_DETECTOR is set
+    'orders.querydetector.QueryDetectorMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -54,6 +63,17 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Static files are served by WhiteNoise. Its middleware is sync only: under
+# ASGI it would run every request, async views included, through a thread, so
+# waiterapi/asgi.py turns it off and serves them ahead of Django instead
+# (see waiterapi/static.py)
+STATIC_FILES_MIDDLEWARE = os.environ.get('STATIC_FILES_MIDDLEWARE', '1').lower() in ('1', 'true', 'yes')
+if STATIC_FILES_MIDDLEWARE:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+        'whitenoise.middleware.WhiteNoiseMiddleware',
+    )
+
 ROOT_URLCONF = 'waiterapi.urls'
 
 TEMPLATES = [
@@ -77,10 +97,35 @@ WSGI_APPLICATION = 'waiterapi.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite profile applied on every new connection, tuned for several workers
+# sharing the file: in WAL mode readers no longer wait for the writer, and
+# writers queue for the lock for up to busy_timeout ms instead of failing
+# with "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    # NORMAL is durable in WAL mode except for the last commits on power loss
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Negative: in KiB rather than pages (64 MB per connection)
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'data' / 'db.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'data' / 'db.sqlite3'),
+        # Keep connections open across requests instead of reconnecting every time
+        # (set CONN_MAX_AGE=0 under ASGI, where each request runs in a new thread)
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            # Transactions take the write lock when they begin: a deferred one that
+            # reads first can't wait for the lock when it later writes, it fails
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        },
     }
 }
 
@@ -104,6 +149,73 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local-memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. Redis or Memcached) when running several processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'waiterapi'),
+    }
+}
+
+# Worker processes serving requests (exported by gunicorn.conf.py)
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+# Restaurant menus are cached and their cache versions double as ETags. A
+# local-memory cache only sees the writes of its own process, so with several
+# workers menus are only cached in a shared backend.
+MENU_CACHE = os.environ.get(
+    'MENU_CACHE',
+    '1' if WEB_CONCURRENCY == 1 or not CACHES['default']['BACKEND'].endswith('.LocMemCache') else '0',
+).lower() in ('1', 'true', 'yes')
+# Seconds a serialized restaurant menu stays cached (writes invalidate it sooner)
+MENU_CACHE_TIMEOUT = int(os.environ.get('MENU_CACHE_TIMEOUT', 60 * 60))
+
+
+# Broker delivering real-time order events to the /events/ streams. The
+# in-process broker only reaches clients connected to the same process: with
+# several workers the streams answer 501 until a shared broker is configured.
+ORDER_EVENTS_BROKER = os.environ.get('ORDER_EVENTS_BROKER', 'orders.events.InProcessBroker')
+
+
+# Per-request query count and timings: Server-Timing headers plus histograms
+# per view at /api/_metrics/ (see orders/metrics.py). Off by default. The
+# histograms are kept per process, so /api/_metrics/ answers 501 with
+# several workers.
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', '').lower() in ('1', 'true', 'yes')
+
+# N+1 and slow query detection (see orders/querydetector.py): 'log' for
+# staging, 'raise' to fail requests over their query budget (the test runner
+# turns it on). Off by default.
+QUERY_DETECTOR = os.environ.get('QUERY_DETECTOR', '')
+QUERY_DETECTOR_REPEAT_THRESHOLD = int(os.environ.get('QUERY_DETECTOR_REPEAT_THRESHOLD', 5))
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+TEST_RUNNER = 'orders.testing.QueryBudgetTestRunner'
+
+# Serve the hot read endpoints with their async variants (see orders/async_views.py).
+# Only worth it under ASGI, where waiterapi/asgi.py turns it on by default.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+# Group commit of order creations and status updates (see orders/writer.py):
+# one writer thread per process commits the writes arriving within
+# GROUP_COMMIT_WINDOW_MS of each other in a single transaction. Off by default.
+ORDER_WRITE_COORDINATOR = os.environ.get('ORDER_WRITE_COORDINATOR', '').lower() in ('1', 'true', 'yes')
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 2))
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 100))
+# How long a request waits for its write before answering 503
+GROUP_COMMIT_TIMEOUT_MS = float(os.environ.get('GROUP_COMMIT_TIMEOUT_MS', 10000))
+
+# The changes feed (/api/orders/changes/) only returns orders last updated at
+# least this long ago: updated_at is set before the write waits for the
+# database lock and commits, so a fresher row could still be followed by a
+# commit with an older updated_at, which a cursor past it would never see
+CHANGES_FEED_LAG_MS = int(os.environ.get('CHANGES_FEED_LAG_MS', SQLITE_PRAGMAS['busy_timeout'] + 1000))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -120,6 +232,22 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Served by WhiteNoise: collectstatic writes compressed, content-hashed copies
+# that are sent with far-future cache headers, no separate web server needed
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+# Fall back to unhashed names until collectstatic has run (development, tests),
+# looking files up on each request instead of indexing STATIC_ROOT at startup
+WHITENOISE_MANIFEST_STRICT = False
+WHITENOISE_AUTOREFRESH = DEBUG or not STATIC_ROOT.is_dir()
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -0,0 +1,56 @@
+"""
+Static files for the ASGI application.
+
+WhiteNoiseMiddleware is synchronous: in the middleware chain of an ASGI
+application Django would adapt every request, async views included, to run
+through a thread. Under ASGI (waiterapi/asgi.py) the middleware is left out
+of MIDDLEWARE and the same WhiteNoise configuration answers static file
+requests before they reach Django, so the middleware chain stays async.
+"""
+from asgiref.sync import sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesApplication:
+    """ASGI application serving static files with WhiteNoise, passing other requests to `application`"""
+    chunk_size = 64 * 1024
+
+    def __init__(self, application):
+        self.application = application
+        self.whitenoise = WhiteNoiseMiddleware()
+
+    async def __call__(self, scope, receive, send):
+        static_file = None
+        if scope['type'] == 'http':
+            if self.whitenoise.autorefresh:
+                static_file = await sync_to_async(self.whitenoise.find_file, thread_sensitive=False)(scope['path'])
+            else:
+                static_file = self.whitenoise.files.get(scope['path'])
+        if static_file is None:
+            return await self.application(scope, receive, send)
+        await self.serve(static_file, scope, send)
+
+    async def serve(self, static_file, scope, send):
+        # WhiteNoise reads the request headers the WSGI way
+        request_headers = {
+            'HTTP_' + name.decode('latin-1').upper().replace('-', '_'): value.decode('latin-1')
+            for name, value in scope['headers']
+        }
+        response = await sync_to_async(static_file.get_response, thread_sensitive=False)(
+            scope['method'], request_headers
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': int(response.status),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers],
+        })
+        if response.file is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        read = sync_to_async(response.file.read, thread_sensitive=False)
+        try:
+            while chunk := await read(self.chunk_size):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            response.file.close()
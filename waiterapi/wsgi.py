@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'waiterapi.settings')
 
 application = get_wsgi_application()
+
+from waiterapi.deployment import check_server_settings  # noqa: E402  (needs the settings)
+
+check_server_settings()